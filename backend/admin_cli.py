@@ -32,6 +32,7 @@ class AdminCLI:
                     choices=[
                         ('股票基本面数据管理', 'fundamental'),
                         ('历史交易数据管理', 'historical'),
+                        ('每日更新流水线', 'pipeline'),
                         ('退出程序', 'exit')
                     ]
                 )
@@ -43,6 +44,8 @@ class AdminCLI:
                 self.fundamental_menu()
             elif answer['choice'] == 'historical':
                 self.historical_menu()
+            elif answer['choice'] == 'pipeline':
+                self.pipeline_menu()
             else:
                 sys.exit(0)
 
@@ -113,6 +116,40 @@ class AdminCLI:
             else:
                 break
 
+    def pipeline_menu(self):
+        """每日更新流水线菜单"""
+        self.clear_screen()
+        print("=== 每日更新流水线 ===\n")
+        
+        questions = [
+            inquirer.List('action',
+                message="请选择操作",
+                choices=[
+                    ('运行流水线（输入未变化的阶段自动跳过）', 'run'),
+                    ('预览将要运行的阶段', 'dry_run'),
+                    ('强制重新运行全部阶段', 'force'),
+                    ('查看阶段依赖', 'list'),
+                    ('返回上级菜单', 'back')
+                ]
+            )
+        ]
+        
+        answer = inquirer.prompt(questions)
+        
+        if answer['action'] == 'run':
+            self.run_command('python3 pipeline_runner.py')
+        elif answer['action'] == 'dry_run':
+            self.run_command('python3 pipeline_runner.py --dry-run')
+        elif answer['action'] == 'force':
+            confirm = inquirer.confirm(
+                message="确定要重新运行全部阶段吗？",
+                default=False
+            )
+            if confirm:
+                self.run_command('python3 pipeline_runner.py --force')
+        elif answer['action'] == 'list':
+            self.run_command('python3 pipeline_runner.py --list')
+
     def historical_download_menu(self):
         """历史数据下载菜单"""
         self.clear_screen()
@@ -124,6 +161,7 @@ class AdminCLI:
                 choices=[
                     ('下载指定日期数据', 'specific'),
                     ('下载最新数据', 'latest'),
+                    ('增量下载(只下载本地数据之后的新数据)', 'delta'),
                     ('返回上级菜单', 'back')
                 ]
             )
@@ -162,6 +200,16 @@ class AdminCLI:
                 f'-o {output_dir} -s {stock_list} '
                 f'--workers {workers}'
             )
+        elif answer['mode'] == 'delta':
+            stock_list = inquirer.text(message="请输入股票列表文件路径", default="stock_list.csv")
+            output_dir = inquirer.text(message="请输入已有数据目录", default="stock_history/data/delta")
+            workers = inquirer.text(message="请输入并发数(默认3)", default="3")
+            
+            self.run_command(
+                f'python3 -m stock_history.downloader.ak_downloader '
+                f'-o {output_dir} -s {stock_list} '
+                f'--workers {workers} --delta'
+            )
 
     def historical_database_menu(self):
         """历史数据库操作菜单"""
@@ -188,7 +236,7 @@ class AdminCLI:
             )
             mode = inquirer.list_input(
                 message="请选择导入模式",
-                choices=['all', 'date_range']
+                choices=['all', 'date_range', 'incremental']
             )
             workers = inquirer.text(message="请输入并发数(默认5)", default="5")
             
@@ -240,6 +288,7 @@ class AdminCLI:
                 message="请选择操作",
                 choices=[
                     ('更新今日筹码分析', 'update'),
+                    ('更新筹码分布（换手率衰减模型）', 'distribution'),
                     ('返回上级菜单', 'back')
                 ]
             )
@@ -249,6 +298,8 @@ class AdminCLI:
         
         if answer['action'] == 'update':
             self.run_command('python3 scripts/stock_chip_analyzer.py')
+        elif answer['action'] == 'distribution':
+            self.run_command('python3 scripts/stock_chip_distribution.py')
 
     def historical_technical_menu(self):
         """技术评分菜单"""
@@ -260,6 +311,8 @@ class AdminCLI:
                 message="请选择操作",
                 choices=[
                     ('更新今日技术评分', 'update'),
+                    ('更新每日技术指标', 'indicators'),
+                    ('生成每日推荐', 'recommend'),
                     ('返回上级菜单', 'back')
                 ]
             )
@@ -269,6 +322,10 @@ class AdminCLI:
         
         if answer['action'] == 'update':
             self.run_command('python3 scripts/stock_technical_scorer.py')
+        elif answer['action'] == 'indicators':
+            self.run_command('python3 scripts/stock_daily_indicators.py')
+        elif answer['action'] == 'recommend':
+            self.run_command('python3 scripts/stock_recommender.py')
 
     def collect_menu(self):
         """数据采集菜单"""
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
-from sqlalchemy import text, create_engine
-from config.database import DB_CONFIG_READER
+from sqlalchemy import text
+from apis.db import engine
+from apis.response_cache import cached_response
 from decimal import Decimal
 import datetime
 
@@ -13,12 +14,8 @@ STRATEGY_TYPE_MAP = {
     'potential': '潜力'
 }
 
-engine = create_engine(
-    f"mysql+pymysql://{DB_CONFIG_READER['user']}:{DB_CONFIG_READER['password']}"
-    f"@{DB_CONFIG_READER['host']}/{DB_CONFIG_READER['database']}?charset=utf8mb4"
-)
-
 @chip_analysis_bp.route('/api/chip/analysis', methods=['GET'])
+@cached_response
 def get_chip_analysis():
     try:
         # 获取请求参数
@@ -91,6 +88,8 @@ def get_chip_analysis():
                     sca.profit_chip_ratio,
                     sca.locked_chip_ratio,
                     sca.floating_chip_ratio,
+                    sca.avg_cost,
+                    sca.concentration_90,
                     sca.rank_num
                 FROM stock_chip_analysis sca
                 WHERE sca.analysis_date = :date
@@ -120,6 +119,8 @@ def get_chip_analysis():
                 'locked_chip_ratio_display': '{:.2f}'.format(float(row.locked_chip_ratio) * 100),
                 'floating_chip_ratio': float(row.floating_chip_ratio),
                 'floating_chip_ratio_display': '{:.2f}'.format(float(row.floating_chip_ratio) * 100),
+                'avg_cost': str(row.avg_cost) if row.avg_cost is not None else None,
+                'concentration_90': float(row.concentration_90) if row.concentration_90 is not None else None,
                 'rank_num': row.rank_num
             } for row in result]
 
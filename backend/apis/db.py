@@ -0,0 +1,100 @@
+"""
+HTTP 服务共享的数据库连接
+
+所有蓝图共用同一个只读引擎和连接池（每个 gunicorn worker 进程一个），
+连接池参数可在 config/database.py 的 DB_POOL_CONFIG 中覆盖。
+"""
+import os
+import time
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+import config.database as db_config
+from config.database import DB_CONFIG_READER
+
+# 连接池默认配置
+DEFAULT_POOL_CONFIG = {
+    'pool_size': 5,          # 常驻连接数
+    'max_overflow': 5,       # 高峰时允许额外创建的连接数
+    'pool_timeout': 10,      # 等待空闲连接的超时时间（秒）
+    'pool_recycle': 3600,    # 连接最长使用时间（秒），需小于 MySQL wait_timeout
+    'pool_pre_ping': True    # 取出连接前检测连接是否可用
+}
+
+POOL_CONFIG = {**DEFAULT_POOL_CONFIG, **getattr(db_config, 'DB_POOL_CONFIG', {})}
+
+class PoolStats:
+    """连接池取用统计（进程内累计）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.waits = 0
+            self.timeouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def record(self, seconds, timeout=False):
+        """记录一次取连接的等待时间"""
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            # 超过 1 毫秒视为需要等待（创建新连接或等待其他请求归还）
+            if seconds > 0.001:
+                self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            total = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.wait_seconds / total * 1000, 3) if total else 0.0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 3)
+            }
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(QueuePool):
+    """记录取连接等待时间的 QueuePool"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record(time.perf_counter() - start, timeout=True)
+            raise
+        pool_stats.record(time.perf_counter() - start)
+        return connection
+
+# 创建数据库连接
+engine = create_engine(
+    f"mysql+pymysql://{DB_CONFIG_READER['user']}:{DB_CONFIG_READER['password']}"
+    f"@{DB_CONFIG_READER['host']}/{DB_CONFIG_READER['database']}?charset=utf8mb4",
+    poolclass=InstrumentedQueuePool,
+    **POOL_CONFIG
+)
+
+def get_pool_status():
+    """返回当前进程的连接池配置、占用情况和取用统计"""
+    pool = engine.pool
+    return {
+        'pid': os.getpid(),
+        'config': POOL_CONFIG,
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'idle': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'stats': pool_stats.snapshot()
+    }
@@ -0,0 +1,135 @@
+"""
+按交易日更新的只读接口的进程内响应缓存
+
+评分、推荐和筹码分析每天只在夜间任务后变化，缓存按"接口路径 + 规范化的查询参数"
+保存响应内容（LRU + TTL），并返回 ETag，客户端带 If-None-Match 请求时返回 304。
+夜间任务通过 utils.cache_version 更新版本文件，使所有 worker 的缓存失效。
+"""
+import time
+import hashlib
+import threading
+import functools
+from collections import OrderedDict, namedtuple
+from flask import request, make_response, current_app
+from utils.cache_version import get_cache_version
+
+# 最多缓存的响应数（每个 worker 进程）
+CACHE_MAX_ENTRIES = 512
+
+# 缓存有效期（秒），任务与服务不在同一台机器时依赖该时间过期
+CACHE_TTL = 600
+
+CacheEntry = namedtuple('CacheEntry', ['body', 'mimetype', 'etag', 'created_at'])
+
+class ResponseCache:
+    """线程安全的 LRU + TTL 响应缓存"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = get_cache_version()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        """版本文件变化时清空缓存（需持有锁）"""
+        version = get_cache_version()
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+            self.invalidations += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    def get(self, key):
+        """读取未过期的缓存，并记录命中率"""
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry and time.time() - entry.created_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, body, mimetype):
+        """保存响应内容，超出容量时淘汰最久未使用的缓存"""
+        entry = CacheEntry(body, mimetype, hashlib.md5(body).hexdigest(), time.time())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        """缓存条目数、占用内存和命中率"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+response_cache = ResponseCache()
+
+def cache_key():
+    """接口路径 + 排序后的非空查询参数"""
+    params = sorted((k, v) for k, v in request.args.items(multi=True) if v != '')
+    return request.path, tuple(params)
+
+def cached_response(view):
+    """缓存接口的成功响应（200），并按 ETag 返回 304"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = cache_key()
+        entry = response_cache.get(key)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = response_cache.put(key, response.get_data(), response.mimetype)
+
+        if request.if_none_match.contains(entry.etag):
+            response_cache.record_not_modified()
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        # 客户端可保存响应，但每次使用前需用 ETag 向服务端确认
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
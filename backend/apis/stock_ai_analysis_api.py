@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from sqlalchemy import text, create_engine
+from sqlalchemy import text
 from config.config import AI_API_KEY, AI_API_URL
-from config.database import DB_CONFIG_READER
+from apis.db import engine
+from utils.stock_registry import get_registry
+from apis.technical_api import load_daily_indicators, classify_crossover, classify_support_resistance
 import logging
 import requests
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -12,11 +14,6 @@ ai_analysis_bp = Blueprint('ai_analysis', __name__)
 # 配置日志
 logger = logging.getLogger(__name__)
 
-# 创建数据库连接
-engine = create_engine(
-    f"mysql+pymysql://{DB_CONFIG_READER['user']}:{DB_CONFIG_READER['password']}"
-    f"@{DB_CONFIG_READER['host']}/{DB_CONFIG_READER['database']}?charset=utf8mb4"
-)
 
 class AIAnalyzer:
     def __init__(self):
@@ -91,117 +88,24 @@ def get_technical_analysis(stock_code, date):
                 return f"当前最新数据更新至 {latest_date.latest_date.strftime('%Y-%m-%d')}"
 
             # 先获取股票基本信息
-            basic_info = conn.execute(text("""
-                SELECT stock_code, stock_name
-                FROM stocks
-                WHERE stock_code = :code
-            """), {'code': stock_code}).fetchone()
+            stock_name = get_registry(engine).get_name(stock_code)
 
-            if not basic_info:
+            if not stock_name:
                 return f"未找到股票代码 {stock_code} 的信息"
 
-            # 获取均线数据
-            ma_result = conn.execute(text("""
-                WITH RECURSIVE date_series AS (
-                    SELECT MIN(trade_date) as date_range_start
-                    FROM stock_historical_quotes
-                    WHERE trade_date >= DATE_SUB(:date, INTERVAL 250 DAY)
-                ),
-                moving_averages AS (
-                    SELECT 
-                        stock_code,
-                        trade_date,
-                        close_price,
-                        volume,
-                        AVG(close_price) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 4 PRECEDING AND CURRENT ROW
-                        ) AS ma_5,
-                        AVG(close_price) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                        ) AS ma_20,
-                        AVG(close_price) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                        ) AS ma_60,
-                        AVG(close_price) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 99 PRECEDING AND CURRENT ROW
-                        ) AS ma_100,
-                        AVG(close_price) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 199 PRECEDING AND CURRENT ROW
-                        ) AS ma_200
-                    FROM stock_historical_quotes
-                    WHERE stock_code = :code
-                        AND trade_date >= (
-                            SELECT date_range_start FROM date_series
-                        )
-                )
-                SELECT *
-                FROM moving_averages
-                WHERE trade_date = :date
-            """), {'code': stock_code, 'date': date}).fetchone()
+            # 获取均线、成交量、均线交叉和支撑阻力指标（每日预先计算的指标表）
+            indicators = load_daily_indicators(conn, stock_code, date)
 
-            if not ma_result:
-                return f"未能计算股票 {stock_code} 在 {date} 的均线数据，可能历史数据不足"
+            if not indicators:
+                return f"未能计算股票 {stock_code} 在 {date} 的技术指标，可能历史数据不足"
 
-            # 获取成交量数据和均线
-            volume_result = conn.execute(text("""
-                WITH RECURSIVE date_series AS (
-                    SELECT MIN(trade_date) as date_range_start
-                    FROM stock_historical_quotes
-                    WHERE trade_date >= DATE_SUB(:date, INTERVAL 250 DAY)
-                ),
-                volume_averages AS (
-                    SELECT 
-                        stock_code,
-                        trade_date,
-                        volume,
-                        AVG(volume) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 4 PRECEDING AND CURRENT ROW
-                        ) AS volume_ma5,
-                        AVG(volume) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                        ) AS volume_ma20,
-                        AVG(volume) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                        ) AS volume_ma60,
-                        AVG(volume) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 99 PRECEDING AND CURRENT ROW
-                        ) AS volume_ma100,
-                        AVG(volume) OVER (
-                            PARTITION BY stock_code 
-                            ORDER BY trade_date 
-                            ROWS BETWEEN 199 PRECEDING AND CURRENT ROW
-                        ) AS volume_ma200
-                    FROM stock_historical_quotes
-                    WHERE stock_code = :code
-                        AND trade_date >= (
-                            SELECT date_range_start FROM date_series
-                        )
-                )
-                SELECT *
-                FROM volume_averages
-                WHERE trade_date = :date
-            """), {'code': stock_code, 'date': date}).fetchone()
-
-            if not volume_result:
-                return f"未能获取股票 {stock_code} 在 {date} 的成交量数据"
+            cross_result = classify_crossover(indicators)
+            support_result = classify_support_resistance(indicators)
+            close_price = indicators['close_price']
+            vwap_20d = indicators['vwap_20d']
+            range_middle = (indicators['max_price_20d'] + indicators['min_price_20d']) / 2
+            price_position = '高于加权均价' if vwap_20d is not None and close_price > vwap_20d else '低于加权均价'
+            price_range_position = '价格区间上半部' if close_price >= range_middle else '价格区间下半部'
 
             # 获取三连阳数据
             bullish_result = conn.execute(text("""
@@ -307,154 +211,48 @@ def get_technical_analysis(stock_code, date):
                 FROM pattern_analysis
             """), {'code': stock_code, 'date': date}).fetchone()
 
-            # 获取支撑阻力位数据
-            support_result = conn.execute(text("""
-                WITH price_levels AS (
-                    SELECT 
-                        stock_code,
-                        trade_date,
-                        close_price,
-                        high_price,
-                        low_price,
-                        volume,
-                        MAX(high_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 5 PRECEDING) AS max_price_5d,
-                        MIN(low_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 5 PRECEDING) AS min_price_5d,
-                        MAX(high_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 10 PRECEDING) AS max_price_10d,
-                        MIN(low_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 10 PRECEDING) AS min_price_10d,
-                        MAX(high_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING) AS max_price_20d,
-                        MIN(low_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING) AS min_price_20d,
-                        SUM(close_price * volume) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING) / 
-                        NULLIF(SUM(volume) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING), 0) AS vwap_20d,
-                        AVG(volume) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING) AS avg_volume_20d,
-                        (close_price - LAG(close_price, 20) OVER (PARTITION BY stock_code ORDER BY trade_date)) / 
-                        NULLIF(LAG(close_price, 20) OVER (PARTITION BY stock_code ORDER BY trade_date), 0) * 100 AS price_change_rate_20d
-                    FROM stock_historical_quotes
-                    WHERE stock_code = :code
-                        AND trade_date >= DATE_SUB(:date, INTERVAL 60 DAY)
-                ),
-                support_resistance_analysis AS (
-                    SELECT 
-                        *,
-                        CASE 
-                            WHEN close_price > vwap_20d THEN '高于加权均价'
-                            ELSE '低于加权均价'
-                        END AS price_position,
-                        CASE
-                            WHEN low_price >= min_price_20d AND volume > avg_volume_20d * 1.5 THEN '强支撑'
-                            WHEN low_price >= min_price_20d THEN '一般支撑'
-                            ELSE '弱支撑'
-                        END AS support_strength,
-                        CASE
-                            WHEN high_price <= max_price_20d AND volume > avg_volume_20d * 1.5 THEN '强阻力'
-                            WHEN high_price <= max_price_20d THEN '一般阻力'
-                            ELSE '弱阻力'
-                        END AS resistance_strength,
-                        CASE
-                            WHEN close_price >= (max_price_20d + min_price_20d) / 2 THEN '价格区间上半部'
-                            ELSE '价格区间下半部'
-                        END AS price_range_position,
-                        CASE
-                            WHEN volume > avg_volume_20d * 1.5 THEN '放量'
-                            WHEN volume < avg_volume_20d * 0.7 THEN '缩量'
-                            ELSE '量能一般'
-                        END AS volume_character
-                    FROM price_levels
-                )
-                SELECT * FROM support_resistance_analysis
-                WHERE trade_date = :date
-            """), {'code': stock_code, 'date': date}).fetchone()
-
-            # 获取均线交叉数据
-            cross_result = conn.execute(text("""
-                WITH moving_averages AS (
-                    SELECT 
-                        stock_code,
-                        trade_date,
-                        close_price,
-                        volume,
-                        AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 4 PRECEDING) AS ma_5,
-                        AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 19 PRECEDING) AS ma_20,
-                        AVG(volume) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 19 PRECEDING) AS volume_ma20
-                    FROM stock_historical_quotes
-                    WHERE stock_code = :code
-                        AND trade_date >= DATE_SUB(:date, INTERVAL 30 DAY)
-                ),
-                crossover_analysis AS (
-                    SELECT 
-                        m.*,
-                        LAG(ma_5) OVER (PARTITION BY stock_code ORDER BY trade_date) AS prev_ma_5,
-                        LAG(ma_20) OVER (PARTITION BY stock_code ORDER BY trade_date) AS prev_ma_20,
-                        ABS(ma_5 - ma_20) / NULLIF(ma_20, 0) * 100 AS cross_strength,
-                        (ma_5 - LAG(ma_5, 5) OVER (PARTITION BY stock_code ORDER BY trade_date)) 
-                            / NULLIF(LAG(ma_5, 5) OVER (PARTITION BY stock_code ORDER BY trade_date), 0) * 100 AS ma_5_change,
-                        (ma_20 - LAG(ma_20, 5) OVER (PARTITION BY stock_code ORDER BY trade_date))
-                            / NULLIF(LAG(ma_20, 5) OVER (PARTITION BY stock_code ORDER BY trade_date), 0) * 100 AS ma_20_change,
-                        volume / NULLIF(volume_ma20, 0) AS volume_ratio
-                    FROM moving_averages m
-                )
-                SELECT 
-                    *,
-                    CASE 
-                        WHEN prev_ma_5 < prev_ma_20 AND ma_5 > ma_20 THEN 
-                            CASE
-                                WHEN cross_strength >= 1 AND ma_5_change > 0 AND volume_ratio >= 1.5 THEN '强金叉'
-                                WHEN cross_strength >= 0.5 AND ma_5_change > 0 THEN '金叉'
-                                ELSE '弱金叉'
-                            END
-                        WHEN prev_ma_5 > prev_ma_20 AND ma_5 < ma_20 THEN 
-                            CASE
-                                WHEN cross_strength >= 1 AND ma_5_change < 0 AND volume_ratio >= 1.5 THEN '强死叉'
-                                WHEN cross_strength >= 0.5 AND ma_5_change < 0 THEN '死叉'
-                                ELSE '弱死叉'
-                            END
-                        ELSE '无交叉'
-                    END AS cross_type
-                FROM crossover_analysis
-                WHERE trade_date = :date
-            """), {'code': stock_code, 'date': date}).fetchone()
-
         # 2. 构建AI分析的prompt
         analysis_prompt = f"""
-        股票代码：{basic_info.stock_code}
-        股票名称：{basic_info.stock_name}
+        股票代码：{stock_code}
+        股票名称：{stock_name}
         分析日期：{date}
 
         我已经基于以下 SQL 策略计算出技术指标，请结合这些指标分析股票趋势和交易信号：
         技术指标
         1. 均线分析：
-          - MA5=${ma_result.ma_5:.2f}
-          - MA20=${ma_result.ma_20:.2f}
-          - MA60=${ma_result.ma_60:.2f}
-          - MA100=${ma_result.ma_100:.2f}
-          - MA200=${ma_result.ma_200:.2f}
-          - 均线交叉：{cross_result.cross_type}
-          - 交叉强度：{cross_result.cross_strength:.2f}%
-          - MA5变化率：{cross_result.ma_5_change:.2f}%
-          - MA20变化率：{cross_result.ma_20_change:.2f}%
+          - MA5=${indicators['ma_5']:.2f}
+          - MA20=${indicators['ma_20']:.2f}
+          - MA60=${indicators['ma_60']:.2f}
+          - MA100=${indicators['ma_100']:.2f}
+          - MA200=${indicators['ma_200']:.2f}
+          - 均线交叉：{cross_result['cross_type']}
+          - 交叉强度：{cross_result['cross_strength']:.2f}%
+          - MA5变化率：{indicators['ma_5_change']:.2f}%
+          - MA20变化率：{indicators['ma_20_change']:.2f}%
         2. 成交量分析：
-          - 当前成交量：{volume_result.volume/10000:.2f}万手
-          - 5日均量：{volume_result.volume_ma5/10000:.2f}万手
-          - 20日均量：{volume_result.volume_ma20/10000:.2f}万手
-          - 60日均量：{volume_result.volume_ma60/10000:.2f}万手
-          - 100日均量：{volume_result.volume_ma100/10000:.2f}万手
-          - 200日均量：{volume_result.volume_ma200/10000:.2f}万手
-          - 量比（当前/20日均量）：{(volume_result.volume/volume_result.volume_ma20):.2f}
+          - 当前成交量：{indicators['volume']/10000:.2f}万手
+          - 5日均量：{indicators['volume_ma5']/10000:.2f}万手
+          - 20日均量：{indicators['volume_ma20']/10000:.2f}万手
+          - 60日均量：{indicators['volume_ma60']/10000:.2f}万手
+          - 100日均量：{indicators['volume_ma100']/10000:.2f}万手
+          - 200日均量：{indicators['volume_ma200']/10000:.2f}万手
+          - 量比（当前/20日均量）：{(indicators['volume']/indicators['volume_ma20']):.2f}
         5. K线形态：
           - 最近3日{bullish_result.pattern_type}，累计涨幅{bullish_result.total_gain:.2f}%。
           - 今日吞没形态：{engulfing_result.engulfing_type or '无形态'}。
         6. 支撑与阻力：
-          - 5日支撑位：${support_result.min_price_5d:.2f}
-          - 10日支撑位：${support_result.min_price_10d:.2f}
-          - 20日支撑位：${support_result.min_price_20d:.2f}
-          - 5日阻力位：${support_result.max_price_5d:.2f}
-          - 10日阻力位：${support_result.max_price_10d:.2f}
-          - 20日阻力位：${support_result.max_price_20d:.2f}
-          - 20日加权均价：${support_result.vwap_20d:.2f}
-          - 支撑强度：{support_result.support_strength}
-          - 阻力强度：{support_result.resistance_strength}
-          - 价格位置：{support_result.price_position}
-          - 区间位置：{support_result.price_range_position}
-          - 量能特征：{support_result.volume_character}
+          - 5日支撑位：${indicators['min_price_5d']:.2f}
+          - 10日支撑位：${indicators['min_price_10d']:.2f}
+          - 20日支撑位：${indicators['min_price_20d']:.2f}
+          - 5日阻力位：${indicators['max_price_5d']:.2f}
+          - 10日阻力位：${indicators['max_price_10d']:.2f}
+          - 20日阻力位：${indicators['max_price_20d']:.2f}
+          - 20日加权均价：${vwap_20d:.2f}
+          - 支撑强度：{support_result['support_strength']}
+          - 阻力强度：{support_result['resistance_strength']}
+          - 价格位置：{price_position}
+          - 区间位置：{price_range_position}
+          - 量能特征：{support_result['volume_character']}
 
         分析需求
         1. 趋势分析：判断当前股票是处于多头、空头还是震荡行情。
@@ -1,8 +1,8 @@
 from flask import Blueprint, jsonify, request
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 import logging
-from config.database import DB_CONFIG_READER
-from sqlalchemy import create_engine
+from apis.db import engine
+from utils.stock_registry import get_registry
 
 # 创建蓝图
 details_bp = Blueprint('details', __name__)
@@ -10,11 +10,15 @@ details_bp = Blueprint('details', __name__)
 # 配置日志
 logger = logging.getLogger(__name__)
 
-# 创建数据库连接
-engine = create_engine(
-    f"mysql+pymysql://{DB_CONFIG_READER['user']}:{DB_CONFIG_READER['password']}"
-    f"@{DB_CONFIG_READER['host']}/{DB_CONFIG_READER['database']}?charset=utf8mb4"
-)
+# 批量行情接口每次最多查询的股票数
+MAX_QUOTE_CODES = 300
+
+# 走势图（sparkline）的收盘价个数
+SPARKLINE_POINTS = 20
+
+# 走势图向前读取的自然日范围，覆盖 SPARKLINE_POINTS 个交易日（含长假）
+SPARKLINE_LOOKBACK_DAYS = 60
+
 
 @details_bp.route('/<stock_code>/details', methods=['GET'])
 def get_stock_details(stock_code):
@@ -200,23 +204,11 @@ def search_stocks():
         return jsonify([])
     
     try:
-        with engine.connect() as conn:
-            sql = """
-            SELECT stock_code as code, stock_name as name
-            FROM stocks
-            WHERE stock_code LIKE :keyword
-            OR stock_name LIKE :keyword
-            LIMIT 50
-            """
-            results = conn.execute(
-                text(sql), 
-                {'keyword': f'%{keyword}%'}
-            ).fetchall()
-            
-            return jsonify([
-                {'code': row.code, 'name': row.name}
-                for row in results
-            ])
+        results = get_registry(engine).search(keyword, limit=50)
+        return jsonify([
+            {'code': code, 'name': info.name}
+            for code, info in results
+        ])
     except Exception as e:
         logger.error(f"搜索股票失败: {str(e)}")
         return jsonify({'error': str(e)}), 500 
@@ -244,4 +236,96 @@ def get_latest_trade_date(stock_code):
             
     except Exception as e:
         logger.error(f"获取最新交易日期失败: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@details_bp.route('/quotes', methods=['GET', 'POST'])
+def get_batch_quotes():
+    """批量获取股票最新行情（自选股刷新）
+
+    POST JSON {"codes": [...]} 或 GET ?codes=600000,000001，最多 MAX_QUOTE_CODES 只。
+    每只股票先按主键取最新交易日，再读取其前 SPARKLINE_LOOKBACK_DAYS 天的行情，
+    一条查询返回全部股票的最新行情、前收盘价和最近 SPARKLINE_POINTS 个收盘价。
+
+    Returns:
+        {stock_code: {name, trade_date, price, pre_close, open, high, low, volume,
+                      change_ratio, sparkline}}，没有行情的股票不返回
+    """
+    if request.method == 'POST':
+        codes = (request.get_json(silent=True) or {}).get('codes') or []
+    else:
+        codes = request.args.get('codes', '').split(',')
+    if not isinstance(codes, list):
+        return jsonify({'error': 'codes 必须为股票代码列表'}), 400
+
+    # 去重并保持顺序
+    codes = list(dict.fromkeys(str(code).strip() for code in codes if str(code).strip()))
+    if not codes:
+        return jsonify({})
+    if len(codes) > MAX_QUOTE_CODES:
+        return jsonify({'error': f'每次最多查询 {MAX_QUOTE_CODES} 只股票'}), 400
+
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT stock_code, trade_date, open_price, close_price,
+                       high_price, low_price, volume, change_ratio, rn
+                FROM (
+                    SELECT q.stock_code, q.trade_date, q.open_price, q.close_price,
+                           q.high_price, q.low_price, q.volume, q.change_ratio,
+                           ROW_NUMBER() OVER (PARTITION BY q.stock_code ORDER BY q.trade_date DESC) AS rn
+                    FROM stock_historical_quotes q
+                    JOIN (
+                        SELECT stock_code, MAX(trade_date) AS last_date
+                        FROM stock_historical_quotes
+                        WHERE stock_code IN :codes
+                        GROUP BY stock_code
+                    ) latest ON latest.stock_code = q.stock_code
+                    WHERE q.stock_code IN :codes
+                      AND q.trade_date >= DATE_SUB(latest.last_date, INTERVAL :lookback DAY)
+                ) recent
+                WHERE rn <= :points
+                ORDER BY stock_code, trade_date
+            """).bindparams(bindparam('codes', expanding=True)), {
+                'codes': codes,
+                'lookback': SPARKLINE_LOOKBACK_DAYS,
+                'points': SPARKLINE_POINTS
+            }).fetchall()
+
+        bars = {}
+        for row in rows:
+            bars.setdefault(row.stock_code, []).append(row)
+
+        registry = get_registry(engine)
+        quotes = {}
+        for code in codes:
+            if code not in bars:
+                continue
+            latest = bars[code][-1]
+            price = float(latest.close_price)
+            change_ratio = float(latest.change_ratio) if latest.change_ratio is not None else None
+            if len(bars[code]) > 1:
+                pre_close = float(bars[code][-2].close_price)
+            elif change_ratio is not None:
+                pre_close = round(price / (1 + change_ratio / 100), 2)
+            else:
+                pre_close = None
+            if change_ratio is None and pre_close:
+                change_ratio = round((price - pre_close) / pre_close * 100, 2)
+
+            quotes[code] = {
+                'name': registry.get_name(code),
+                'trade_date': latest.trade_date.strftime('%Y-%m-%d'),
+                'price': price,
+                'pre_close': pre_close,
+                'open': float(latest.open_price),
+                'high': float(latest.high_price),
+                'low': float(latest.low_price),
+                'volume': int(latest.volume),
+                'change_ratio': change_ratio,
+                'sparkline': [float(row.close_price) for row in bars[code]]
+            }
+        return jsonify(quotes)
+
+    except Exception as e:
+        logger.error(f"批量获取行情失败: {str(e)}")
+        return jsonify({'error': str(e)}), 500
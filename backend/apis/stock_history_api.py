@@ -1,15 +1,9 @@
 from flask import Blueprint, request, jsonify
-from sqlalchemy import text, create_engine
-from config.database import DB_CONFIG_READER
+from sqlalchemy import text
+from apis.db import engine
 
 history_bp = Blueprint('history', __name__)
 
-# 创建数据库连接
-engine = create_engine(
-    f"mysql+pymysql://{DB_CONFIG_READER['user']}:{DB_CONFIG_READER['password']}"
-    f"@{DB_CONFIG_READER['host']}/{DB_CONFIG_READER['database']}?charset=utf8mb4"
-)
-
 @history_bp.route('/stocks/<stock_code>/history', methods=['GET'])
 def get_recent_history(stock_code):
     days = request.args.get('days', default=5, type=int)
@@ -1,16 +1,13 @@
 from flask import Blueprint, request, jsonify
-from sqlalchemy import text, create_engine
-from config.database import DB_CONFIG_READER
+from sqlalchemy import text
+from apis.db import engine
+from apis.response_cache import cached_response
 
 recommendation_bp = Blueprint('recommendation', __name__)
 
-# 创建数据库连接
-engine = create_engine(
-    f"mysql+pymysql://{DB_CONFIG_READER['user']}:{DB_CONFIG_READER['password']}"
-    f"@{DB_CONFIG_READER['host']}/{DB_CONFIG_READER['database']}?charset=utf8mb4"
-)
 
 @recommendation_bp.route('/recommendations', methods=['GET'])
+@cached_response
 def get_recommendations():
     # 获取请求的日期参数，如果没有则使用最新交易日
     requested_date = request.args.get('date')
@@ -24,7 +21,7 @@ def get_recommendations():
                     SELECT recommend_date, stock_code, stock_name, industry, 
                            current_price, total_score, recommendation_level, reasons
                     FROM stock_recommendations
-                    WHERE DATE(recommend_date) = DATE(:date)
+                    WHERE recommend_date = DATE(:date)
                     ORDER BY total_score DESC
                 """), {'date': requested_date}).fetchall()
                 
@@ -40,8 +37,8 @@ def get_recommendations():
                     SELECT recommend_date, stock_code, stock_name, industry, 
                            current_price, total_score, recommendation_level, reasons
                     FROM stock_recommendations
-                    WHERE DATE(recommend_date) = (
-                        SELECT DATE(MAX(recommend_date)) 
+                    WHERE recommend_date = (
+                        SELECT MAX(recommend_date) 
                         FROM stock_recommendations
                     )
                     ORDER BY total_score DESC
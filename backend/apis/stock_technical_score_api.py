@@ -1,68 +1,92 @@
 from flask import Blueprint, request, jsonify
-from sqlalchemy import text, create_engine
-from config.database import DB_CONFIG_READER
+from sqlalchemy import text
+from apis.db import engine
+from apis.response_cache import cached_response
 from decimal import Decimal
 
 technical_score_bp = Blueprint('technical_score', __name__)
 
-engine = create_engine(
-    f"mysql+pymysql://{DB_CONFIG_READER['user']}:{DB_CONFIG_READER['password']}"
-    f"@{DB_CONFIG_READER['host']}/{DB_CONFIG_READER['database']}?charset=utf8mb4"
-)
+# 每页最多返回的评分条数
+MAX_PAGE_SIZE = 500
 
 @technical_score_bp.route('/scores', methods=['GET'])
+@cached_response
 def get_technical_scores():
-    """获取股票技术评分排名"""
+    """获取股票技术评分排名
+
+    按预先计算的排名分页读取（使用 (score_date, score_rank) 索引），
+    指定行业时按行业内排名分页。
+
+    Query Args:
+        date: 评分日期，默认最新评分日
+        limit: 每页条数，默认 50，范围 1 ~ MAX_PAGE_SIZE
+        start_rank: 从该排名开始返回，默认 1（需 >= 1），下一页使用返回的 next_rank
+        industry: 只返回该行业的股票
+        min_score, max_score: 总分范围
+    """
     date = request.args.get('date')
-    limit = request.args.get('limit', default=50, type=int)
+    limit = max(1, min(request.args.get('limit', default=50, type=int), MAX_PAGE_SIZE))
+    start_rank = request.args.get('start_rank', default=1, type=int)
+    if start_rank < 1:
+        return jsonify({'error': 'start_rank 必须大于等于 1'}), 400
+    industry = request.args.get('industry')
+    min_score = request.args.get('min_score', type=int)
+    max_score = request.args.get('max_score', type=int)
     
     try:
         with engine.connect() as conn:
-            if date:
-                # 获取指定日期的评分排名
-                result = conn.execute(text("""
-                    SELECT s.stock_code, s.stock_name, s.industry,
-                           ts.total_score, ts.trend_score, ts.momentum_score, 
-                           ts.volatility_score, ts.volume_score, ts.bollinger_score,
-                           ts.ma5, ts.ma20, ts.ma60, ts.vol_ma5, ts.vol_ma20,
-                           ts.volatility, ts.boll_upper, ts.boll_lower,
-                           ts.macd, ts.macd_signal,
-                           q.close_price,
-                           q.change_ratio
-                    FROM stock_technical_scores ts
-                    JOIN stocks s ON ts.stock_code = s.stock_code
-                    JOIN stock_historical_quotes q ON ts.stock_code = q.stock_code 
-                        AND DATE(ts.score_date) = DATE(q.trade_date)
-                    WHERE DATE(ts.score_date) = DATE(:date)
-                    ORDER BY ts.total_score DESC
-                    LIMIT :limit
-                """), {'date': date, 'limit': limit}).fetchall()
-            else:
-                # 获取最新日期的评分排名
-                result = conn.execute(text("""
-                    SELECT s.stock_code, s.stock_name, s.industry,
-                           ts.total_score, ts.trend_score, ts.momentum_score, 
-                           ts.volatility_score, ts.volume_score, ts.bollinger_score,
-                           ts.ma5, ts.ma20, ts.ma60, ts.vol_ma5, ts.vol_ma20,
-                           ts.volatility, ts.boll_upper, ts.boll_lower,
-                           ts.macd, ts.macd_signal,
-                           q.close_price,
-                           q.change_ratio
-                    FROM stock_technical_scores ts
-                    JOIN stocks s ON ts.stock_code = s.stock_code
-                    JOIN stock_historical_quotes q ON ts.stock_code = q.stock_code 
-                        AND DATE(ts.score_date) = DATE(q.trade_date)
-                    WHERE DATE(ts.score_date) = (
-                        SELECT DATE(MAX(score_date)) FROM stock_technical_scores
-                    )
-                    ORDER BY ts.total_score DESC
-                    LIMIT :limit
-                """), {'limit': limit}).fetchall()
+            if not date:
+                # 获取最新评分日期
+                latest_date = conn.execute(text(
+                    "SELECT MAX(score_date) FROM stock_technical_scores"
+                )).scalar()
+                if not latest_date:
+                    return jsonify({'error': '没有评分数据'}), 404
+                date = latest_date.strftime('%Y-%m-%d')
+
+            rank_column = 'industry_rank' if industry else 'score_rank'
+            conditions = ['ts.score_date = :date', f'ts.{rank_column} >= :start_rank']
+            params = {'date': date, 'start_rank': start_rank, 'limit': limit + 1}
+            if industry:
+                conditions.append('ts.industry = :industry')
+                params['industry'] = industry
+            if min_score is not None:
+                conditions.append('ts.total_score >= :min_score')
+                params['min_score'] = min_score
+            if max_score is not None:
+                conditions.append('ts.total_score <= :max_score')
+                params['max_score'] = max_score
+
+            result = conn.execute(text(f"""
+                SELECT s.stock_code, s.stock_name,
+                       COALESCE(ts.industry, s.industry) AS industry,
+                       ts.score_rank, ts.industry_rank,
+                       ts.total_score, ts.trend_score, ts.momentum_score, 
+                       ts.volatility_score, ts.volume_score, ts.bollinger_score,
+                       ts.ma5, ts.ma20, ts.ma60, ts.vol_ma5, ts.vol_ma20,
+                       ts.volatility, ts.boll_upper, ts.boll_lower,
+                       ts.macd, ts.macd_signal,
+                       q.close_price,
+                       q.change_ratio
+                FROM stock_technical_scores ts
+                JOIN stocks s ON ts.stock_code = s.stock_code
+                JOIN stock_historical_quotes q ON ts.stock_code = q.stock_code 
+                    AND q.trade_date = ts.score_date
+                WHERE {' AND '.join(conditions)}
+                ORDER BY ts.{rank_column}
+                LIMIT :limit
+            """), params).fetchall()
+
+            # 多取一条判断是否还有下一页
+            next_rank = getattr(result[limit], rank_column) if len(result) > limit else None
+            result = result[:limit]
 
             scores = [{
                 'stock_code': row.stock_code,
                 'stock_name': row.stock_name,
                 'industry': row.industry,
+                'rank': row.score_rank,
+                'industry_rank': row.industry_rank,
                 'current_price': float(row.close_price),
                 'change_ratio': float(row.change_ratio),
                 'total_score': row.total_score,
@@ -110,6 +134,8 @@ def get_technical_scores():
 
             return jsonify({
                 'date': date,
+                'industry': industry,
+                'next_rank': next_rank,
                 'scores': scores
             })
             
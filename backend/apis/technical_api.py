@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
 from sqlalchemy import text
 import logging
-from config.database import DB_CONFIG_READER
-from sqlalchemy import create_engine
+import math
+from decimal import Decimal
+import pandas as pd
+from apis.db import engine
+from utils.daily_indicators import LOOKBACK_ROWS, QUOTE_COLUMNS, compute_daily_indicators
 
 # 创建蓝图
 technical_bp = Blueprint('technical', __name__)
@@ -10,11 +13,420 @@ technical_bp = Blueprint('technical', __name__)
 # 配置日志
 logger = logging.getLogger(__name__)
 
-# 创建数据库连接
-engine = create_engine(
-    f"mysql+pymysql://{DB_CONFIG_READER['user']}:{DB_CONFIG_READER['password']}"
-    f"@{DB_CONFIG_READER['host']}/{DB_CONFIG_READER['database']}?charset=utf8mb4"
-)
+# 形态识别读取的行情字段
+BAR_COLUMNS = QUOTE_COLUMNS + ['open_price']
+
+# 形态识别中前几个交易日需在当日之前的自然日范围内（对应原 SQL 的 INTERVAL 30 DAY）
+PATTERN_LOOKBACK_DAYS = 30
+
+def load_recent_bars(conn, stock_code, date, limit):
+    """读取股票截至某个交易日的最近 limit 条行情
+
+    Returns:
+        DataFrame: BAR_COLUMNS，按日期升序，价格和成交量为 float；当日无行情时返回 None
+    """
+    rows = conn.execute(text(f"""
+        SELECT {', '.join(BAR_COLUMNS)}
+        FROM stock_historical_quotes
+        WHERE stock_code = :code AND trade_date <= :date
+        ORDER BY trade_date DESC
+        LIMIT {int(limit)}
+    """), {'code': stock_code, 'date': date}).fetchall()
+    if not rows or pd.Timestamp(rows[0].trade_date) != pd.Timestamp(date):
+        return None
+
+    bars = pd.DataFrame(rows[::-1], columns=BAR_COLUMNS)
+    for column in BAR_COLUMNS[2:]:
+        bars[column] = bars[column].astype(float)
+    return bars
+
+def indicators_from_bars(bars):
+    """用最近 LOOKBACK_ROWS 条行情即时计算最后一个交易日的技术指标
+
+    Returns:
+        dict: 与 load_daily_indicators 相同的字段，缺失值为 None
+    """
+    indicators = compute_daily_indicators(bars[QUOTE_COLUMNS]).iloc[-1].to_dict()
+    indicators.update(bars.iloc[-1][['high_price', 'low_price', 'volume']].to_dict())
+    return {
+        k: None if isinstance(v, float) and math.isnan(v) else v
+        for k, v in indicators.items()
+    }
+
+def load_daily_indicators(conn, stock_code, date):
+    """读取股票某个交易日的技术指标
+
+    优先读取每日任务预先计算的 stock_daily_indicators（按主键读取一行）；
+    该日指标尚未生成时，加载当日及之前 LOOKBACK_ROWS 条行情即时计算。
+
+    Args:
+        conn: 数据库连接
+        stock_code (str): 股票代码
+        date (str): 交易日期
+
+    Returns:
+        dict: 指标及当日最高价、最低价、成交量，缺失值为 None；当日无行情时返回 None
+    """
+    row = conn.execute(text("""
+        SELECT i.*, q.high_price, q.low_price, q.volume
+        FROM stock_daily_indicators i
+        JOIN stock_historical_quotes q
+          ON q.stock_code = i.stock_code AND q.trade_date = i.trade_date
+        WHERE i.stock_code = :code AND i.trade_date = :date
+    """), {'code': stock_code, 'date': date}).mappings().first()
+    if row:
+        return {k: float(v) if isinstance(v, Decimal) else v for k, v in row.items()}
+
+    bars = load_recent_bars(conn, stock_code, date, LOOKBACK_ROWS)
+    return indicators_from_bars(bars) if bars is not None else None
+
+def _value(indicators, key):
+    """取指标值，缺失时返回 NaN（比较结果为 False，与 SQL 中 NULL 的判断一致）"""
+    value = indicators.get(key)
+    return float('nan') if value is None else float(value)
+
+def _ratio(numerator, denominator):
+    """除法，除数为 0 时返回 NaN（对应 SQL NULLIF）"""
+    return numerator / denominator if denominator else float('nan')
+
+def _rounded(value, digits=2):
+    """保留小数位，缺失值返回 None"""
+    return None if value is None or math.isnan(value) else round(value, digits)
+
+def classify_crossover(indicators):
+    """根据均线指标判断 MA5/MA20 交叉类型和可靠度
+
+    Returns:
+        dict: cross_type, cross_strength(%), ma_5_trend(%), ma_20_trend(%),
+            volume_ratio, reliability_score
+    """
+    ma_5, ma_20 = _value(indicators, 'ma_5'), _value(indicators, 'ma_20')
+    prev_ma_5, prev_ma_20 = _value(indicators, 'prev_ma_5'), _value(indicators, 'prev_ma_20')
+    ma_5_change, ma_20_change = _value(indicators, 'ma_5_change'), _value(indicators, 'ma_20_change')
+    volume_ratio = _value(indicators, 'volume_ratio')
+    cross_strength = _ratio(abs(ma_5 - ma_20), ma_20) * 100
+
+    golden = prev_ma_5 < prev_ma_20 and ma_5 > ma_20
+    dead = prev_ma_5 > prev_ma_20 and ma_5 < ma_20
+    if golden:
+        if cross_strength >= 1 and ma_5_change > 0 and volume_ratio >= 1.5:
+            cross_type = '强金叉'
+        elif cross_strength >= 0.5 and ma_5_change > 0:
+            cross_type = '金叉'
+        else:
+            cross_type = '弱金叉'
+    elif dead:
+        if cross_strength >= 1 and ma_5_change < 0 and volume_ratio >= 1.5:
+            cross_type = '强死叉'
+        elif cross_strength >= 0.5 and ma_5_change < 0:
+            cross_type = '死叉'
+        else:
+            cross_type = '弱死叉'
+    else:
+        cross_type = '无交叉'
+
+    # 交叉强度
+    if cross_strength >= 1:
+        score = 30
+    elif cross_strength >= 0.5:
+        score = 20
+    elif cross_strength >= 0.3:
+        score = 10
+    else:
+        score = 0
+    # 均线方向
+    if (golden and ma_5_change > 0 and ma_20_change > 0) or (dead and ma_5_change < 0 and ma_20_change < 0):
+        score += 30
+    elif (golden and ma_5_change > 0) or (dead and ma_5_change < 0):
+        score += 20
+    else:
+        score += 10
+    # 量能
+    if volume_ratio >= 2:
+        score += 20
+    elif volume_ratio >= 1.5:
+        score += 15
+    elif volume_ratio >= 1:
+        score += 10
+    # 均线间距
+    if cross_strength <= 3:
+        score += 20
+    elif cross_strength <= 5:
+        score += 15
+    elif cross_strength <= 8:
+        score += 10
+    else:
+        score += 5
+
+    return {
+        'cross_type': cross_type,
+        'cross_strength': _rounded(cross_strength),
+        'ma_5_trend': _rounded(ma_5_change),
+        'ma_20_trend': _rounded(ma_20_change),
+        'volume_ratio': _rounded(volume_ratio),
+        'reliability_score': score
+    }
+
+def _level_score(price, levels, compare):
+    """价格触及 5/10/20 日支撑（阻力）位的得分"""
+    for level, points in zip(levels, (30, 20, 10)):
+        if compare(price, level):
+            return points
+    return 0
+
+def classify_support_resistance(indicators):
+    """根据支撑阻力指标判断支撑、阻力强度及可靠度
+
+    Returns:
+        dict: support_strength, resistance_strength, price_position,
+            price_range_position, volume_character, support_reliability,
+            resistance_reliability
+    """
+    close = _value(indicators, 'close_price')
+    high, low, volume = _value(indicators, 'high_price'), _value(indicators, 'low_price'), _value(indicators, 'volume')
+    min_5, min_10, min_20 = (_value(indicators, f'min_price_{n}d') for n in (5, 10, 20))
+    max_5, max_10, max_20 = (_value(indicators, f'max_price_{n}d') for n in (5, 10, 20))
+    vwap, avg_volume = _value(indicators, 'vwap_20d'), _value(indicators, 'avg_volume_20d')
+    change_rate = _value(indicators, 'price_change_rate_20d')
+
+    if volume > avg_volume * 1.5:
+        volume_character, volume_score = '放量', 30
+    elif volume < avg_volume * 0.7:
+        volume_character, volume_score = '缩量', 0
+    else:
+        volume_character = '量能一般'
+        volume_score = 20 if volume > avg_volume * 1.2 else 10 if volume > avg_volume else 0
+
+    if low >= min_20:
+        support_strength = '强支撑' if volume > avg_volume * 1.5 else '一般支撑'
+    else:
+        support_strength = '弱支撑'
+    if high <= max_20:
+        resistance_strength = '强阻力' if volume > avg_volume * 1.5 else '一般阻力'
+    else:
+        resistance_strength = '弱阻力'
+
+    support_score = (
+        _level_score(close, (min_5, min_10, min_20), lambda p, level: p <= level)
+        + volume_score
+        + (20 if change_rate <= -10 else 15 if change_rate <= -5 else 10 if change_rate <= 0 else 5)
+    )
+    support_gap = _ratio(abs(min_5 - min_20), min_20) * 100
+    support_score += 20 if support_gap <= 2 else 15 if support_gap <= 5 else 10
+
+    resistance_score = (
+        _level_score(close, (max_5, max_10, max_20), lambda p, level: p >= level)
+        + volume_score
+        + (20 if change_rate >= 10 else 15 if change_rate >= 5 else 10 if change_rate >= 0 else 5)
+    )
+    resistance_gap = _ratio(abs(max_5 - max_20), max_20) * 100
+    resistance_score += 20 if resistance_gap <= 2 else 15 if resistance_gap <= 5 else 10
+
+    def reliability(score, name):
+        if score >= 80:
+            return f'{name}极强'
+        if score >= 60:
+            return f'{name}较强'
+        if score >= 40:
+            return f'{name}一般'
+        return f'{name}较弱'
+
+    return {
+        'support_strength': support_strength,
+        'resistance_strength': resistance_strength,
+        'price_position': '价格偏高' if close > vwap else '价格偏低',
+        'price_range_position': '价格偏上' if close >= (max_20 + min_20) / 2 else '价格偏下',
+        'volume_character': volume_character,
+        'support_reliability': reliability(support_score, '支撑'),
+        'resistance_reliability': reliability(resistance_score, '阻力')
+    }
+
+def _pattern_window(bars):
+    """返回当日及其前 PATTERN_LOOKBACK_DAYS 天内的行情（Series 列表，按日期升序）"""
+    dates = pd.to_datetime(bars['trade_date'])
+    window = bars[dates >= dates.iloc[-1] - pd.Timedelta(days=PATTERN_LOOKBACK_DAYS)]
+    return [bar for _, bar in window.iterrows()]
+
+def _gain(bar):
+    """K 线实体涨幅(%)，缺少该交易日时为 NaN"""
+    return _ratio(bar.close_price - bar.open_price, bar.open_price) * 100 if bar is not None else float('nan')
+
+def _bullish(bar):
+    return bar is not None and bar.close_price > bar.open_price
+
+def classify_three_bullish(bars):
+    """根据最近三个交易日的 K 线判断三连阳形态和可靠度
+
+    Args:
+        bars (DataFrame): 截至查询日的行情（BAR_COLUMNS，按日期升序）
+
+    Returns:
+        dict: day3, day1~day3_gain(%), total_gain(%), volume_ratio,
+            pattern_type, reliability_score, pattern_strength
+    """
+    window = _pattern_window(bars)
+    current = window[-1]
+    prev1 = window[-2] if len(window) >= 2 else None
+    prev2 = window[-3] if len(window) >= 3 else None
+
+    today_gain, prev1_gain, prev2_gain = _gain(current), _gain(prev1), _gain(prev2)
+    today_body, prev1_body, prev2_body = abs(today_gain), abs(prev1_gain), abs(prev2_gain)
+    total_gain = (_ratio(current.close_price - prev2.open_price, prev2.open_price) * 100
+                  if prev2 is not None else float('nan'))
+    vol_ratio = _ratio(current.volume, prev1.volume) if prev1 is not None else float('nan')
+    three_bullish = _bullish(current) and _bullish(prev1) and _bullish(prev2)
+
+    # 实体大小
+    if today_body >= 2 and prev1_body >= 2 and prev2_body >= 2:
+        score = 30
+    elif today_body >= 1 and prev1_body >= 1 and prev2_body >= 1:
+        score = 20
+    else:
+        score = 10
+    # 累计涨幅
+    score += 30 if total_gain >= 6 else 20 if total_gain >= 4 else 10 if total_gain >= 2 else 5
+    # 涨幅递增
+    if today_gain > prev1_gain and prev1_gain > prev2_gain:
+        score += 20
+    elif today_gain > prev1_gain or prev1_gain > prev2_gain:
+        score += 10
+    else:
+        score += 5
+    # 量能
+    score += 20 if vol_ratio > 1.5 else 15 if vol_ratio > 1.2 else 10 if vol_ratio > 1 else 5
+
+    if not three_bullish:
+        pattern_strength = '非三连阳'
+    elif total_gain >= 6 and vol_ratio > 1.5:
+        pattern_strength = '强势三连阳'
+    elif total_gain >= 4 and vol_ratio > 1.2:
+        pattern_strength = '标准三连阳'
+    else:
+        pattern_strength = '弱势三连阳'
+
+    return {
+        'day3': pd.Timestamp(current.trade_date).strftime('%Y-%m-%d'),
+        'day3_gain': _rounded(today_gain),
+        'day2_gain': _rounded(prev1_gain),
+        'day1_gain': _rounded(prev2_gain),
+        'total_gain': _rounded(total_gain),
+        'volume_ratio': _rounded(vol_ratio),
+        'pattern_type': '三连阳' if three_bullish else '否',
+        'reliability_score': score,
+        'pattern_strength': pattern_strength
+    }
+
+def classify_engulfing(bars):
+    """根据最近两个交易日的 K 线判断吞没形态和可靠度
+
+    Args:
+        bars (DataFrame): 截至查询日的行情（BAR_COLUMNS，按日期升序）
+
+    Returns:
+        dict: current_date, previous_date, engulfing_type(Bullish/Bearish/None),
+            reliability, reliability_level；前 PATTERN_LOOKBACK_DAYS 天内没有交易日时返回 None
+    """
+    window = _pattern_window(bars)
+    if len(window) < 2:
+        return None
+    current, prev = window[-1], window[-2]
+    open_price, close_price = current.open_price, current.close_price
+    high, low = current.high_price, current.low_price
+
+    body_length = abs(close_price - open_price)
+    upper_shadow = high - max(open_price, close_price)
+    lower_shadow = min(open_price, close_price) - low
+    price_range = _ratio(high - low, low) * 100
+    volume_ratio = _ratio(current.volume, prev.volume)
+    body_ratio = _ratio(body_length, high - low)
+
+    bullish = (prev.close_price < prev.open_price and close_price > open_price
+               and open_price < prev.close_price and close_price > prev.open_price)
+    bearish = (prev.close_price > prev.open_price and close_price < open_price
+               and open_price > prev.close_price and close_price < prev.open_price)
+
+    # 实体占比
+    score = 25 if body_ratio > 0.7 else 20 if body_ratio > 0.5 else 10 if body_ratio > 0.3 else 5
+    # 量能
+    volume_ratio = 0 if math.isnan(volume_ratio) else volume_ratio
+    score += 25 if volume_ratio > 2 else 20 if volume_ratio > 1.5 else 15 if volume_ratio > 1 else 10
+    # 振幅
+    if 2 <= price_range <= 5:
+        score += 20
+    elif 1 <= price_range <= 7:
+        score += 15
+    else:
+        score += 10
+    # 影线
+    if upper_shadow < body_length * 0.3 and lower_shadow < body_length * 0.3:
+        score += 15
+    elif upper_shadow < body_length * 0.5 and lower_shadow < body_length * 0.5:
+        score += 10
+    else:
+        score += 5
+    # 吞没形态
+    if bullish or bearish:
+        score += 15
+
+    if score >= 90:
+        level = '极高'
+    elif score >= 80:
+        level = '很高'
+    elif score >= 70:
+        level = '高'
+    elif score >= 60:
+        level = '中等'
+    else:
+        level = '低'
+
+    return {
+        'current_date': pd.Timestamp(current.trade_date).strftime('%Y-%m-%d'),
+        'previous_date': pd.Timestamp(prev.trade_date).strftime('%Y-%m-%d'),
+        'engulfing_type': 'Bullish' if bullish else 'Bearish' if bearish else None,
+        'reliability': score,
+        'reliability_level': level
+    }
+
+def moving_average_response(indicators):
+    """均线接口的返回数据"""
+    return {
+        'stock_code': indicators['stock_code'],
+        'trade_date': pd.Timestamp(indicators['trade_date']).strftime('%Y-%m-%d'),
+        'ma_5': float(indicators['ma_5']) if indicators['ma_5'] else None,
+        'ma_10': float(indicators['ma_10']) if indicators['ma_10'] else None,
+        'ma_20': float(indicators['ma_20']) if indicators['ma_20'] else None,
+        'ma_60': float(indicators['ma_60']) if indicators['ma_60'] else None,
+        'ma_200': float(indicators['ma_200']) if indicators['ma_200'] else None
+    }
+
+def crossover_response(indicators):
+    """均线交叉接口的返回数据"""
+    return {
+        'stock_code': indicators['stock_code'],
+        'trade_date': pd.Timestamp(indicators['trade_date']).strftime('%Y-%m-%d'),
+        'ma_5': _rounded(_value(indicators, 'ma_5')),
+        'ma_20': _rounded(_value(indicators, 'ma_20')),
+        **classify_crossover(indicators)
+    }
+
+def support_resistance_response(indicators):
+    """支撑阻力接口的返回数据"""
+    return {
+        'stock_code': indicators['stock_code'],
+        'trade_date': pd.Timestamp(indicators['trade_date']).strftime('%Y-%m-%d'),
+        'support_levels': {
+            '5d': indicators['min_price_5d'],
+            '10d': indicators['min_price_10d'],
+            '20d': indicators['min_price_20d']
+        },
+        'resistance_levels': {
+            '5d': indicators['max_price_5d'],
+            '10d': indicators['max_price_10d'],
+            '20d': indicators['max_price_20d']
+        },
+        'vwap_20d': indicators['vwap_20d'],
+        **classify_support_resistance(indicators)
+    }
 
 @technical_bp.route('/ma/<stock_code>', methods=['GET'])
 def get_moving_averages(stock_code):
@@ -24,158 +436,40 @@ def get_moving_averages(stock_code):
         if not date:
             return jsonify({'error': '日期不能为空'}), 400
 
-        sql = """
-        WITH ma_calculation AS (
-            SELECT stock_code,
-                   trade_date,
-                   AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 4 PRECEDING) AS ma_5,
-                   AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 9 PRECEDING) AS ma_10,
-                   AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 19 PRECEDING) AS ma_20,
-                   AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 59 PRECEDING) AS ma_60,
-                   AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 199 PRECEDING) AS ma_200
-            FROM stock_historical_quotes
-            WHERE stock_code = :code
-        )
-        SELECT *
-        FROM ma_calculation
-        WHERE trade_date = :date
-        """
-        
         with engine.connect() as conn:
-            result = conn.execute(text(sql), {'code': stock_code, 'date': date}).fetchone()
-            
-            if not result:
-                return jsonify({'error': '未找到数据'}), 404
-                
-            return jsonify({
-                'stock_code': result.stock_code,
-                'trade_date': result.trade_date.strftime('%Y-%m-%d'),
-                'ma_5': float(result.ma_5) if result.ma_5 else None,
-                'ma_10': float(result.ma_10) if result.ma_10 else None,
-                'ma_20': float(result.ma_20) if result.ma_20 else None,
-                'ma_60': float(result.ma_60) if result.ma_60 else None,
-                'ma_200': float(result.ma_200) if result.ma_200 else None
-            })
-            
+            result = load_daily_indicators(conn, stock_code, date)
+
+        if not result:
+            return jsonify({'error': '未找到数据'}), 404
+
+        return jsonify(moving_average_response(result))
+
     except Exception as e:
         logger.error(f"获取均线数据失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @technical_bp.route('/cross/<stock_code>', methods=['GET'])
 def get_crossovers(stock_code):
-    """获取均线交叉信号"""
+    """获取均线交叉信号
+
+    均线、前一日均线和 5 日变化率按完整历史窗口计算（与 stock_daily_indicators 一致）。
+    原实现只取最近 30 个自然日（约 20 个交易日）的行情，ma_20、量比以及前一日和 5 日前的均线窗口被截断，
+    因此 ma_5、ma_20、cross_strength、ma_5_trend、ma_20_trend、volume_ratio、cross_type
+    和 reliability_score 可能与旧版本不同，字段名不变。
+    """
     try:
         date = request.args.get('date', type=str)
         if not date:
             return jsonify({'error': '日期不能为空'}), 400
-            
-        sql = """
-        WITH RECURSIVE date_series AS (
-            SELECT MIN(trade_date) as date_range_start
-            FROM stock_historical_quotes
-            WHERE trade_date >= DATE_SUB(:date, INTERVAL 30 DAY)
-        ),
-        moving_averages AS (
-            SELECT 
-                stock_code,
-                trade_date,
-                close_price,
-                volume,
-                AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 4 PRECEDING) AS ma_5,
-                AVG(close_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 19 PRECEDING) AS ma_20,
-                AVG(volume) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 19 PRECEDING) AS volume_ma20
-            FROM stock_historical_quotes
-            WHERE stock_code = :code
-                AND trade_date >= DATE_SUB(:date, INTERVAL 30 DAY)
-        ),
-        crossover_analysis AS (
-            SELECT 
-                m.*,
-                LAG(ma_5) OVER (PARTITION BY stock_code ORDER BY trade_date) AS prev_ma_5,
-                LAG(ma_20) OVER (PARTITION BY stock_code ORDER BY trade_date) AS prev_ma_20,
-                ABS(ma_5 - ma_20) / NULLIF(ma_20, 0) * 100 AS cross_strength,
-                (ma_5 - LAG(ma_5, 5) OVER (PARTITION BY stock_code ORDER BY trade_date)) 
-                    / NULLIF(LAG(ma_5, 5) OVER (PARTITION BY stock_code ORDER BY trade_date), 0) * 100 AS ma_5_change,
-                (ma_20 - LAG(ma_20, 5) OVER (PARTITION BY stock_code ORDER BY trade_date))
-                    / NULLIF(LAG(ma_20, 5) OVER (PARTITION BY stock_code ORDER BY trade_date), 0) * 100 AS ma_20_change,
-                volume / NULLIF(volume_ma20, 0) AS volume_ratio
-            FROM moving_averages m
-        )
-        SELECT 
-            stock_code,
-            trade_date,
-            close_price,
-            ROUND(ma_5, 2) as ma_5,
-            ROUND(ma_20, 2) as ma_20,
-            ROUND(cross_strength, 2) as cross_strength_pct,
-            ROUND(ma_5_change, 2) as ma_5_trend,
-            ROUND(ma_20_change, 2) as ma_20_trend,
-            ROUND(volume_ratio, 2) as volume_ratio,
-            CASE 
-                WHEN prev_ma_5 < prev_ma_20 AND ma_5 > ma_20 THEN 
-                    CASE
-                        WHEN cross_strength >= 1 AND ma_5_change > 0 AND volume_ratio >= 1.5 THEN '强金叉'
-                        WHEN cross_strength >= 0.5 AND ma_5_change > 0 THEN '金叉'
-                        ELSE '弱金叉'
-                    END
-                WHEN prev_ma_5 > prev_ma_20 AND ma_5 < ma_20 THEN 
-                    CASE
-                        WHEN cross_strength >= 1 AND ma_5_change < 0 AND volume_ratio >= 1.5 THEN '强死叉'
-                        WHEN cross_strength >= 0.5 AND ma_5_change < 0 THEN '死叉'
-                        ELSE '弱死叉'
-                    END
-                ELSE '无交叉'
-            END AS cross_type,
-            CASE 
-                WHEN cross_strength >= 1 THEN 30
-                WHEN cross_strength >= 0.5 THEN 20
-                WHEN cross_strength >= 0.3 THEN 10
-                ELSE 0
-            END +
-            CASE 
-                WHEN (prev_ma_5 < prev_ma_20 AND ma_5 > ma_20 AND ma_5_change > 0 AND ma_20_change > 0) OR
-                     (prev_ma_5 > prev_ma_20 AND ma_5 < ma_20 AND ma_5_change < 0 AND ma_20_change < 0)
-                THEN 30
-                WHEN (prev_ma_5 < prev_ma_20 AND ma_5 > ma_20 AND ma_5_change > 0) OR
-                     (prev_ma_5 > prev_ma_20 AND ma_5 < ma_20 AND ma_5_change < 0)
-                THEN 20
-                ELSE 10
-            END +
-            CASE 
-                WHEN volume_ratio >= 2 THEN 20
-                WHEN volume_ratio >= 1.5 THEN 15
-                WHEN volume_ratio >= 1 THEN 10
-                ELSE 0
-            END +
-            CASE 
-                WHEN cross_strength <= 3 THEN 20
-                WHEN cross_strength <= 5 THEN 15
-                WHEN cross_strength <= 8 THEN 10
-                ELSE 5
-            END AS reliability_score
-        FROM crossover_analysis
-        WHERE trade_date = :date
-        """
-        
+
         with engine.connect() as conn:
-            result = conn.execute(text(sql), {'code': stock_code, 'date': date}).fetchone()
-            
+            result = load_daily_indicators(conn, stock_code, date)
+
         if not result:
             return jsonify({'error': '未找到数据'}), 404
-            
-        return jsonify({
-            'stock_code': result.stock_code,
-            'trade_date': result.trade_date.strftime('%Y-%m-%d'),
-            'ma_5': float(result.ma_5),
-            'ma_20': float(result.ma_20),
-            'cross_type': result.cross_type,
-            'cross_strength': float(result.cross_strength_pct),
-            'ma_5_trend': float(result.ma_5_trend),
-            'ma_20_trend': float(result.ma_20_trend),
-            'volume_ratio': float(result.volume_ratio),
-            'reliability_score': int(result.reliability_score)
-        })
-        
+
+        return jsonify(crossover_response(result))
+
     except Exception as e:
         logger.error(f"获取均线交叉数据失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -187,141 +481,15 @@ def get_three_bullish(stock_code):
         date = request.args.get('date', type=str)
         if not date:
             return jsonify({'error': '日期不能为空'}), 400
-            
-        sql = """
-        WITH continuous_trading_days AS (
-            SELECT 
-                a.stock_code,
-                a.trade_date as cur_date,
-                (
-                    SELECT MAX(trade_date) 
-                    FROM stock_historical_quotes b 
-                    WHERE b.stock_code = a.stock_code
-                        AND b.trade_date < a.trade_date
-                        AND b.trade_date >= DATE_SUB(a.trade_date, INTERVAL 30 DAY)
-                ) as prev_date1,
-                (
-                    SELECT MAX(trade_date)
-                    FROM stock_historical_quotes b
-                    WHERE b.stock_code = a.stock_code
-                        AND b.trade_date < (
-                            SELECT MAX(trade_date)
-                            FROM stock_historical_quotes c
-                            WHERE c.stock_code = a.stock_code
-                                AND c.trade_date < a.trade_date
-                                AND c.trade_date >= DATE_SUB(a.trade_date, INTERVAL 30 DAY)
-                        )
-                        AND b.trade_date >= DATE_SUB(a.trade_date, INTERVAL 30 DAY)
-                ) as prev_date2
-            FROM stock_historical_quotes a
-            WHERE a.stock_code = :code
-                AND a.trade_date = :date
-            GROUP BY a.stock_code, a.trade_date
-        ),
-        three_days_data AS (
-            SELECT 
-                t.stock_code,
-                c.trade_date,
-                c.open_price,
-                c.close_price,
-                c.volume,
-                p1.open_price as prev1_open,
-                p1.close_price as prev1_close,
-                p1.volume as prev1_volume,
-                p2.open_price as prev2_open,
-                p2.close_price as prev2_close,
-                p2.volume as prev2_volume,
-                ABS(c.close_price - c.open_price) / c.open_price * 100 as today_body,
-                ABS(p1.close_price - p1.open_price) / p1.open_price * 100 as prev1_body,
-                ABS(p2.close_price - p2.open_price) / p2.open_price * 100 as prev2_body,
-                (c.close_price - c.open_price) / c.open_price * 100 as today_gain,
-                (p1.close_price - p1.open_price) / p1.open_price * 100 as prev1_gain,
-                (p2.close_price - p2.open_price) / p2.open_price * 100 as prev2_gain,
-                c.volume / NULLIF(p1.volume, 0) as vol_ratio1,
-                p1.volume / NULLIF(p2.volume, 0) as vol_ratio2
-            FROM continuous_trading_days t
-            JOIN stock_historical_quotes c ON t.stock_code = c.stock_code 
-                AND t.cur_date = c.trade_date
-            LEFT JOIN stock_historical_quotes p1 ON t.stock_code = p1.stock_code 
-                AND t.prev_date1 = p1.trade_date
-            LEFT JOIN stock_historical_quotes p2 ON t.stock_code = p2.stock_code 
-                AND t.prev_date2 = p2.trade_date
-        ),
-        three_bullish_analysis AS (
-            SELECT 
-                *,
-                CASE WHEN close_price > open_price THEN 1 ELSE 0 END as today_bullish,
-                CASE WHEN prev1_close > prev1_open THEN 1 ELSE 0 END as prev1_bullish,
-                CASE WHEN prev2_close > prev2_open THEN 1 ELSE 0 END as prev2_bullish,
-                ((close_price - prev2_open) / prev2_open * 100) as total_gain
-            FROM three_days_data
-        )
-        SELECT 
-            stock_code,
-            trade_date as day3,
-            ROUND(today_gain, 2) as day3_gain,
-            ROUND(prev1_gain, 2) as day2_gain,
-            ROUND(prev2_gain, 2) as day1_gain,
-            ROUND(total_gain, 2) as total_gain,
-            ROUND(vol_ratio1, 2) as latest_vol_ratio,
-            CASE 
-                WHEN today_bullish = 1 AND prev1_bullish = 1 AND prev2_bullish = 1 
-                THEN '三连阳'
-                ELSE '否'
-            END as pattern_type,
-            CASE 
-                WHEN today_body >= 2 AND prev1_body >= 2 AND prev2_body >= 2 THEN 30
-                WHEN today_body >= 1 AND prev1_body >= 1 AND prev2_body >= 1 THEN 20
-                ELSE 10
-            END +
-            CASE 
-                WHEN total_gain >= 6 THEN 30
-                WHEN total_gain >= 4 THEN 20
-                WHEN total_gain >= 2 THEN 10
-                ELSE 5
-            END +
-            CASE 
-                WHEN today_gain > prev1_gain AND prev1_gain > prev2_gain THEN 20
-                WHEN today_gain > prev1_gain OR prev1_gain > prev2_gain THEN 10
-                ELSE 5
-            END +
-            CASE 
-                WHEN vol_ratio1 > 1.5 THEN 20
-                WHEN vol_ratio1 > 1.2 THEN 15
-                WHEN vol_ratio1 > 1 THEN 10
-                ELSE 5
-            END as reliability_score,
-            CASE
-                WHEN today_bullish = 1 AND prev1_bullish = 1 AND prev2_bullish = 1 THEN
-                    CASE
-                        WHEN total_gain >= 6 AND vol_ratio1 > 1.5 THEN '强势三连阳'
-                        WHEN total_gain >= 4 AND vol_ratio1 > 1.2 THEN '标准三连阳'
-                        ELSE '弱势三连阳'
-                    END
-                ELSE '非三连阳'
-            END as pattern_strength
-        FROM three_bullish_analysis
-        """
-        
+
         with engine.connect() as conn:
-            result = conn.execute(text(sql), {'code': stock_code, 'date': date}).fetchone()
-            
-        if not result:
+            bars = load_recent_bars(conn, stock_code, date, 3)
+
+        if bars is None:
             return jsonify({'error': '未找到数据'}), 404
-            
-        return jsonify({
-            'stock_code': result.stock_code,
-            'day3': result.day3.strftime('%Y-%m-%d'),
-            'day3_gain': float(result.day3_gain),
-            'day2_gain': float(result.day2_gain),
-            'day1_gain': float(result.day1_gain),
-            'total_gain': float(result.total_gain),
-            'volume_ratio': float(result.latest_vol_ratio),
-            'pattern_type': result.pattern_type,
-            'reliability_score': int(result.reliability_score),
-            'pattern_strength': result.pattern_strength
-        })
-        
+
+        return jsonify({'stock_code': stock_code, **classify_three_bullish(bars)})
+
     except Exception as e:
         logger.error(f"获取三连阳数据失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -333,126 +501,16 @@ def get_engulfing_pattern(stock_code):
         date = request.args.get('date', type=str)
         if not date:
             return jsonify({'error': '日期不能为空'}), 400
-            
-        sql = """
-        WITH continuous_trading_days AS (
-            SELECT 
-                a.stock_code,
-                a.trade_date as cur_date,
-                MAX(b.trade_date) as prev_date
-            FROM stock_historical_quotes a
-            LEFT JOIN stock_historical_quotes b ON a.stock_code = b.stock_code
-                AND b.trade_date < a.trade_date
-                AND b.trade_date >= DATE_SUB(a.trade_date, INTERVAL 30 DAY)
-            WHERE a.stock_code = :code
-                AND a.trade_date = :date
-            GROUP BY a.stock_code, a.trade_date
-        ),
-        pattern_analysis AS (
-            SELECT 
-                c.stock_code,
-                c.trade_date,
-                c.open_price,
-                c.close_price,
-                c.high_price,
-                c.low_price,
-                c.volume,
-                ABS(c.close_price - c.open_price) AS body_length,
-                c.high_price - GREATEST(c.open_price, c.close_price) AS upper_shadow,
-                LEAST(c.open_price, c.close_price) - c.low_price AS lower_shadow,
-                (c.high_price - c.low_price) / c.low_price * 100 AS price_range,
-                c.volume / p.volume AS volume_ratio,
-                p.open_price AS prev_open,
-                p.close_price AS prev_close,
-                p.trade_date AS prev_date,
-                CASE WHEN c.close_price > c.open_price THEN 1 ELSE -1 END AS candle_type
-            FROM continuous_trading_days t
-            JOIN stock_historical_quotes c ON t.stock_code = c.stock_code 
-                AND t.cur_date = c.trade_date
-            JOIN stock_historical_quotes p ON t.stock_code = p.stock_code 
-                AND t.prev_date = p.trade_date
-        ),
-        reliability_score AS (
-            SELECT 
-                trade_date,
-                stock_code,
-                prev_date,
-                CASE 
-                    WHEN body_length / NULLIF((high_price - low_price), 0) > 0.7 THEN 25
-                    WHEN body_length / NULLIF((high_price - low_price), 0) > 0.5 THEN 20
-                    WHEN body_length / NULLIF((high_price - low_price), 0) > 0.3 THEN 10
-                    ELSE 5
-                END +
-                CASE 
-                    WHEN COALESCE(volume_ratio, 0) > 2 THEN 25
-                    WHEN COALESCE(volume_ratio, 0) > 1.5 THEN 20
-                    WHEN COALESCE(volume_ratio, 0) > 1 THEN 15
-                    ELSE 10
-                END +
-                CASE 
-                    WHEN price_range BETWEEN 2 AND 5 THEN 20
-                    WHEN price_range BETWEEN 1 AND 7 THEN 15
-                    ELSE 10
-                END +
-                CASE 
-                    WHEN upper_shadow < body_length * 0.3 
-                         AND lower_shadow < body_length * 0.3 THEN 15
-                    WHEN upper_shadow < body_length * 0.5 
-                         AND lower_shadow < body_length * 0.5 THEN 10
-                    ELSE 5
-                END +
-                CASE
-                    WHEN prev_close IS NOT NULL
-                         AND ((prev_close < prev_open AND close_price > open_price
-                              AND open_price < prev_close AND close_price > prev_open)
-                          OR (prev_close > prev_open AND close_price < open_price
-                              AND open_price > prev_close AND close_price < prev_open))
-                    THEN 15
-                    ELSE 0
-                END AS reliability_score,
-                
-                CASE
-                    WHEN prev_close < prev_open AND close_price > open_price
-                         AND open_price < prev_close AND close_price > prev_open
-                    THEN 'Bullish'
-                    WHEN prev_close > prev_open AND close_price < open_price
-                         AND open_price > prev_close AND close_price < prev_open
-                    THEN 'Bearish'
-                    ELSE NULL
-                END AS engulfing_type
-            FROM pattern_analysis
-        )
-        SELECT 
-            trade_date,
-            stock_code,
-            prev_date,
-            reliability_score,
-            CASE 
-                WHEN reliability_score >= 90 THEN '极高'
-                WHEN reliability_score >= 80 THEN '很高'
-                WHEN reliability_score >= 70 THEN '高'
-                WHEN reliability_score >= 60 THEN '中等'
-                ELSE '低'
-            END AS reliability_level,
-            engulfing_type
-        FROM reliability_score
-        """
-        
+
         with engine.connect() as conn:
-            result = conn.execute(text(sql), {'code': stock_code, 'date': date}).fetchone()
-            
-        if not result:
+            bars = load_recent_bars(conn, stock_code, date, 2)
+
+        engulfing = classify_engulfing(bars) if bars is not None else None
+        if not engulfing:
             return jsonify({'error': '未找到数据'}), 404
-            
-        return jsonify({
-            'stock_code': result.stock_code,
-            'current_date': result.trade_date.strftime('%Y-%m-%d'),
-            'previous_date': result.prev_date.strftime('%Y-%m-%d') if result.prev_date else None,
-            'engulfing_type': result.engulfing_type,
-            'reliability': result.reliability_score,
-            'reliability_level': result.reliability_level
-        })
-        
+
+        return jsonify({'stock_code': stock_code, **engulfing})
+
     except Exception as e:
         logger.error(f"获取吞没形态数据失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -464,166 +522,49 @@ def get_support_resistance(stock_code):
         date = request.args.get('date', type=str)
         if not date:
             return jsonify({'error': '日期不能为空'}), 400
-            
-        sql = """
-        WITH price_levels AS (
-            SELECT 
-                stock_code,
-                trade_date,
-                close_price,
-                high_price,
-                low_price,
-                volume,
-                MAX(high_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 5 PRECEDING) AS max_price_5d,
-                MIN(low_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 5 PRECEDING) AS min_price_5d,
-                MAX(high_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 10 PRECEDING) AS max_price_10d,
-                MIN(low_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 10 PRECEDING) AS min_price_10d,
-                MAX(high_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING) AS max_price_20d,
-                MIN(low_price) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING) AS min_price_20d,
-                SUM(close_price * volume) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING) / 
-                NULLIF(SUM(volume) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING), 0) AS vwap_20d,
-                AVG(volume) OVER (PARTITION BY stock_code ORDER BY trade_date ROWS 20 PRECEDING) AS avg_volume_20d,
-                (close_price - LAG(close_price, 20) OVER (PARTITION BY stock_code ORDER BY trade_date)) / 
-                NULLIF(LAG(close_price, 20) OVER (PARTITION BY stock_code ORDER BY trade_date), 0) * 100 AS price_change_rate_20d
-            FROM stock_historical_quotes
-            WHERE stock_code = :code
-                AND trade_date >= DATE_SUB(:date, INTERVAL 60 DAY)
-        ),
-        support_resistance_analysis AS (
-            SELECT 
-                *,
-                CASE 
-                    WHEN close_price > vwap_20d THEN '价格偏高'
-                    ELSE '价格偏低'
-                END AS price_position,
-                CASE
-                    WHEN low_price >= min_price_20d AND volume > avg_volume_20d * 1.5 THEN '强支撑'
-                    WHEN low_price >= min_price_20d THEN '一般支撑'
-                    ELSE '弱支撑'
-                END AS support_strength,
-                CASE
-                    WHEN high_price <= max_price_20d AND volume > avg_volume_20d * 1.5 THEN '强阻力'
-                    WHEN high_price <= max_price_20d THEN '一般阻力'
-                    ELSE '弱阻力'
-                END AS resistance_strength,
-                CASE
-                    WHEN close_price >= (max_price_20d + min_price_20d) / 2 THEN '价格偏上'
-                    ELSE '价格偏下'
-                END AS price_range_position,
-                CASE
-                    WHEN volume > avg_volume_20d * 1.5 THEN '放量'
-                    WHEN volume < avg_volume_20d * 0.7 THEN '缩量'
-                    ELSE '量能一般'
-                END AS volume_character,
-                (CASE 
-                    WHEN close_price <= min_price_5d THEN 30
-                    WHEN close_price <= min_price_10d THEN 20
-                    WHEN close_price <= min_price_20d THEN 10
-                    ELSE 0
-                END +
-                CASE 
-                    WHEN volume > avg_volume_20d * 1.5 THEN 30
-                    WHEN volume > avg_volume_20d * 1.2 THEN 20
-                    WHEN volume > avg_volume_20d THEN 10
-                    ELSE 0
-                END +
-                CASE 
-                    WHEN price_change_rate_20d <= -10 THEN 20
-                    WHEN price_change_rate_20d <= -5 THEN 15
-                    WHEN price_change_rate_20d <= 0 THEN 10
-                    ELSE 5
-                END +
-                CASE 
-                    WHEN ABS(min_price_5d - min_price_20d) / min_price_20d * 100 <= 2 THEN 20
-                    WHEN ABS(min_price_5d - min_price_20d) / min_price_20d * 100 <= 5 THEN 15
-                    ELSE 10
-                END) AS support_reliability_score,
-                (CASE 
-                    WHEN close_price >= max_price_5d THEN 30
-                    WHEN close_price >= max_price_10d THEN 20
-                    WHEN close_price >= max_price_20d THEN 10
-                    ELSE 0
-                END +
-                CASE 
-                    WHEN volume > avg_volume_20d * 1.5 THEN 30
-                    WHEN volume > avg_volume_20d * 1.2 THEN 20
-                    WHEN volume > avg_volume_20d THEN 10
-                    ELSE 0
-                END +
-                CASE 
-                    WHEN price_change_rate_20d >= 10 THEN 20
-                    WHEN price_change_rate_20d >= 5 THEN 15
-                    WHEN price_change_rate_20d >= 0 THEN 10
-                    ELSE 5
-                END +
-                CASE 
-                    WHEN ABS(max_price_5d - max_price_20d) / max_price_20d * 100 <= 2 THEN 20
-                    WHEN ABS(max_price_5d - max_price_20d) / max_price_20d * 100 <= 5 THEN 15
-                    ELSE 10
-                END) AS resistance_reliability_score
-            FROM price_levels
-        )
-        SELECT 
-            stock_code,
-            trade_date,
-            close_price,
-            min_price_5d,
-            min_price_10d,
-            min_price_20d,
-            max_price_5d,
-            max_price_10d,
-            max_price_20d,
-            vwap_20d,
-            support_strength,
-            resistance_strength,
-            price_position,
-            price_range_position,
-            volume_character,
-            CASE 
-                WHEN support_reliability_score >= 80 THEN '支撑极强'
-                WHEN support_reliability_score >= 60 THEN '支撑较强'
-                WHEN support_reliability_score >= 40 THEN '支撑一般'
-                ELSE '支撑较弱'
-            END as support_reliability,
-            CASE 
-                WHEN resistance_reliability_score >= 80 THEN '阻力极强'
-                WHEN resistance_reliability_score >= 60 THEN '阻力较强'
-                WHEN resistance_reliability_score >= 40 THEN '阻力一般'
-                ELSE '阻力较弱'
-            END as resistance_reliability
-        FROM support_resistance_analysis
-        WHERE trade_date = :date
-        """
-        
+
         with engine.connect() as conn:
-            result = conn.execute(text(sql), {'code': stock_code, 'date': date}).fetchone()
-            
+            result = load_daily_indicators(conn, stock_code, date)
+
         if not result:
             return jsonify({'error': '未找到数据'}), 404
-            
+
+        return jsonify(support_resistance_response(result))
+
+    except Exception as e:
+        logger.error(f"获取支撑位和阻力位数据失败: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@technical_bp.route('/bundle/<stock_code>', methods=['GET'])
+def get_technical_bundle(stock_code):
+    """一次返回技术分析页的全部数据（均线、均线交叉、三连阳、吞没形态、支撑阻力）
+
+    只读取一次当日及之前 LOOKBACK_ROWS 条行情，在内存中计算指标和形态；
+    各部分与对应的单独接口返回相同，前一交易日缺失时 engulfing 为 null。
+    """
+    try:
+        date = request.args.get('date', type=str)
+        if not date:
+            return jsonify({'error': '日期不能为空'}), 400
+
+        with engine.connect() as conn:
+            bars = load_recent_bars(conn, stock_code, date, LOOKBACK_ROWS)
+
+        if bars is None:
+            return jsonify({'error': '未找到数据'}), 404
+
+        indicators = indicators_from_bars(bars)
+        engulfing = classify_engulfing(bars)
         return jsonify({
-            'stock_code': result.stock_code,
-            'trade_date': result.trade_date.strftime('%Y-%m-%d'),
-            'support_levels': {
-                '5d': float(result.min_price_5d),
-                '10d': float(result.min_price_10d),
-                '20d': float(result.min_price_20d)
-            },
-            'resistance_levels': {
-                '5d': float(result.max_price_5d),
-                '10d': float(result.max_price_10d),
-                '20d': float(result.max_price_20d)
-            },
-            'vwap_20d': float(result.vwap_20d),
-            'support_strength': result.support_strength,
-            'resistance_strength': result.resistance_strength,
-            'price_position': result.price_position,
-            'price_range_position': result.price_range_position,
-            'volume_character': result.volume_character,
-            'support_reliability': result.support_reliability,
-            'resistance_reliability': result.resistance_reliability
+            'stock_code': stock_code,
+            'trade_date': pd.Timestamp(indicators['trade_date']).strftime('%Y-%m-%d'),
+            'ma': moving_average_response(indicators),
+            'cross': crossover_response(indicators),
+            'three_bullish': {'stock_code': stock_code, **classify_three_bullish(bars)},
+            'engulfing': {'stock_code': stock_code, **engulfing} if engulfing else None,
+            'support_resistance': support_resistance_response(indicators)
         })
-        
+
     except Exception as e:
-        logger.error(f"获取支撑位和阻力位数据失败: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        logger.error(f"获取技术分析数据失败: {str(e)}")
+        return jsonify({'error': str(e)}), 500
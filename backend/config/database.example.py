@@ -22,4 +22,13 @@ DB_CONFIG_ADMIN = {
     'user': 'stock_admin',
     'password': quote_plus('StockAdmin@123'),
     'database': 'stock_analysis'
-}
\ No newline at end of file
+}
+
+# HTTP 服务连接池配置（每个 gunicorn worker 进程一个连接池，未配置的项使用 apis/db.py 中的默认值）
+DB_POOL_CONFIG = {
+    'pool_size': 5,
+    'max_overflow': 5,
+    'pool_timeout': 10,
+    'pool_recycle': 3600,
+    'pool_pre_ping': True
+}
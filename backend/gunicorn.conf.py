@@ -0,0 +1,51 @@
+"""
+http_stock_server 生产环境 gunicorn 配置
+
+    gunicorn -c backend/gunicorn.conf.py
+
+多进程 + 多线程（gthread）处理请求，master 进程预加载应用并预热缓存后再 fork worker。
+常用参数可通过环境变量覆盖：
+    STOCK_SERVER_BIND     监听地址 (默认: 0.0.0.0:5000)
+    STOCK_SERVER_WORKERS  worker 进程数 (默认: CPU 核数 * 2 + 1，最多 8)
+    STOCK_SERVER_THREADS  每个 worker 的线程数 (默认: 4)
+
+每个 worker 有独立的数据库连接池，线程数不应超过 DB_POOL_CONFIG 中
+pool_size + max_overflow，且 workers * (pool_size + max_overflow) 需小于 MySQL max_connections。
+
+平滑重启：kill -HUP <master pid> 逐个替换 worker（预加载模式下不会重新加载代码）；
+更新代码后执行 kill -USR2 <master pid> 启动新 master，确认正常后 kill -QUIT <旧 master pid>。
+"""
+import os
+import multiprocessing
+
+# 项目导入路径（apis、utils、config 均相对于 backend 目录导入）
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'http_stock_server:app'
+
+bind = os.environ.get('STOCK_SERVER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('STOCK_SERVER_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.environ.get('STOCK_SERVER_THREADS', 4))
+
+# 小程序打开页面时连续请求多个接口，保持连接减少 TCP 握手
+keepalive = 5
+# gthread 模式下为 worker 心跳超时，不限制单个请求时长（AI 分析接口等待外部 API 可达数分钟）
+timeout = 60
+graceful_timeout = 30
+
+# 预加载应用，worker 共享 master 中已导入的模块和缓存
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+def when_ready(server):
+    """master 启动完成、fork worker 之前预热缓存"""
+    from http_stock_server import warmup
+    warmup()
+
+def post_fork(server, worker):
+    """丢弃从 master 继承的数据库连接，worker 使用自己的连接"""
+    from apis.db import engine
+    engine.dispose(close=False)
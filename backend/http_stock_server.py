@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, jsonify
 import logging
 from apis.technical_api import technical_bp
 from apis.stock_details_api import details_bp
@@ -7,6 +7,9 @@ from apis.stock_history_api import history_bp
 from apis.stock_recommendation_api import recommendation_bp
 from apis.stock_technical_score_api import technical_score_bp
 from apis.chip_analysis_api import chip_analysis_bp
+from apis.db import engine, get_pool_status
+from apis.response_cache import response_cache
+from utils.stock_registry import get_registry
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -24,11 +27,36 @@ app.register_blueprint(recommendation_bp, url_prefix='/api/technical')
 app.register_blueprint(technical_score_bp, url_prefix='/api/technical')
 app.register_blueprint(chip_analysis_bp)
 
+@app.route('/api/db/pool', methods=['GET'])
+def get_db_pool():
+    """当前 worker 进程的数据库连接池占用和取用等待统计"""
+    return jsonify(get_pool_status())
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """当前 worker 进程的接口响应缓存命中率和占用内存"""
+    return jsonify(response_cache.stats())
+
+def warmup():
+    """预热数据库连接和股票信息缓存
+
+    gunicorn 预加载模式下在 master 进程中 fork 之前调用，worker 直接继承已加载的缓存；
+    数据库不可用时只记录日志，不影响服务启动。
+    """
+    try:
+        count = get_registry(engine).refresh()
+        logger.info(f"服务预热完成: 股票信息 {count} 只")
+    except Exception as e:
+        logger.error(f"服务预热失败: {str(e)}")
+
 if __name__ == '__main__':
     import argparse
     
     parser = argparse.ArgumentParser(description='Stock Analysis Server')
     parser.add_argument('--port', type=int, default=5000, help='服务器端口号 (默认: 5000)')
+    parser.add_argument('--debug', action='store_true', help='开启调试模式（自动重载，仅用于开发）')
     
     args = parser.parse_args()
-    app.run(host='0.0.0.0', port=args.port, debug=True)
\ No newline at end of file
+    if not args.debug:
+        warmup()
+    app.run(host='0.0.0.0', port=args.port, debug=args.debug, threaded=True)
@@ -0,0 +1,372 @@
+"""
+每日数据更新流水线
+
+将采集、下载、分析、入库、指标计算、评分和筹码分析定义为带输入/输出的阶段，
+按输入输出关系自动推导依赖，组成有向无环图执行：
+
+- 阶段的输入（文件、目录、数据表）与上次成功运行时相同则跳过
+- 互不依赖的阶段（如基本面链和行情链）并行执行
+- 每个阶段的开始/结束时间、状态和输入指纹记录在 update_logs 中
+
+用法:
+    python pipeline_runner.py                     # 运行全部阶段
+    python pipeline_runner.py --stages technical_scores chip_analysis
+    python pipeline_runner.py --force             # 忽略输入指纹，全部重新运行
+    python pipeline_runner.py --dry-run           # 只显示将要运行和跳过的阶段
+"""
+import os
+import sys
+import time
+import json
+import hashlib
+import logging
+import argparse
+import subprocess
+import concurrent.futures
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from config.database import DB_CONFIG_ADMIN
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建数据库连接
+engine = create_engine(
+    f"mysql+pymysql://{DB_CONFIG_ADMIN['user']}:{DB_CONFIG_ADMIN['password']}"
+    f"@{DB_CONFIG_ADMIN['host']}/{DB_CONFIG_ADMIN['database']}?charset=utf8mb4"
+)
+
+# 命令和文件路径均相对于 backend 目录
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 阶段输出日志目录
+STAGE_LOG_DIR = os.path.join(BASE_DIR, 'logs', 'pipeline')
+
+# update_logs 中流水线记录的 update_type
+UPDATE_TYPE = 'pipeline'
+
+HISTORY_DATA_DIR = 'stock_history/data/delta'
+
+# 流水线阶段定义
+# inputs/outputs: file:路径, dir:目录, table:表名；依赖由 outputs 与 inputs 的交集推导
+# 没有输入的阶段（从外部数据源采集）每次都运行；always_run 的阶段有上游依赖但同样每次都运行
+PIPELINE_STAGES = {
+    'scrape_codes': {
+        'label': '获取股票列表',
+        'command': 'python3 scripts/stock_code_scraper.py',
+        'inputs': [],
+        'outputs': ['file:all_stock_list.csv']
+    },
+    'download_fundamentals': {
+        'label': '下载基本面数据',
+        'command': 'python3 scripts/stock_downloader.py --workers 10',
+        'inputs': [],
+        'outputs': ['dir:stock_fundamental/stock_info']
+    },
+    'analyze_fundamentals': {
+        'label': '分析基本面数据',
+        'command': 'python3 scripts/stock_analyzer.py',
+        'inputs': ['dir:stock_fundamental/stock_info'],
+        'outputs': ['dir:stock_fundamental/stock_analysis']
+    },
+    'import_fundamentals': {
+        'label': '基本面数据入库',
+        'command': 'python3 scripts/stock_db.py --workers 20',
+        'inputs': ['dir:stock_fundamental/stock_analysis'],
+        'outputs': ['table:stocks']
+    },
+    'download_history': {
+        'label': '增量下载历史行情',
+        'command': f'python3 -m stock_history.downloader.ak_downloader -o {HISTORY_DATA_DIR} '
+                   f'-s all_stock_list.csv --delta',
+        # 股票列表来自 scrape_codes；行情每天都有新数据，列表未变化时也需要运行
+        'inputs': ['file:all_stock_list.csv'],
+        'always_run': True,
+        'outputs': [f'dir:{HISTORY_DATA_DIR}']
+    },
+    'import_history': {
+        'label': '历史行情入库',
+        # 下载清单中复权价变化的股票全量替换，未能替换时阶段失败，下游不再运行
+        'command': f'python3 -m stock_history.db.history_db import --data-dir {HISTORY_DATA_DIR} '
+                   f'--mode incremental',
+        'inputs': [f'dir:{HISTORY_DATA_DIR}'],
+        'outputs': ['table:stock_historical_quotes']
+    },
+    'daily_indicators': {
+        'label': '每日技术指标',
+        'command': 'python3 scripts/stock_daily_indicators.py',
+        'inputs': ['table:stock_historical_quotes'],
+        'outputs': ['table:stock_daily_indicators']
+    },
+    'technical_scores': {
+        'label': '技术评分',
+        'command': 'python3 scripts/stock_technical_scorer.py',
+        'inputs': ['table:stock_historical_quotes'],
+        'outputs': ['table:stock_technical_scores']
+    },
+    'chip_distribution': {
+        'label': '筹码分布',
+        'command': 'python3 scripts/stock_chip_distribution.py',
+        'inputs': ['table:stock_historical_quotes'],
+        'outputs': ['table:stock_chip_distribution']
+    },
+    'chip_analysis': {
+        'label': '筹码分析',
+        'command': 'python3 scripts/stock_chip_analyzer.py',
+        'inputs': ['table:stock_historical_quotes', 'table:stock_chip_distribution'],
+        'outputs': ['table:stock_chip_analysis']
+    },
+    'recommendations': {
+        'label': '每日推荐',
+        'command': 'python3 scripts/stock_recommender.py',
+        'inputs': ['table:stock_technical_scores', 'table:stock_chip_analysis'],
+        'outputs': ['table:stock_recommendations']
+    }
+}
+
+# 数据表指纹使用的日期列：最新日期的记录数和价格合计可发现新增和重新导入的数据
+TABLE_DATE_COLUMNS = {
+    'stock_historical_quotes': ('trade_date', 'close_price'),
+    'stock_chip_distribution': ('trade_date', 'close_price'),
+}
+
+def stage_dependencies(stages):
+    """根据阶段的输出和输入推导依赖关系
+
+    Returns:
+        dict: {阶段: 上游阶段集合}
+    """
+    producers = {}
+    for name, stage in stages.items():
+        for output in stage['outputs']:
+            producers.setdefault(output, set()).add(name)
+    return {
+        name: {p for item in stage['inputs'] for p in producers.get(item, ()) if p != name}
+        for name, stage in stages.items()
+    }
+
+def topological_order(dependencies):
+    """返回阶段的拓扑顺序，存在循环依赖时抛出 ValueError"""
+    order, done = [], set()
+    pending = dict(dependencies)
+    while pending:
+        ready = sorted(name for name, deps in pending.items() if deps <= done)
+        if not ready:
+            raise ValueError(f"阶段存在循环依赖: {', '.join(sorted(pending))}")
+        for name in ready:
+            order.append(name)
+            done.add(name)
+            del pending[name]
+    return order
+
+def _path_fingerprint(path):
+    """文件或目录的指纹：所有文件的相对路径、大小和修改时间
+
+    以 _ 或 . 开头的文件（任务清单、导入进度等记录文件）不参与计算。
+    """
+    full_path = os.path.join(BASE_DIR, path)
+    if os.path.isfile(full_path):
+        stat = os.stat(full_path)
+        return [path, stat.st_size, stat.st_mtime_ns]
+    entries = []
+    for root, dirs, files in os.walk(full_path):
+        dirs[:] = [d for d in dirs if not d.startswith(('_', '.'))]
+        for file in files:
+            if file.startswith(('_', '.')):
+                continue
+            stat = os.stat(os.path.join(root, file))
+            entries.append([os.path.relpath(os.path.join(root, file), full_path), stat.st_size, stat.st_mtime_ns])
+    return sorted(entries)
+
+def _table_fingerprint(conn, table):
+    """数据表的指纹：最后修改时间，以及最新日期的记录数和价格合计"""
+    update_time = conn.execute(text("""
+        SELECT UPDATE_TIME FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+    """), {'table': table}).scalar()
+    fingerprint = [str(update_time)]
+    if table in TABLE_DATE_COLUMNS:
+        date_column, value_column = TABLE_DATE_COLUMNS[table]
+        row = conn.execute(text(f"""
+            SELECT {date_column}, COUNT(*), SUM({value_column})
+            FROM {table}
+            WHERE {date_column} = (SELECT MAX({date_column}) FROM {table})
+            GROUP BY {date_column}
+        """)).first()
+        fingerprint.append([str(value) for value in row] if row else None)
+    return fingerprint
+
+def input_fingerprint(stage):
+    """计算阶段输入的指纹（SHA-256），没有输入的阶段返回 None"""
+    if not stage['inputs']:
+        return None
+    parts = []
+    with engine.connect() as conn:
+        # MySQL 8 默认缓存 information_schema 中的表统计信息，关闭缓存以读取最新修改时间
+        conn.execute(text("SET SESSION information_schema_stats_expiry = 0"))
+        for item in stage['inputs']:
+            kind, name = item.split(':', 1)
+            if kind == 'table':
+                parts.append([item, _table_fingerprint(conn, name)])
+            else:
+                parts.append([item, _path_fingerprint(name)])
+    return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+def last_success_fingerprint(stage_name):
+    """阶段上次成功运行时的输入指纹"""
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT input_hash FROM update_logs
+            WHERE table_name = :stage AND update_type = :type AND status = 'success'
+            ORDER BY id DESC
+            LIMIT 1
+        """), {'stage': stage_name, 'type': UPDATE_TYPE}).scalar()
+
+def log_stage(stage_name, start_time, end_time, status, input_hash=None, error_message=None):
+    """在 update_logs 中记录阶段的运行时间和状态"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO update_logs (table_name, update_type, start_time, end_time, status,
+                                         error_message, input_hash)
+                VALUES (:stage, :type, :start, :end, :status, :error, :hash)
+            """), {
+                'stage': stage_name,
+                'type': UPDATE_TYPE,
+                'start': start_time,
+                'end': end_time,
+                'status': status,
+                'error': error_message,
+                'hash': input_hash
+            })
+    except Exception as e:
+        logger.error(f"记录阶段日志失败 {stage_name}: {str(e)}")
+
+def run_stage(stage_name, stage):
+    """运行一个阶段的命令，输出写入 logs/pipeline/{阶段}.log
+
+    Returns:
+        tuple: (是否成功, 错误信息)
+    """
+    os.makedirs(STAGE_LOG_DIR, exist_ok=True)
+    log_file = os.path.join(STAGE_LOG_DIR, f'{stage_name}.log')
+    with open(log_file, 'w', encoding='utf-8') as f:
+        result = subprocess.run(stage['command'], shell=True, cwd=BASE_DIR,
+                                stdout=f, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        return False, f"命令退出码 {result.returncode}，详见 {os.path.relpath(log_file, BASE_DIR)}"
+    return True, None
+
+def execute_stage(stage_name, stage, force=False, dry_run=False):
+    """检查输入指纹，输入有变化时运行阶段并记录日志
+
+    Returns:
+        str: success / failed / skipped
+    """
+    start_time = datetime.now()
+    try:
+        input_hash = input_fingerprint(stage)
+        if (not force and not stage.get('always_run') and input_hash is not None
+                and input_hash == last_success_fingerprint(stage_name)):
+            logger.info(f"[{stage_name}] {stage['label']}: 输入未变化，跳过")
+            if not dry_run:
+                log_stage(stage_name, start_time, datetime.now(), 'skipped', input_hash)
+            return 'skipped'
+
+        if dry_run:
+            logger.info(f"[{stage_name}] {stage['label']}: 将运行 {stage['command']}")
+            return 'success'
+
+        logger.info(f"[{stage_name}] {stage['label']}: 开始运行")
+        start = time.perf_counter()
+        success, error = run_stage(stage_name, stage)
+    except Exception as e:
+        success, error, start = False, str(e), time.perf_counter()
+        input_hash = None
+
+    status = 'success' if success else 'failed'
+    if not dry_run:
+        log_stage(stage_name, start_time, datetime.now(), status, input_hash, error)
+    if success:
+        logger.info(f"[{stage_name}] {stage['label']}: 完成, 耗时 {time.perf_counter() - start:.2f}秒")
+    else:
+        logger.error(f"[{stage_name}] {stage['label']}: 失败: {error}")
+    return status
+
+def run_pipeline(stage_names=None, force=False, dry_run=False, max_workers=4):
+    """按依赖关系运行流水线
+
+    上游阶段全部成功或跳过后，下游阶段才开始；互不依赖的阶段并行运行。
+    上游阶段失败时，下游阶段不再运行。
+
+    Args:
+        stage_names (list): 只运行这些阶段（未选中的上游阶段视为已完成），默认全部
+        force (bool): 忽略输入指纹，全部重新运行
+        dry_run (bool): 只显示将要运行和跳过的阶段，不执行命令
+        max_workers (int): 最多同时运行的阶段数
+
+    Returns:
+        dict: {阶段: success / failed / skipped / blocked}
+    """
+    start = time.perf_counter()
+    selected = stage_names or list(PIPELINE_STAGES)
+    unknown = set(selected) - set(PIPELINE_STAGES)
+    if unknown:
+        raise ValueError(f"未知阶段: {', '.join(sorted(unknown))}")
+
+    stages = {name: PIPELINE_STAGES[name] for name in selected}
+    dependencies = {name: deps & set(stages) for name, deps in stage_dependencies(PIPELINE_STAGES).items()
+                    if name in stages}
+    order = topological_order(dependencies)
+    logger.info(f"流水线阶段: {' -> '.join(order)}")
+
+    results = {}
+    running = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(results) < len(order):
+            for name in order:
+                if name in results or name in running:
+                    continue
+                deps = dependencies[name]
+                if any(results.get(d) in ('failed', 'blocked') for d in deps):
+                    results[name] = 'blocked'
+                    logger.warning(f"[{name}] {stages[name]['label']}: 上游阶段失败，不再运行")
+                elif all(d in results for d in deps):
+                    running[name] = executor.submit(execute_stage, name, stages[name], force, dry_run)
+
+            if not running:
+                continue
+            done, _ = concurrent.futures.wait(running.values(), return_when=concurrent.futures.FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future in done:
+                    results[name] = future.result()
+                    del running[name]
+
+    summary = ', '.join(f"{name}={results[name]}" for name in order)
+    logger.info(f"流水线完成, 总耗时 {time.perf_counter() - start:.2f}秒: {summary}")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='每日数据更新流水线')
+    parser.add_argument('--stages', nargs='+', choices=list(PIPELINE_STAGES),
+                        help='只运行指定阶段，默认全部')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略输入指纹，全部重新运行')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只显示将要运行和跳过的阶段')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='最多同时运行的阶段数 (默认: 4)')
+    parser.add_argument('--list', action='store_true',
+                        help='列出所有阶段及其依赖')
+    args = parser.parse_args()
+
+    if args.list:
+        dependencies = stage_dependencies(PIPELINE_STAGES)
+        for name in topological_order(dependencies):
+            deps = ', '.join(sorted(dependencies[name])) or '-'
+            print(f"{name:<24}{PIPELINE_STAGES[name]['label']:<12}依赖: {deps}")
+        sys.exit(0)
+
+    results = run_pipeline(args.stages, force=args.force, dry_run=args.dry_run, max_workers=args.workers)
+    sys.exit(0 if all(status in ('success', 'skipped') for status in results.values()) else 1)
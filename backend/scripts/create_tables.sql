@@ -130,6 +130,8 @@ CREATE TABLE `stock_chip_analysis` (
   `locked_chip_ratio` decimal(10,4) DEFAULT NULL,
   `main_chip_ratio` decimal(10,4) DEFAULT NULL,
   `floating_chip_ratio` decimal(10,4) DEFAULT NULL,
+  `avg_cost` decimal(10,2) DEFAULT NULL,
+  `concentration_90` decimal(10,4) DEFAULT NULL,
   `rank_num` int NOT NULL,
   `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -139,6 +141,80 @@ CREATE TABLE `stock_chip_analysis` (
   KEY `idx_strategy_rank` (`strategy_type`,`rank_num`) USING BTREE
 ) ENGINE=InnoDB AUTO_INCREMENT=1991 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- ----------------------------
+-- Table structure for stock_chip_distribution
+-- ----------------------------
+DROP TABLE IF EXISTS `stock_chip_distribution`;
+CREATE TABLE `stock_chip_distribution` (
+  `stock_code` varchar(6) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '股票代码',
+  `trade_date` date NOT NULL COMMENT '交易日期',
+  `close_price` decimal(10,2) NOT NULL COMMENT '收盘价',
+  `profit_ratio` decimal(10,4) DEFAULT NULL COMMENT '获利比例',
+  `avg_cost` decimal(10,2) DEFAULT NULL COMMENT '平均成本',
+  `cost_70_low` decimal(10,2) DEFAULT NULL COMMENT '70%筹码成本下限',
+  `cost_70_high` decimal(10,2) DEFAULT NULL COMMENT '70%筹码成本上限',
+  `concentration_70` decimal(10,4) DEFAULT NULL COMMENT '70%筹码集中度',
+  `cost_90_low` decimal(10,2) DEFAULT NULL COMMENT '90%筹码成本下限',
+  `cost_90_high` decimal(10,2) DEFAULT NULL COMMENT '90%筹码成本上限',
+  `concentration_90` decimal(10,4) DEFAULT NULL COMMENT '90%筹码集中度',
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  PRIMARY KEY (`stock_code`,`trade_date`) USING BTREE,
+  KEY `idx_trade_date` (`trade_date`) USING BTREE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='换手率衰减筹码分布指标';
+
+-- ----------------------------
+-- Table structure for stock_chip_state
+-- ----------------------------
+DROP TABLE IF EXISTS `stock_chip_state`;
+CREATE TABLE `stock_chip_state` (
+  `stock_code` varchar(6) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '股票代码',
+  `last_date` date NOT NULL COMMENT '状态对应的最后交易日',
+  `last_close` decimal(10,2) NOT NULL COMMENT '最后交易日收盘价(用于校验行情是否被重新导入)',
+  `first_bin` smallint NOT NULL COMMENT '第一个非零价格分箱序号',
+  `bins` mediumblob NOT NULL COMMENT '价格分箱上的筹码分布(float32)',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`stock_code`) USING BTREE,
+  KEY `idx_last_date` (`last_date`) USING BTREE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='筹码分布增量计算状态';
+
+-- ----------------------------
+-- Table structure for stock_daily_indicators
+-- ----------------------------
+DROP TABLE IF EXISTS `stock_daily_indicators`;
+CREATE TABLE `stock_daily_indicators` (
+  `stock_code` varchar(6) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '股票代码',
+  `trade_date` date NOT NULL COMMENT '交易日期',
+  `close_price` decimal(10,2) NOT NULL COMMENT '收盘价',
+  `ma_5` decimal(16,6) DEFAULT NULL COMMENT '5日均线',
+  `ma_10` decimal(16,6) DEFAULT NULL COMMENT '10日均线',
+  `ma_20` decimal(16,6) DEFAULT NULL COMMENT '20日均线',
+  `ma_60` decimal(16,6) DEFAULT NULL COMMENT '60日均线',
+  `ma_100` decimal(16,6) DEFAULT NULL COMMENT '100日均线',
+  `ma_200` decimal(16,6) DEFAULT NULL COMMENT '200日均线',
+  `volume_ma5` decimal(24,6) DEFAULT NULL COMMENT '5日均量',
+  `volume_ma20` decimal(24,6) DEFAULT NULL COMMENT '20日均量',
+  `volume_ma60` decimal(24,6) DEFAULT NULL COMMENT '60日均量',
+  `volume_ma100` decimal(24,6) DEFAULT NULL COMMENT '100日均量',
+  `volume_ma200` decimal(24,6) DEFAULT NULL COMMENT '200日均量',
+  `prev_ma_5` decimal(16,6) DEFAULT NULL COMMENT '前一交易日5日均线',
+  `prev_ma_20` decimal(16,6) DEFAULT NULL COMMENT '前一交易日20日均线',
+  `ma_5_change` decimal(16,6) DEFAULT NULL COMMENT '5日均线5日变化率(%)',
+  `ma_20_change` decimal(16,6) DEFAULT NULL COMMENT '20日均线5日变化率(%)',
+  `volume_ratio` decimal(16,6) DEFAULT NULL COMMENT '量比(成交量/20日均量)',
+  `max_price_5d` decimal(10,2) DEFAULT NULL COMMENT '5日阻力位(最近6条最高价)',
+  `min_price_5d` decimal(10,2) DEFAULT NULL COMMENT '5日支撑位(最近6条最低价)',
+  `max_price_10d` decimal(10,2) DEFAULT NULL COMMENT '10日阻力位(最近11条最高价)',
+  `min_price_10d` decimal(10,2) DEFAULT NULL COMMENT '10日支撑位(最近11条最低价)',
+  `max_price_20d` decimal(10,2) DEFAULT NULL COMMENT '20日阻力位(最近21条最高价)',
+  `min_price_20d` decimal(10,2) DEFAULT NULL COMMENT '20日支撑位(最近21条最低价)',
+  `vwap_20d` decimal(16,6) DEFAULT NULL COMMENT '20日成交量加权均价',
+  `avg_volume_20d` decimal(24,6) DEFAULT NULL COMMENT '20日平均成交量',
+  `price_change_rate_20d` decimal(16,6) DEFAULT NULL COMMENT '20日涨跌幅(%)',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`stock_code`,`trade_date`) USING BTREE,
+  KEY `idx_trade_date` (`trade_date`) USING BTREE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='每日技术指标(均线/均量/交叉/支撑阻力)';
+
 -- ----------------------------
 -- Table structure for stock_historical_quotes
 -- ----------------------------
@@ -168,6 +244,19 @@ CREATE TABLE `stock_historical_quotes` (
   CONSTRAINT `stock_historical_quotes_ibfk_1` FOREIGN KEY (`stock_code`) REFERENCES `stocks` (`stock_code`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='股票历史交易数据';
 
+-- ----------------------------
+-- Table structure for stock_indicator_state
+-- ----------------------------
+DROP TABLE IF EXISTS `stock_indicator_state`;
+CREATE TABLE `stock_indicator_state` (
+  `stock_code` varchar(6) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '股票代码',
+  `last_date` date NOT NULL COMMENT '状态对应的最后交易日',
+  `bars` mediumtext CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '评分窗口内的行情(JSON: 日期/收盘价/成交量)',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`stock_code`) USING BTREE,
+  KEY `idx_last_date` (`last_date`) USING BTREE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='技术评分增量计算状态';
+
 -- ----------------------------
 -- Table structure for stock_recommendations
 -- ----------------------------
@@ -204,6 +293,9 @@ CREATE TABLE `stock_technical_scores` (
   `volume_score` int DEFAULT NULL COMMENT '成交量评分',
   `bollinger_score` int DEFAULT NULL COMMENT '布林带评分',
   `total_score` int DEFAULT NULL COMMENT '总评分',
+  `industry` varchar(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '所属行业',
+  `score_rank` int DEFAULT NULL COMMENT '当日全市场排名',
+  `industry_rank` int DEFAULT NULL COMMENT '当日行业内排名',
   `ma5` decimal(10,2) DEFAULT NULL COMMENT '5日均线',
   `ma20` decimal(10,2) DEFAULT NULL COMMENT '20日均线',
   `ma60` decimal(10,2) DEFAULT NULL COMMENT '60日均线',
@@ -221,7 +313,9 @@ CREATE TABLE `stock_technical_scores` (
   PRIMARY KEY (`id`) USING BTREE,
   UNIQUE KEY `uk_stock_date` (`stock_code`,`score_date`) USING BTREE,
   KEY `idx_date_score` (`score_date`,`total_score`) USING BTREE,
-  KEY `idx_stock_date` (`stock_code`,`score_date`) USING BTREE
+  KEY `idx_stock_date` (`stock_code`,`score_date`) USING BTREE,
+  KEY `idx_date_rank` (`score_date`,`score_rank`) USING BTREE,
+  KEY `idx_date_industry_rank` (`score_date`,`industry`,`industry_rank`) USING BTREE
 ) ENGINE=InnoDB AUTO_INCREMENT=2068 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='股票技术评分表';
 
 -- ----------------------------
@@ -282,6 +376,7 @@ CREATE TABLE `update_logs` (
   `status` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci DEFAULT NULL,
   `records_affected` int DEFAULT NULL,
   `error_message` text CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci,
+  `input_hash` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci DEFAULT NULL COMMENT '流水线阶段输入指纹',
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
   KEY `idx_update_logs_table` (`table_name`) USING BTREE
@@ -0,0 +1,127 @@
+"""
+HTTP 服务压力测试
+
+按小程序的访问方式并发请求接口（评分列表、推荐、个股详情、历史行情和技术分析），
+统计吞吐量和各接口的响应时间分位数，结束后输出服务端连接池统计。
+
+    # 先启动服务（gunicorn -c backend/gunicorn.conf.py），再运行
+    python backend/scripts/load_test.py --url http://localhost:5000 --concurrency 32 --duration 30
+
+测试股票取自 /api/technical/scores 当日排名前 --stocks 名，数据库需已有评分数据。
+"""
+import sys
+import time
+import random
+import threading
+import concurrent.futures
+from collections import defaultdict
+import numpy as np
+import requests
+
+# 每次"打开页面"请求的接口（{code} 为股票代码，{date} 为最新评分日）
+STOCK_PATHS = [
+    '/api/stocks/{code}/details',
+    '/api/stocks/{code}/history?days=5',
+    '/api/technical/bundle/{code}?date={date}',
+]
+LIST_PATHS = [
+    '/api/technical/scores?limit=20',
+    '/api/technical/recommendations',
+]
+
+def load_test_stocks(base_url, count):
+    """取最新评分日排名靠前的股票作为测试样本"""
+    response = requests.get(f"{base_url}/api/technical/scores", params={'limit': count}, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+    codes = [item['stock_code'] for item in data['scores']]
+    if not codes:
+        raise RuntimeError('评分表为空，无法选择测试股票')
+    return codes, data['date']
+
+def endpoint_name(path):
+    """统计用的接口名（去掉股票代码和查询参数）"""
+    return path.split('?')[0].replace('/{code}', '')
+
+def run_worker(base_url, codes, date, deadline, results, lock):
+    """单个并发用户：循环随机选择股票，依次请求列表页和个股页的接口"""
+    session = requests.Session()
+    local = defaultdict(list)
+    errors = defaultdict(int)
+    while time.perf_counter() < deadline:
+        code = random.choice(codes)
+        for path in LIST_PATHS + STOCK_PATHS:
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path.format(code=code, date=date), timeout=30)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            local[endpoint_name(path)].append(elapsed)
+            if not ok:
+                errors[endpoint_name(path)] += 1
+    with lock:
+        for name, values in local.items():
+            results['latency'][name].extend(values)
+        for name, value in errors.items():
+            results['errors'][name] += value
+
+def print_report(results, seconds):
+    """输出吞吐量和响应时间分位数（毫秒）"""
+    total = sum(len(v) for v in results['latency'].values())
+    errors = sum(results['errors'].values())
+    print(f"\n总请求数: {total}, 错误: {errors}, 耗时: {seconds:.1f}秒, 吞吐量: {total / seconds:.1f} req/s")
+    print(f"{'接口':<42}{'请求数':>8}{'错误':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name in sorted(results['latency']):
+        values = np.array(results['latency'][name]) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"{name:<42}{len(values):>8}{results['errors'][name]:>6}"
+              f"{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{values.max():>9.1f}")
+
+def run_load_test(base_url, concurrency, duration, stocks):
+    """并发压测
+
+    Args:
+        base_url (str): 服务地址
+        concurrency (int): 并发用户数
+        duration (int): 持续时间（秒）
+        stocks (int): 测试股票数
+    """
+    codes, date = load_test_stocks(base_url, stocks)
+    print(f"测试股票 {len(codes)} 只, 评分日 {date}, 并发 {concurrency}, 持续 {duration}秒")
+
+    results = {'latency': defaultdict(list), 'errors': defaultdict(int)}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run_worker, base_url, codes, date, deadline, results, lock)
+            for _ in range(concurrency)
+        ]
+        for future in futures:
+            future.result()
+    print_report(results, time.perf_counter() - start)
+
+    # 连接池统计为响应该请求的 worker 进程的累计值
+    try:
+        print(f"\n连接池统计: {requests.get(f'{base_url}/api/db/pool', timeout=10).json()}")
+    except requests.RequestException as e:
+        print(f"获取连接池统计失败: {str(e)}")
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HTTP 服务压力测试')
+    parser.add_argument('--url', default='http://localhost:5000', help='服务地址 (默认: http://localhost:5000)')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发用户数 (默认: 16)')
+    parser.add_argument('--duration', type=int, default=30, help='持续时间，秒 (默认: 30)')
+    parser.add_argument('--stocks', type=int, default=100, help='测试股票数 (默认: 100)')
+    args = parser.parse_args()
+
+    try:
+        run_load_test(args.url.rstrip('/'), args.concurrency, args.duration, args.stocks)
+    except Exception as e:
+        print(f"压力测试失败: {str(e)}")
+        sys.exit(1)
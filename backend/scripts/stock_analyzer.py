@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import pandas as pd
 from datetime import datetime, date
@@ -87,14 +88,18 @@ def process_stock_metrics(info, stock_code, trade_date):
     }
 
 def analyze_stock_info(full_history=False):
-    """分析股票信息并生成分析报告"""
+    """分析股票信息并生成分析报告
+
+    Returns:
+        bool: 是否成功（缺少原始数据时返回 False）
+    """
     start_time = datetime.now()
     
     # 检查原始数据目录
     stock_info_dir = 'stock_fundamental/stock_info'
     if not os.path.exists(stock_info_dir):
         logger.error("未找到 stock_info 目录，请先运行 sh_stock_downloader.py")
-        return
+        return False
     
     # 创建分析结果目录
     analysis_dir = 'stock_fundamental/stock_analysis'
@@ -116,7 +121,7 @@ def analyze_stock_info(full_history=False):
 
     if not date_dirs:
         logger.error("未找到任何日期目录")
-        return
+        return False
     
     # 根据参数决定处理哪些日期
     date_dirs.sort(key=lambda x: x[1])
@@ -201,6 +206,7 @@ def analyze_stock_info(full_history=False):
 
     end_time = datetime.now()
     logger.info(f"\n分析完成! 总耗时: {end_time - start_time}")
+    return True
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='股票数据分析程序')
@@ -209,4 +215,5 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     logger.info("开始分析股票信息...")
-    analyze_stock_info(full_history=args.full) 
\ No newline at end of file
+    success = analyze_stock_info(full_history=args.full)
+    sys.exit(0 if success else 1)
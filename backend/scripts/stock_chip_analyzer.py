@@ -5,7 +5,9 @@ from config.database import DB_CONFIG_ADMIN
 
 from sqlalchemy import create_engine, text
 import logging
-from datetime import datetime
+import time
+from utils.sharding import load_shard_codes, split_code_ranges, run_shards
+from utils.cache_version import bump_cache_version
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -17,9 +19,13 @@ engine = create_engine(
     f"@{DB_CONFIG_ADMIN['host']}/{DB_CONFIG_ADMIN['database']}?charset=utf8mb4"
 )
 
-def get_base_chip_sql():
-    """返回基础的筹码计算SQL"""
-    return """
+def get_base_chip_sql(sharded=False):
+    """返回基础的筹码计算SQL
+
+    Args:
+        sharded (bool): 是否只计算 :first_code 到 :last_code 范围内的股票
+    """
+    return f"""
     WITH price_data AS (
         -- 计算最近 60 天的技术指标
         SELECT 
@@ -49,6 +55,7 @@ def get_base_chip_sql():
             ), 0) AS vwap
         FROM stock_historical_quotes
         WHERE trade_date >= DATE_SUB(:latest_date, INTERVAL 60 DAY)
+          {'AND stock_code BETWEEN :first_code AND :last_code' if sharded else ''}
     ),
     chip_distribution AS (
         -- 计算筹码分布
@@ -105,9 +112,189 @@ def get_base_chip_sql():
     )
     """
 
-def update_chip_analysis():
-    """每日更新股票筹码分析"""
+# 筹码指标临时表（会话级，连接关闭后自动删除）
+CHIP_WORKING_TABLE = 'tmp_chip_latest'
+
+# 筹码指标临时表字段
+CHIP_WORKING_COLUMNS = [
+    'stock_code', 'stock_name', 'industry', 'close_price', 'ma60', 'vwap',
+    'profit_chip_ratio', 'locked_chip_ratio', 'main_chip_ratio', 'floating_chip_ratio',
+    'avg_cost', 'concentration_90'
+]
+
+# 每个策略入选的股票数
+STRATEGY_LIMIT = 50
+
+# 策略定义：筛选条件与排名规则，均基于筹码指标临时表中的字段
+CHIP_STRATEGIES = {
+    '低吸': {
+        'label': '低吸',
+        'where': """
+            main_chip_ratio >= 0.3          -- 主力筹码占比超过30%
+            AND profit_chip_ratio < 0.5     -- 获利筹码占比低于50%
+        """,
+        'order_by': """
+            main_chip_ratio DESC, profit_chip_ratio ASC,
+            ABS(close_price - vwap) ASC
+        """
+    },
+    '追涨': {
+        'label': '追涨',
+        'where': """
+            profit_chip_ratio >= 0.6        -- 获利筹码比例降至60%
+            AND main_chip_ratio >= 0.3      -- 主力筹码比例降至30%
+            AND floating_chip_ratio < 0.4   -- 浮动筹码比例放宽到40%
+            AND close_price > ma60          -- 确保价格在60日均线上方
+            AND close_price > vwap          -- 确保价格在成本线上方
+            AND locked_chip_ratio < 0.3     -- 套牢筹码比例低于30%
+        """,
+        'order_by': """
+            profit_chip_ratio * 0.4 +           -- 获利筹码权重
+            main_chip_ratio * 0.4 +             -- 主力筹码权重
+            (1 - floating_chip_ratio) * 0.2     -- 浮动筹码反向权重
+            DESC
+        """
+    },
+    '潜力': {
+        'label': '潜力股',
+        'where': """
+            main_chip_ratio >= 0.5                      -- 主力筹码占比超过50%
+            AND floating_chip_ratio < 0.3               -- 浮动筹码占比低于30%
+            AND profit_chip_ratio BETWEEN 0.6 AND 0.85  -- 获利筹码在合理区间
+        """,
+        'order_by': """
+            main_chip_ratio DESC, floating_chip_ratio ASC,
+            profit_chip_ratio ASC
+        """
+    }
+}
+
+def build_chip_working_set(conn, latest_date, code_range=None):
+    """计算最新交易日全部股票的筹码指标并写入临时表
+
+    60 日窗口的均线、VWAP 和各类筹码占比只计算一次，各策略的排名都从
+    临时表读取，不再重复扫描行情表。临时表只对当前连接可见。
+    stock_chip_distribution 中有当日筹码分布的股票，获利/套牢筹码使用
+    筹码分布的获利比例，否则使用成交量估算值。
+
+    Args:
+        conn: 数据库连接
+        latest_date: 最新交易日期
+        code_range (tuple): (first_code, last_code)，只计算该代码范围内的股票
+    Returns:
+        int: 临时表中的股票数
+    """
+    params = {'latest_date': latest_date}
+    if code_range:
+        params['first_code'], params['last_code'] = code_range
+    conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {CHIP_WORKING_TABLE}"))
+    conn.execute(text(f"""
+        CREATE TEMPORARY TABLE {CHIP_WORKING_TABLE} AS
+        {get_base_chip_sql(sharded=bool(code_range))}
+        SELECT
+            ld.stock_code, ld.stock_name, ld.industry,
+            ld.close_price, ld.ma60, ld.vwap,
+            COALESCE(cyq.profit_ratio, ld.profit_chip_ratio) AS profit_chip_ratio,
+            COALESCE(1 - cyq.profit_ratio, ld.locked_chip_ratio) AS locked_chip_ratio,
+            ld.main_chip_ratio, ld.floating_chip_ratio,
+            cyq.avg_cost, cyq.concentration_90
+        FROM latest_data ld
+        LEFT JOIN stock_chip_distribution cyq
+          ON cyq.stock_code = ld.stock_code AND cyq.trade_date = :latest_date
+    """), params)
+    return count_chip_working_set(conn)
+
+def count_chip_working_set(conn):
+    """返回筹码指标临时表中的股票数，没有当日筹码分布时给出提示"""
+    counts = conn.execute(text(f"""
+        SELECT COUNT(*) AS total, COUNT(avg_cost) AS with_distribution
+        FROM {CHIP_WORKING_TABLE}
+    """)).first()
+    if counts.total and not counts.with_distribution:
+        logger.warning("未找到当日筹码分布数据（scripts/stock_chip_distribution.py），"
+                       "获利/套牢筹码使用成交量估算")
+    return counts.total
+
+def compute_chip_shard(code_range, latest_date):
+    """计算一个股票代码范围内的筹码指标（在分片子进程中运行）
+
+    Returns:
+        list: 筹码指标临时表的记录（CHIP_WORKING_COLUMNS）
+    """
+    # 子进程不能复用父进程的连接
+    engine.dispose(close=False)
+    with engine.connect() as conn:
+        build_chip_working_set(conn, latest_date, code_range)
+        rows = conn.execute(text(f"""
+            SELECT {', '.join(CHIP_WORKING_COLUMNS)} FROM {CHIP_WORKING_TABLE}
+        """)).mappings().all()
+    return [dict(row) for row in rows]
+
+def load_chip_working_set(conn, records, batch_size=1000):
+    """将各分片计算的筹码指标批量写入当前连接的临时表
+
+    Returns:
+        int: 临时表中的股票数
+    """
+    conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {CHIP_WORKING_TABLE}"))
+    conn.execute(text(f"""
+        CREATE TEMPORARY TABLE {CHIP_WORKING_TABLE} (
+            stock_code varchar(6) NOT NULL,
+            stock_name varchar(100),
+            industry varchar(100),
+            close_price decimal(10,2),
+            ma60 double,
+            vwap double,
+            profit_chip_ratio double,
+            locked_chip_ratio double,
+            main_chip_ratio double,
+            floating_chip_ratio double,
+            avg_cost double,
+            concentration_90 double
+        )
+    """))
+    sql = text(f"""
+        INSERT INTO {CHIP_WORKING_TABLE} ({', '.join(CHIP_WORKING_COLUMNS)})
+        VALUES ({', '.join(':' + c for c in CHIP_WORKING_COLUMNS)})
+    """)
+    for i in range(0, len(records), batch_size):
+        conn.execute(sql, records[i:i + batch_size])
+    return count_chip_working_set(conn)
+
+def get_strategy_insert_sql(strategy_type):
+    """返回从筹码指标临时表生成指定策略排名的 SQL
+
+    Args:
+        strategy_type (str): 策略类型（低吸/追涨/潜力）
+    """
+    strategy = CHIP_STRATEGIES[strategy_type]
+    return f"""
+    INSERT INTO stock_chip_analysis (
+        stock_code, stock_name, industry, analysis_date, strategy_type,
+        close_price, ma60, vwap, profit_chip_ratio, locked_chip_ratio,
+        main_chip_ratio, floating_chip_ratio, avg_cost, concentration_90, rank_num
+    )
+    SELECT * FROM (
+        SELECT
+            stock_code, stock_name, industry, :latest_date, :strategy_type,
+            close_price, ma60, vwap, profit_chip_ratio, locked_chip_ratio,
+            main_chip_ratio, floating_chip_ratio, avg_cost, concentration_90,
+            ROW_NUMBER() OVER (ORDER BY {strategy['order_by']}) AS rank_num
+        FROM {CHIP_WORKING_TABLE}
+        WHERE {strategy['where']}
+    ) ranked
+    WHERE rank_num <= :limit
+    """
+
+def update_chip_analysis(shards=None):
+    """每日更新股票筹码分析
+
+    Args:
+        shards (int): 分片数，指定时按股票代码范围分片，多进程并行计算筹码指标，
+            合并到主进程的临时表后统一按策略排名
+    """
     try:
+        start = time.perf_counter()
         with engine.connect() as conn:
             # 1. 获取最新交易日期
             date_sql = "SELECT MAX(trade_date) as latest_date FROM stock_historical_quotes"
@@ -146,7 +333,7 @@ def update_chip_analysis():
             
             if existing_count > 0:
                 logger.info("今日筹码分析已存在，无需重新生成")
-                return False
+                return True
 
             # 4. 删除当天的历史数据（以防万一）
             conn.execute(text("""
@@ -154,333 +341,28 @@ def update_chip_analysis():
                 WHERE analysis_date = :date
             """), {'date': latest_date})
 
-            base_sql = get_base_chip_sql()
-
-            # 5. 执行低吸策略分析
-            logger.info("执行低吸策略分析...")
-            low_buy_sql = """
-            INSERT INTO stock_chip_analysis (
-                stock_code, stock_name, industry, analysis_date, strategy_type, 
-                close_price, ma60, vwap, profit_chip_ratio, locked_chip_ratio,
-                main_chip_ratio, floating_chip_ratio, rank_num
-            )
-            WITH price_data AS (
-                -- 计算最近 60 天的技术指标
-                SELECT 
-                    stock_code,
-                    trade_date,
-                    close_price,
-                    high_price,
-                    low_price,
-                    volume,
-                    -- 计算 60 日均线 (MA60)
-                    AVG(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) AS ma60,
-                    -- 计算 60 日均量
-                    AVG(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) AS avg_vol_60d,
-                    -- 计算 VWAP
-                    SUM(close_price * volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS vwap
-                FROM stock_historical_quotes
-                WHERE trade_date >= DATE_SUB(:latest_date, INTERVAL 60 DAY)
-            ),
-            chip_distribution AS (
-                -- 计算筹码分布
-                SELECT 
-                    stock_code,
-                    trade_date,
-                    close_price,
-                    ma60, vwap, avg_vol_60d,
-                    -- 计算获利筹码
-                    SUM(CASE WHEN close_price > vwap THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS profit_chip_ratio,
-                    -- 计算套牢筹码
-                    SUM(CASE WHEN close_price < vwap THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS locked_chip_ratio,
-                    -- 计算主力筹码
-                    SUM(CASE WHEN volume > 1.2 * avg_vol_60d 
-                             AND close_price BETWEEN vwap * 0.98 AND vwap * 1.02
-                        THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS main_chip_ratio,
-                    -- 计算浮动筹码
-                    SUM(CASE WHEN volume < 0.8 * avg_vol_60d THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS floating_chip_ratio
-                FROM price_data
-            ),
-            latest_data AS (
-                -- 获取最新数据
-                SELECT 
-                    cd.*,
-                    s.stock_name,
-                    s.industry
-                FROM chip_distribution cd
-                JOIN stocks s ON cd.stock_code = s.stock_code
-                WHERE cd.trade_date = :latest_date
-            )
-            SELECT 
-                stock_code, stock_name, industry, :latest_date, '低吸',
-                close_price, ma60, vwap, profit_chip_ratio, locked_chip_ratio,
-                main_chip_ratio, floating_chip_ratio,
-                ROW_NUMBER() OVER (
-                    ORDER BY main_chip_ratio DESC, profit_chip_ratio ASC, 
-                            ABS(close_price - vwap) ASC
-                ) as rank_num
-            FROM latest_data
-            WHERE main_chip_ratio >= 0.3  -- 主力筹码占比超过30%
-            AND profit_chip_ratio < 0.5   -- 获利筹码占比低于50%
-            LIMIT 50
-            """
-            conn.execute(text(low_buy_sql), {'latest_date': latest_date})
-            
-            # 6. 执行追涨策略分析
-            logger.info("执行追涨策略分析...")
-            follow_up_sql = """
-            INSERT INTO stock_chip_analysis (
-                stock_code, stock_name, industry, analysis_date, strategy_type, 
-                close_price, ma60, vwap, profit_chip_ratio, locked_chip_ratio,
-                main_chip_ratio, floating_chip_ratio, rank_num
-            )
-            WITH price_data AS (
-                -- 计算最近 60 天的技术指标
-                SELECT 
-                    stock_code,
-                    trade_date,
-                    close_price,
-                    high_price,
-                    low_price,
-                    volume,
-                    AVG(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) AS ma60,
-                    AVG(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) AS avg_vol_60d,
-                    SUM(close_price * volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS vwap
-                FROM stock_historical_quotes
-                WHERE trade_date >= DATE_SUB(:latest_date, INTERVAL 60 DAY)
-            ),
-            chip_distribution AS (
-                -- 计算筹码分布
-                SELECT 
-                    stock_code,
-                    trade_date,
-                    close_price,
-                    ma60, vwap, avg_vol_60d,
-                    -- 计算获利筹码
-                    SUM(CASE WHEN close_price > vwap THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS profit_chip_ratio,
-                    -- 计算套牢筹码
-                    SUM(CASE WHEN close_price < vwap THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS locked_chip_ratio,
-                    -- 计算主力筹码
-                    SUM(CASE WHEN volume > 1.2 * avg_vol_60d 
-                             AND close_price BETWEEN vwap * 0.98 AND vwap * 1.02
-                        THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS main_chip_ratio,
-                    -- 计算浮动筹码
-                    SUM(CASE WHEN volume < 0.8 * avg_vol_60d THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS floating_chip_ratio
-                FROM price_data
-            ),
-            latest_data AS (
-                -- 获取最新数据
-                SELECT 
-                    cd.*,
-                    s.stock_name,
-                    s.industry
-                FROM chip_distribution cd
-                JOIN stocks s ON cd.stock_code = s.stock_code
-                WHERE cd.trade_date = :latest_date
-            )
-            SELECT 
-                stock_code, stock_name, industry, :latest_date, '追涨',
-                close_price, ma60, vwap, profit_chip_ratio, locked_chip_ratio,
-                main_chip_ratio, floating_chip_ratio,
-                ROW_NUMBER() OVER (
-                    ORDER BY 
-                        -- 调整排序权重
-                        profit_chip_ratio * 0.4 +    -- 获利筹码权重
-                        main_chip_ratio * 0.4 +      -- 主力筹码权重
-                        (1 - floating_chip_ratio) * 0.2  -- 浮动筹码反向权重
-                    DESC
-                ) as rank_num
-            FROM latest_data
-            WHERE 
-                -- 放宽筛选条件
-                profit_chip_ratio >= 0.6   -- 获利筹码比例降至60%
-                AND main_chip_ratio >= 0.3  -- 主力筹码比例降至30%
-                AND floating_chip_ratio < 0.4  -- 浮动筹码比例放宽到40%
-                AND close_price > ma60  -- 确保价格在60日均线上方
-                AND close_price > vwap  -- 确保价格在成本线上方
-                AND locked_chip_ratio < 0.3  -- 套牢筹码比例低于30%
-            LIMIT 50
-            """
-            conn.execute(text(follow_up_sql), {'latest_date': latest_date})
-
-            # 7. 执行潜力股策略分析
-            logger.info("执行潜力股策略分析...")
-            potential_sql = """
-            INSERT INTO stock_chip_analysis (
-                stock_code, stock_name, industry, analysis_date, strategy_type, 
-                close_price, ma60, vwap, profit_chip_ratio, locked_chip_ratio,
-                main_chip_ratio, floating_chip_ratio, rank_num
-            )
-            WITH price_data AS (
-                -- 计算最近 60 天的技术指标
-                SELECT 
-                    stock_code,
-                    trade_date,
-                    close_price,
-                    high_price,
-                    low_price,
-                    volume,
-                    AVG(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) AS ma60,
-                    AVG(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) AS avg_vol_60d,
-                    SUM(close_price * volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS vwap
-                FROM stock_historical_quotes
-                WHERE trade_date >= DATE_SUB(:latest_date, INTERVAL 60 DAY)
-            ),
-            chip_distribution AS (
-                -- 计算筹码分布
-                SELECT 
-                    stock_code,
-                    trade_date,
-                    close_price,
-                    ma60, vwap, avg_vol_60d,
-                    -- 计算获利筹码
-                    SUM(CASE WHEN close_price > vwap THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS profit_chip_ratio,
-                    -- 计算套牢筹码
-                    SUM(CASE WHEN close_price < vwap THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS locked_chip_ratio,
-                    -- 计算主力筹码
-                    SUM(CASE WHEN volume > 1.2 * avg_vol_60d 
-                             AND close_price BETWEEN vwap * 0.98 AND vwap * 1.02
-                        THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS main_chip_ratio,
-                    -- 计算浮动筹码
-                    SUM(CASE WHEN volume < 0.8 * avg_vol_60d THEN volume ELSE 0 END) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) / NULLIF(SUM(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ), 0) AS floating_chip_ratio
-                FROM price_data
-            ),
-            latest_data AS (
-                -- 获取最新数据
-                SELECT 
-                    cd.*,
-                    s.stock_name,
-                    s.industry
-                FROM chip_distribution cd
-                JOIN stocks s ON cd.stock_code = s.stock_code
-                WHERE cd.trade_date = :latest_date
-            )
-            SELECT 
-                stock_code, stock_name, industry, :latest_date, '潜力',
-                close_price, ma60, vwap, profit_chip_ratio, locked_chip_ratio,
-                main_chip_ratio, floating_chip_ratio,
-                ROW_NUMBER() OVER (
-                    ORDER BY main_chip_ratio DESC, floating_chip_ratio ASC, 
-                            profit_chip_ratio ASC
-                ) as rank_num
-            FROM latest_data
-            WHERE main_chip_ratio >= 0.5      -- 主力筹码占比超过50%
-            AND floating_chip_ratio < 0.3     -- 浮动筹码占比低于30%
-            AND profit_chip_ratio BETWEEN 0.6 AND 0.85  -- 获利筹码在合理区间
-            LIMIT 50
-            """
-            conn.execute(text(potential_sql), {'latest_date': latest_date})
+            # 5. 一次性计算全部股票的筹码指标，物化为临时表
+            if shards:
+                code_ranges = split_code_ranges(load_shard_codes(conn, latest_date), shards)
+                results = run_shards(compute_chip_shard, code_ranges, latest_date)
+                chip_count = load_chip_working_set(conn, [r for records in results for r in records])
+            else:
+                chip_count = build_chip_working_set(conn, latest_date)
+            logger.info(f"筹码指标计算完成: {chip_count} 只股票, 耗时 {time.perf_counter() - start:.2f}秒")
+
+            # 6. 各策略基于同一份筹码指标排名入库
+            for strategy_type, strategy in CHIP_STRATEGIES.items():
+                logger.info(f"执行{strategy['label']}策略分析...")
+                result = conn.execute(text(get_strategy_insert_sql(strategy_type)), {
+                    'latest_date': latest_date,
+                    'strategy_type': strategy_type,
+                    'limit': STRATEGY_LIMIT
+                })
+                logger.info(f"{strategy['label']}策略入选: {result.rowcount} 只")
 
+            conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {CHIP_WORKING_TABLE}"))
             conn.commit()
-            logger.info("成功更新筹码分析")
+            logger.info(f"成功更新筹码分析, 总耗时 {time.perf_counter() - start:.2f}秒")
             return True
             
     except Exception as e:
@@ -488,4 +370,14 @@ def update_chip_analysis():
         return False
 
 if __name__ == '__main__':
-    update_chip_analysis() 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='每日更新股票筹码分析')
+    parser.add_argument('--shards', type=int,
+                        help='按股票代码范围分为 N 片，多进程并行计算筹码指标')
+    args = parser.parse_args()
+
+    success = update_chip_analysis(shards=args.shards)
+    if success:
+        bump_cache_version('chip_analysis')
+    sys.exit(0 if success else 1)
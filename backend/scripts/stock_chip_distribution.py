@@ -0,0 +1,306 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import DB_CONFIG_ADMIN
+from sqlalchemy import create_engine, text, bindparam
+import logging
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from utils.indicators import build_panel
+from utils.chip_distribution import (
+    empty_histograms, apply_day, distribution_metrics, pack_histogram, unpack_histogram
+)
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建数据库连接
+engine = create_engine(
+    f"mysql+pymysql://{DB_CONFIG_ADMIN['user']}:{DB_CONFIG_ADMIN['password']}"
+    f"@{DB_CONFIG_ADMIN['host']}/{DB_CONFIG_ADMIN['database']}?charset=utf8mb4"
+)
+
+# 重建筹码分布时回放的行情范围（自然日），更早的筹码经换手衰减后可忽略
+REBUILD_DAYS = 365
+
+# 换手率衰减系数
+DECAY = 1.0
+
+# stock_chip_distribution 写入字段
+DISTRIBUTION_COLUMNS = [
+    'stock_code', 'trade_date', 'close_price', 'profit_ratio', 'avg_cost',
+    'cost_70_low', 'cost_70_high', 'concentration_70',
+    'cost_90_low', 'cost_90_high', 'concentration_90'
+]
+
+BAR_COLUMNS = ['stock_code', 'trade_date', 'high_price', 'low_price', 'close_price', 'turnover_ratio']
+
+def load_chip_state(conn):
+    """加载所有股票的筹码分布状态
+
+    状态中记录的最后收盘价与行情表不一致（行情被重新导入，如复权价变化）
+    或该日行情已被删除的股票视为状态失效，需要从行情表重建。
+
+    Returns:
+        tuple: (codes, hist, last_dates, stale_codes)
+            codes (list): 股票代码，对应 hist 的行
+            hist (ndarray): 筹码分布矩阵
+            last_dates (dict): {stock_code: 状态最后交易日}
+            stale_codes (set): 状态失效的股票
+    """
+    rows = conn.execute(text("""
+        SELECT s.stock_code, s.last_date, s.last_close, s.first_bin, s.bins,
+               q.close_price AS db_close
+        FROM stock_chip_state s
+        LEFT JOIN stock_historical_quotes q
+          ON q.stock_code = s.stock_code AND q.trade_date = s.last_date
+    """)).fetchall()
+
+    codes = [row.stock_code for row in rows]
+    hist = empty_histograms(len(rows))
+    last_dates = {}
+    stale_codes = set()
+    for i, row in enumerate(rows):
+        last_dates[row.stock_code] = row.last_date
+        if row.db_close is None or abs(float(row.db_close) - float(row.last_close)) > 1e-6:
+            stale_codes.add(row.stock_code)
+            continue
+        unpack_histogram(hist, i, row.first_bin, row.bins)
+    return codes, hist, last_dates, stale_codes
+
+def load_chip_bars(conn, since_date, latest_date, stock_codes=None):
+    """加载 since_date 之后到 latest_date 的行情，可只加载指定股票"""
+    sql = f"""
+        SELECT {', '.join(BAR_COLUMNS)}
+        FROM stock_historical_quotes
+        WHERE trade_date > :since_date
+          AND trade_date <= :latest_date
+          {'AND stock_code IN :codes' if stock_codes is not None else ''}
+        ORDER BY stock_code, trade_date
+    """
+    params = {'since_date': since_date, 'latest_date': latest_date}
+    if stock_codes is not None:
+        if not stock_codes:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        sql = text(sql).bindparams(bindparam('codes', expanding=True))
+        params['codes'] = sorted(stock_codes)
+    else:
+        sql = text(sql)
+
+    df = pd.DataFrame(conn.execute(sql, params).fetchall(), columns=BAR_COLUMNS)
+    for column in BAR_COLUMNS[2:]:
+        df[column] = df[column].astype(float)
+    return df
+
+def load_quote_last_dates(conn):
+    """各股票行情表中的最后交易日（按主键松散索引扫描，每只股票一次查找）"""
+    return dict(conn.execute(text("""
+        SELECT stock_code, MAX(trade_date) FROM stock_historical_quotes GROUP BY stock_code
+    """)).fetchall())
+
+def delete_chip_state(conn, stock_codes):
+    """删除指定股票的筹码分布状态（需在事务中调用）"""
+    if not stock_codes:
+        return 0
+    conn.execute(text("""
+        DELETE FROM stock_chip_state WHERE stock_code IN :codes
+    """).bindparams(bindparam('codes', expanding=True)), {'codes': sorted(stock_codes)})
+    return len(stock_codes)
+
+def advance_distribution(hist, rows, bars, decay=DECAY):
+    """按交易日顺序将行情计入筹码分布，并计算需要输出的交易日指标
+
+    Args:
+        hist (ndarray): 筹码分布矩阵（原地更新）
+        rows (dict): {stock_code: hist 中的行号}
+        bars (DataFrame): 待计入的行情，emit 列标记需要输出指标的交易日
+        decay (float): 换手率衰减系数
+
+    Returns:
+        tuple: (results, last_bars)
+            results (list): stock_chip_distribution 记录
+            last_bars (dict): {stock_code: (最后交易日, 最后收盘价)}
+    """
+    bars = bars.assign(
+        avg_price=(bars['high_price'] + bars['low_price'] + bars['close_price']) / 3,
+        turnover=bars['turnover_ratio'].fillna(0) / 100,
+        date_ordinal=[pd.Timestamp(d).toordinal() for d in bars['trade_date']]
+    )
+    width = int(bars.groupby('stock_code').size().max())
+    codes, _, panels = build_panel(
+        bars, ['high_price', 'low_price', 'avg_price', 'close_price', 'turnover', 'emit', 'date_ordinal'], width
+    )
+    index = np.array([rows[code] for code in codes])
+    sub = hist[index]
+
+    results = []
+    for j in range(width):
+        apply_day(sub, panels['low_price'][:, j], panels['high_price'][:, j],
+                  panels['avg_price'][:, j], panels['turnover'][:, j], decay)
+
+        emit = np.flatnonzero(panels['emit'][:, j] == 1)
+        if len(emit) == 0:
+            continue
+        close = panels['close_price'][emit, j]
+        metrics = distribution_metrics(sub[emit], close)
+        for k, i in enumerate(emit):
+            record = {
+                'stock_code': codes[i],
+                'trade_date': date.fromordinal(int(panels['date_ordinal'][i, j])),
+                'close_price': float(close[k])
+            }
+            for name, values in metrics.items():
+                record[name] = None if np.isnan(values[k]) else round(float(values[k]), 4)
+            results.append(record)
+
+    hist[index] = sub
+    last_bars = {
+        code: (date.fromordinal(int(panels['date_ordinal'][i, -1])), float(panels['close_price'][i, -1]))
+        for i, code in enumerate(codes)
+    }
+    return results, last_bars
+
+def save_chip_state(conn, hist, rows, last_bars, batch_size=500):
+    """保存筹码分布状态（需在事务中调用）
+
+    Returns:
+        int: 保存的股票数
+    """
+    records = []
+    for code, (last_date, last_close) in last_bars.items():
+        first_bin, bins = pack_histogram(hist[rows[code]])
+        records.append({
+            'stock_code': code,
+            'last_date': last_date,
+            'last_close': last_close,
+            'first_bin': first_bin,
+            'bins': bins
+        })
+    sql = text("""
+        REPLACE INTO stock_chip_state (stock_code, last_date, last_close, first_bin, bins)
+        VALUES (:stock_code, :last_date, :last_close, :first_bin, :bins)
+    """)
+    for i in range(0, len(records), batch_size):
+        conn.execute(sql, records[i:i + batch_size])
+    return len(records)
+
+def save_chip_distribution(conn, results, batch_size=1000):
+    """保存每日筹码分布指标（需在事务中调用）"""
+    sql = text(f"""
+        REPLACE INTO stock_chip_distribution ({', '.join(DISTRIBUTION_COLUMNS)})
+        VALUES ({', '.join(':' + c for c in DISTRIBUTION_COLUMNS)})
+    """)
+    for i in range(0, len(results), batch_size):
+        conn.execute(sql, results[i:i + batch_size])
+    return len(results)
+
+def update_chip_distribution(rebuild=False, decay=DECAY):
+    """每日更新股票筹码分布
+
+    每只股票在 stock_chip_state 中保存价格分箱上的筹码分布，每日只读取新增的
+    行情，对所有股票向量化推进一步，并将获利比例、平均成本和集中度写入
+    stock_chip_distribution。状态表为空、rebuild=True、状态失效、新上市或
+    状态过旧的股票，用最近 REBUILD_DAYS 天的行情重建；重建范围内没有行情的股票
+    （长期停牌、退市）删除状态，不再参与计算。
+    """
+    try:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            latest_date = conn.execute(text(
+                "SELECT MAX(trade_date) as latest_date FROM stock_historical_quotes"
+            )).scalar()
+            logger.info(f"最新交易日期: {latest_date}")
+
+            if not latest_date:
+                logger.error("未找到任何交易数据")
+                return False
+
+            rebuild_start = (pd.Timestamp(latest_date) - pd.Timedelta(days=REBUILD_DAYS)).date()
+            codes, hist, last_dates, dropped_codes = [], empty_histograms(0), {}, set()
+            if not rebuild:
+                codes, hist, last_dates, stale_codes = load_chip_state(conn)
+
+            if not last_dates:
+                logger.info("从行情表全量重建筹码分布...")
+                new_bars = pd.DataFrame(columns=BAR_COLUMNS)
+                reloaded = load_chip_bars(conn, rebuild_start, latest_date)
+                rebuild_codes = set(reloaded['stock_code'])
+            else:
+                # 重建范围内有行情的股票；其余股票（长期停牌、退市）的状态删除
+                quote_dates = {code: d for code, d in load_quote_last_dates(conn).items() if d > rebuild_start}
+                dropped_codes = set(last_dates) - set(quote_dates)
+
+                # 状态失效、早于重建范围和新上市的股票重建
+                outdated = {code for code, d in last_dates.items() if d < rebuild_start}
+                rebuild_codes = ((stale_codes | outdated) & set(quote_dates)) | (set(quote_dates) - set(last_dates))
+
+                # 其余有新行情的股票只加载各自状态之后的行情，加载起点只由这些股票决定
+                pending = {
+                    code for code, d in quote_dates.items()
+                    if code in last_dates and code not in rebuild_codes and d > last_dates[code]
+                }
+                new_bars = pd.DataFrame(columns=BAR_COLUMNS)
+                if pending:
+                    since_date = min(last_dates[code] for code in pending)
+                    new_bars = load_chip_bars(conn, since_date, latest_date)
+                    state_last = pd.to_datetime(new_bars['stock_code'].map(last_dates))
+                    new_bars = new_bars[new_bars['stock_code'].isin(pending)
+                                        & (pd.to_datetime(new_bars['trade_date']) > state_last)]
+                reloaded = load_chip_bars(conn, rebuild_start, latest_date, rebuild_codes)
+                logger.info(f"状态 {len(last_dates)} 只, 新增行情 {len(new_bars)} 条 ({len(pending)} 只), "
+                            f"重建 {len(rebuild_codes)} 只 (失效 {len(stale_codes)} 只), "
+                            f"删除状态 {len(dropped_codes)} 只")
+
+        # 新增行情每个交易日都输出指标，重建的股票只输出最后一个交易日
+        reloaded = reloaded.assign(emit=0.0)
+        reloaded.loc[~reloaded['stock_code'].duplicated(keep='last'), 'emit'] = 1.0
+        bars = pd.concat([new_bars.assign(emit=1.0), reloaded], ignore_index=True)
+        if bars.empty:
+            if dropped_codes:
+                with engine.begin() as conn:
+                    delete_chip_state(conn, dropped_codes)
+            logger.info("没有新的行情，筹码分布无需更新")
+            return True
+
+        # 重建的股票从空分布开始
+        rows = {code: i for i, code in enumerate(codes)}
+        added = sorted(set(bars['stock_code']) - set(rows))
+        rows.update({code: len(codes) + i for i, code in enumerate(added)})
+        hist = np.concatenate([hist, empty_histograms(len(added))])
+        for code in rebuild_codes & set(codes):
+            hist[rows[code]] = 0
+
+        results, last_bars = advance_distribution(hist, rows, bars, decay)
+        logger.info(f"筹码分布计算完成: {len(last_bars)} 只股票, "
+                    f"耗时 {time.perf_counter() - start:.2f}秒")
+
+        with engine.begin() as conn:
+            if not last_dates:
+                conn.execute(text("DELETE FROM stock_chip_state"))
+            delete_chip_state(conn, dropped_codes)
+            state_count = save_chip_state(conn, hist, rows, last_bars)
+            count = save_chip_distribution(conn, results)
+        logger.info(f"成功更新筹码分布: {count} 条, 更新状态 {state_count} 只, "
+                    f"总耗时 {time.perf_counter() - start:.2f}秒")
+        return True
+
+    except Exception as e:
+        logger.error(f"更新筹码分布失败: {str(e)}")
+        return False
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='每日更新股票筹码分布（换手率衰减模型）')
+    parser.add_argument('--rebuild-state',
+                        action='store_true',
+                        help='忽略已有状态，从最近一年的行情全量重建')
+    parser.add_argument('--decay', type=float, default=DECAY,
+                        help=f'换手率衰减系数 (默认: {DECAY})')
+    args = parser.parse_args()
+
+    success = update_chip_distribution(rebuild=args.rebuild_state, decay=args.decay)
+    sys.exit(0 if success else 1)
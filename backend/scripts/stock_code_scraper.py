@@ -1,3 +1,4 @@
+import sys
 import requests
 import pandas as pd
 import json
@@ -97,4 +98,4 @@ def get_stock_list():
         return None
 
 if __name__ == "__main__":
-    get_stock_list()
+    sys.exit(0 if get_stock_list() is not None else 1)
@@ -0,0 +1,208 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import DB_CONFIG_ADMIN
+from sqlalchemy import create_engine, text, bindparam
+import logging
+import time
+import pandas as pd
+from utils.daily_indicators import (
+    LOOKBACK_ROWS, QUOTE_COLUMNS, DAILY_INDICATOR_COLUMNS,
+    compute_daily_indicators, indicator_records
+)
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建数据库连接
+engine = create_engine(
+    f"mysql+pymysql://{DB_CONFIG_ADMIN['user']}:{DB_CONFIG_ADMIN['password']}"
+    f"@{DB_CONFIG_ADMIN['host']}/{DB_CONFIG_ADMIN['database']}?charset=utf8mb4"
+)
+
+# 增量计算时向前加载的行情范围（自然日），覆盖 LOOKBACK_ROWS 个交易日
+LOOKBACK_DAYS = 400
+
+# 每批处理的股票数
+CHUNK_SIZE = 200
+
+def load_indicator_progress(conn):
+    """加载每只股票已计算指标的最后交易日
+
+    同时校验该日收盘价与行情表是否一致，行情被重新导入（如复权价变化）的股票
+    视为失效，需要重新计算全部指标。
+
+    Returns:
+        tuple: (last_dates, stale_codes)
+    """
+    rows = conn.execute(text("""
+        SELECT i.stock_code, i.trade_date, i.close_price, q.close_price AS db_close
+        FROM (
+            SELECT stock_code, MAX(trade_date) AS last_date
+            FROM stock_daily_indicators
+            GROUP BY stock_code
+        ) m
+        JOIN stock_daily_indicators i
+          ON i.stock_code = m.stock_code AND i.trade_date = m.last_date
+        LEFT JOIN stock_historical_quotes q
+          ON q.stock_code = i.stock_code AND q.trade_date = i.trade_date
+    """)).fetchall()
+
+    last_dates = {}
+    stale_codes = set()
+    for row in rows:
+        last_dates[row.stock_code] = row.trade_date
+        if row.db_close is None or abs(float(row.db_close) - float(row.close_price)) > 1e-6:
+            stale_codes.add(row.stock_code)
+    return last_dates, stale_codes
+
+def load_quotes(conn, stock_codes, since_date=None):
+    """加载指定股票 since_date（含）之后的行情，since_date 为 None 时加载全部历史"""
+    sql = text(f"""
+        SELECT {', '.join(QUOTE_COLUMNS)}
+        FROM stock_historical_quotes
+        WHERE stock_code IN :codes
+          {'AND trade_date >= :since_date' if since_date else ''}
+        ORDER BY stock_code, trade_date
+    """).bindparams(bindparam('codes', expanding=True))
+    params = {'codes': sorted(stock_codes)}
+    if since_date:
+        params['since_date'] = since_date
+    df = pd.DataFrame(conn.execute(sql, params).fetchall(), columns=QUOTE_COLUMNS)
+    for column in QUOTE_COLUMNS[2:]:
+        df[column] = df[column].astype(float)
+    return df
+
+def save_daily_indicators(conn, df, batch_size=1000):
+    """保存指标（需在事务中调用），已存在的 (stock_code, trade_date) 覆盖"""
+    sql = text(f"""
+        REPLACE INTO stock_daily_indicators ({', '.join(DAILY_INDICATOR_COLUMNS)})
+        VALUES ({', '.join(':' + c for c in DAILY_INDICATOR_COLUMNS)})
+    """)
+    records = indicator_records(df)
+    for i in range(0, len(records), batch_size):
+        conn.execute(sql, records[i:i + batch_size])
+    return len(records)
+
+def update_chunk(stock_codes, last_dates, rebuild_codes, start_date=None):
+    """计算并保存一批股票的指标
+
+    Args:
+        stock_codes (list): 本批股票
+        last_dates (dict): {stock_code: 已计算指标的最后交易日}
+        rebuild_codes (set): 需要重新计算全部指标的股票
+        start_date (date): 重新计算时只保存该日期之后的指标，None 表示全部历史
+
+    Returns:
+        int: 保存的指标条数
+    """
+    rebuild = [code for code in stock_codes if code in rebuild_codes or code not in last_dates]
+    incremental = [code for code in stock_codes if code not in rebuild]
+
+    with engine.connect() as conn:
+        frames = []
+        if incremental:
+            since_date = pd.Timestamp(min(last_dates[code] for code in incremental)) - pd.Timedelta(days=LOOKBACK_DAYS)
+            df = load_quotes(conn, incremental, since_date.date())
+            state_last = pd.to_datetime(df['stock_code'].map(last_dates))
+            is_new = pd.to_datetime(df['trade_date']) > state_last
+
+            # 向前加载的行情不足 LOOKBACK_ROWS 条的股票（长期停牌等）改为全量计算
+            history = (~is_new).groupby(df['stock_code']).sum()
+            short = set(history[history < LOOKBACK_ROWS - 1].index)
+            if short:
+                rebuild += sorted(short)
+                keep = ~df['stock_code'].isin(short)
+                df, is_new = df[keep], is_new[keep]
+
+            indicators = compute_daily_indicators(df)
+            frames.append(indicators[is_new.to_numpy()])
+
+        if rebuild:
+            since_date = None
+            if start_date:
+                since_date = (pd.Timestamp(start_date) - pd.Timedelta(days=LOOKBACK_DAYS)).date()
+            indicators = compute_daily_indicators(load_quotes(conn, rebuild, since_date))
+            if start_date:
+                indicators = indicators[pd.to_datetime(indicators['trade_date']) >= pd.Timestamp(start_date)]
+            frames.append(indicators)
+
+    df = pd.concat(frames, ignore_index=True)
+    with engine.begin() as conn:
+        stale = [code for code in rebuild if code in last_dates]
+        if stale:
+            conn.execute(text("""
+                DELETE FROM stock_daily_indicators WHERE stock_code IN :codes
+            """).bindparams(bindparam('codes', expanding=True)), {'codes': stale})
+        return save_daily_indicators(conn, df)
+
+def update_daily_indicators(rebuild=False, start_date=None, chunk_size=CHUNK_SIZE):
+    """每日更新股票技术指标表 stock_daily_indicators
+
+    每只股票只计算已有指标之后的新交易日（向前加载 LOOKBACK_DAYS 天行情作为窗口），
+    新股票、rebuild=True 或行情被重新导入的股票重新计算全部指标。
+
+    Args:
+        rebuild (bool): 重新计算所有股票的全部指标
+        start_date (str): rebuild=True 时只重新计算该日期 (YYYY-MM-DD) 之后的指标，默认全部历史
+        chunk_size (int): 每批处理的股票数
+    """
+    try:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            quote_dates = dict(conn.execute(text("""
+                SELECT stock_code, MAX(trade_date) FROM stock_historical_quotes GROUP BY stock_code
+            """)).fetchall())
+            if not quote_dates:
+                logger.error("未找到任何交易数据")
+                return False
+
+            last_dates, stale_codes = ({}, set()) if rebuild else load_indicator_progress(conn)
+
+        rebuild_codes = set(quote_dates) if rebuild else stale_codes
+        pending = sorted(
+            code for code, latest in quote_dates.items()
+            if code in rebuild_codes or code not in last_dates or latest > last_dates[code]
+        )
+        logger.info(f"待更新股票 {len(pending)} 只 (已有指标 {len(last_dates)} 只, 失效 {len(stale_codes)} 只)")
+
+        if rebuild:
+            with engine.begin() as conn:
+                if start_date:
+                    conn.execute(text("DELETE FROM stock_daily_indicators WHERE trade_date >= :start_date"),
+                                 {'start_date': start_date})
+                else:
+                    conn.execute(text("DELETE FROM stock_daily_indicators"))
+        else:
+            start_date = None
+
+        total = 0
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            total += update_chunk(chunk, last_dates, rebuild_codes, start_date)
+            logger.info(f"进度: {min(i + chunk_size, len(pending))}/{len(pending)} 只, 已写入 {total} 条")
+
+        logger.info(f"成功更新每日技术指标: {total} 条, 总耗时 {time.perf_counter() - start:.2f}秒")
+        return True
+
+    except Exception as e:
+        logger.error(f"更新每日技术指标失败: {str(e)}")
+        return False
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='每日更新股票技术指标表 (stock_daily_indicators)')
+    parser.add_argument('--rebuild',
+                        action='store_true',
+                        help='清空指标表，重新计算所有股票的指标')
+    parser.add_argument('--start-date',
+                        help='与 --rebuild 一起使用，只重新计算该日期 (YYYY-MM-DD) 之后的指标')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f'每批处理的股票数 (默认: {CHUNK_SIZE})')
+    args = parser.parse_args()
+
+    success = update_daily_indicators(rebuild=args.rebuild, start_date=args.start_date,
+                                      chunk_size=args.chunk_size)
+    sys.exit(0 if success else 1)
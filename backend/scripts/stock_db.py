@@ -2,6 +2,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.database import DB_CONFIG
+from utils.stock_registry import get_registry
 
 import logging
 from datetime import datetime
@@ -11,24 +12,40 @@ import os
 import json
 import argparse
 import concurrent.futures
-from queue import Queue
-from threading import Lock
 import glob
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 添加计数器类来安全计数
-class Counter:
-    def __init__(self):
-        self.value = 0
-        self.lock = Lock()
-    
-    def increment(self):
-        with self.lock:
-            self.value += 1
-            return self.value
+# 各指标表中定义的字段
+TABLE_FIELDS = {
+    'fundamental_metrics': [
+        'stock_code', 'date', 'pe_ratio', 'pb_ratio', 'roe',
+        'revenue_growth', 'earnings_growth', 'gross_margin', 
+        'operating_margin', 'dividend_yield'
+    ],
+    'technical_metrics': [
+        'stock_code', 'date', 'current_price', 'high_52week',
+        'low_52week', 'volume', 'avg_volume', 'avg_volume_10d',
+        'ma_200', 'beta'
+    ],
+    'financial_health': [
+        'stock_code', 'report_date', 'quick_ratio', 'current_ratio',
+        'cash_ratio', 'debt_to_equity', 'interest_coverage',
+        'operating_cash_flow', 'cash_flow_coverage'
+    ],
+    'industry_metrics': [
+        'stock_code', 'date', 'profit_margin', 'price_to_sales',
+        'industry_rank'
+    ],
+    'investor_metrics': [
+        'stock_code', 'date', 'insider_holding', 'institution_holding'
+    ]
+}
+
+# 每次 executemany 提交的最大行数
+BATCH_SIZE = 1000
 
 def get_db_engine():
     """创建数据库连接引擎"""
@@ -111,33 +128,56 @@ def insert_stock_basic_info(engine, info, stock_code, stock_name):
         logger.error(f"Error inserting stock basic info for {stock_code}: {str(e)}")
         return False
 
+def has_metric_values(data):
+    """判断记录中除主键外是否有非空指标值"""
+    return any(v is not None for k, v in data.items() if k not in ['stock_code', 'date', 'report_date'])
+
 def insert_metrics(engine, data, table_name):
     """单条插入指标数据"""
     try:
         # 过滤掉所有值为 None 的记录
-        if not any(v is not None for k, v in data.items() if k != 'stock_code' and k not in ['date', 'report_date']):
+        if not has_metric_values(data):
             return True
 
-        columns = list(data.keys())
-        column_names = ', '.join(columns)
-        placeholders = ', '.join([':' + col for col in columns])
-        update_stmt = ', '.join([f"{col}=:{col}" for col in columns if col != 'stock_code'])
-        
-        sql = f"""
-            INSERT INTO {table_name} ({column_names})
-            VALUES ({placeholders})
-            ON DUPLICATE KEY UPDATE
-            {update_stmt}
-        """
-        
         with engine.connect() as conn:
             with conn.begin():
-                conn.execute(text(sql), data)
+                upsert_metrics(conn, table_name, [data])
         return True
     except Exception as e:
         logger.error(f"Error inserting into {table_name}: {str(e)}")
         return False
 
+def upsert_metrics(conn, table_name, rows, batch_size=BATCH_SIZE):
+    """批量写入指标数据（INSERT ... ON DUPLICATE KEY UPDATE）
+
+    Args:
+        conn: 已开启事务的数据库连接
+        table_name (str): 目标表
+        rows (list): 字段一致的记录字典列表
+        batch_size (int): 每次 executemany 的行数
+    Returns:
+        int: 写入的记录数
+    """
+    if not rows:
+        return 0
+
+    columns = list(rows[0].keys())
+    column_names = ', '.join(columns)
+    placeholders = ', '.join([':' + col for col in columns])
+    # 使用 VALUES(col) 引用插入值，使 executemany 可合并为多行 INSERT
+    update_stmt = ', '.join([f"{col}=VALUES({col})" for col in columns if col != 'stock_code'])
+    
+    sql = text(f"""
+        INSERT INTO {table_name} ({column_names})
+        VALUES ({placeholders})
+        ON DUPLICATE KEY UPDATE
+        {update_stmt}
+    """)
+    
+    for i in range(0, len(rows), batch_size):
+        conn.execute(sql, rows[i:i + batch_size])
+    return len(rows)
+
 def should_update_financial_health(engine, stock_code, current_date):
     """检查是否需要更新财务健康指标"""
     try:
@@ -164,82 +204,59 @@ def should_update_financial_health(engine, stock_code, current_date):
 def ensure_stock_exists(engine, stock_code, stock_name):
     """确保股票基本信息存在"""
     try:
-        with engine.connect() as conn:
-            # 检查股票是否存在
-            result = conn.execute(text(
-                "SELECT 1 FROM stocks WHERE stock_code = :code"
-            ), {'code': stock_code}).scalar()
-            
-            # 如果不存在，插入基本信息
-            if not result:
-                conn.execute(text("""
-                    INSERT INTO stocks (stock_code, stock_name)
-                    VALUES (:code, :name)
-                """), {
-                    'code': stock_code,
-                    'name': stock_name
-                })
-                conn.commit()
-                logger.info(f"已创建股票基本信息: {stock_code}")
+        get_registry(engine).ensure_stocks({stock_code: stock_name})
         return True
     except Exception as e:
         logger.error(f"确保股票存在时出错: {str(e)}")
         return False
 
-def process_metric_file(task):
-    """处理单个指标文件"""
-    file_path, config, engine, counter = task
+def load_metric_file(file_path, table_name):
+    """读取单个指标文件，只保留表中定义的字段
+
+    Returns:
+        tuple: (stock_code, stock_name, 记录字典)，读取失败返回 None
+    """
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
-            
-            # 确保股票基本信息存在
-            stock_code = data.get('stock_code')
-            stock_name = data.get('stock_name')
-            if not ensure_stock_exists(engine, stock_code, stock_name):
-                return False
-                
-            # 只保留表中定义的字段
-            table_fields = {
-                'fundamental_metrics': [
-                    'stock_code', 'date', 'pe_ratio', 'pb_ratio', 'roe',
-                    'revenue_growth', 'earnings_growth', 'gross_margin', 
-                    'operating_margin', 'dividend_yield'
-                ],
-                'technical_metrics': [
-                    'stock_code', 'date', 'current_price', 'high_52week',
-                    'low_52week', 'volume', 'avg_volume', 'avg_volume_10d',
-                    'ma_200', 'beta'
-                ],
-                'financial_health': [
-                    'stock_code', 'report_date', 'quick_ratio', 'current_ratio',
-                    'cash_ratio', 'debt_to_equity', 'interest_coverage',
-                    'operating_cash_flow', 'cash_flow_coverage'
-                ],
-                'industry_metrics': [
-                    'stock_code', 'date', 'profit_margin', 'price_to_sales',
-                    'industry_rank'
-                ],
-                'investor_metrics': [
-                    'stock_code', 'date', 'insider_holding', 'institution_holding'
-                ]
-            }
-            
-            table_name = config['table']
-            if table_name in table_fields:
-                filtered_data = {k: data.get(k) for k in table_fields[table_name]}
-            else:
-                filtered_data = data
-            
-            # 插入数据
-            if insert_metrics(engine, filtered_data, table_name):
-                counter.increment()
-                return True
-            
-        return False
+        
+        stock_code = data.get('stock_code')
+        stock_name = data.get('stock_name')
+        if not stock_code:
+            logger.warning(f"文件缺少股票代码: {file_path}")
+            return None
+        
+        if table_name in TABLE_FIELDS:
+            filtered_data = {k: data.get(k) for k in TABLE_FIELDS[table_name]}
+        else:
+            filtered_data = data
+        return stock_code, stock_name, filtered_data
     except Exception as e:
         logger.error(f"处理文件 {file_path} 时出错: {str(e)}")
-        return False
+        return None
+
+def write_sector_batch(engine, stocks, table_rows):
+    """在一个事务中写入一个板块的全部指标数据
+
+    Args:
+        engine: 数据库引擎
+        stocks (dict): 本批次涉及的股票 {stock_code: stock_name}
+        table_rows (dict): {table_name: [记录字典, ...]}
+    Returns:
+        int: 写入的记录数，失败返回 0
+    """
+    try:
+        written = 0
+        # 缺失的股票先批量创建（已存在的股票由缓存判断，不再逐条查询）
+        get_registry(engine).ensure_stocks(stocks)
+        with engine.connect() as conn:
+            with conn.begin():
+                for table_name, rows in table_rows.items():
+                    written += upsert_metrics(conn, table_name, rows)
+        return written
+    except Exception as e:
+        logger.error(f"批量写入指标数据时出错: {str(e)}")
+        return 0
 
 def import_analyzed_data(date_str=None, full_history=False, max_workers=10):
     """从分析结果导入数据到数据库"""
@@ -255,6 +272,8 @@ def import_analyzed_data(date_str=None, full_history=False, max_workers=10):
             stock_name = data.get('stock_name')
             if stock_code and stock_name:
                 insert_stock_basic_info(engine, data, stock_code, stock_name)
+    # 基本信息已更新，股票缓存需重新加载
+    get_registry(engine).invalidate()
     
     # 2. 再处理指标数据
     analysis_dir = 'stock_fundamental/stock_analysis'
@@ -281,7 +300,8 @@ def import_analyzed_data(date_str=None, full_history=False, max_workers=10):
             sectors = [s for s in os.listdir(date_path) if os.path.isdir(os.path.join(date_path, s))]
             for sector_idx, sector in enumerate(sectors, 1):
                 sector_path = os.path.join(date_path, sector)
-                sector_counter = Counter()
+                sector_stocks = {}
+                table_rows = {}
                 logger.info(f"\n处理板块 [{sector_idx}/{len(sectors)}] {sector}...")
                 
                 # 处理每种指标
@@ -324,19 +344,29 @@ def import_analyzed_data(date_str=None, full_history=False, max_workers=10):
                     files = [f for f in os.listdir(metric_dir) if f.endswith('.json')]
                     logger.info(f"处理 {metric_type} 指标，共 {len(files)} 个文件...")
                     
-                    # 准备任务列表
-                    tasks = [
-                        (os.path.join(metric_dir, file), config, engine, sector_counter)
+                    # 并发读取文件，按表汇总成批次
+                    table_name = config['table']
+                    futures = [
+                        executor.submit(load_metric_file, os.path.join(metric_dir, file), table_name)
                         for file in files
                     ]
+                    rows = table_rows.setdefault(table_name, [])
+                    loaded_count = 0
+                    for future in concurrent.futures.as_completed(futures):
+                        result = future.result()
+                        if result is None:
+                            continue
+                        stock_code, stock_name, row = result
+                        loaded_count += 1
+                        sector_stocks.setdefault(stock_code, stock_name)
+                        # 过滤掉所有值为 None 的记录
+                        if has_metric_values(row):
+                            rows.append(row)
                     
-                    # 并发处理文件
-                    futures = [executor.submit(process_metric_file, task) for task in tasks]
-                    success_count = sum(1 for future in concurrent.futures.as_completed(futures) if future.result())
-                    
-                    logger.info(f"{metric_type} 指标处理完成: {success_count}/{len(files)}")
+                    logger.info(f"{metric_type} 指标读取完成: {loaded_count}/{len(files)}")
                 
-                sector_success = sector_counter.value
+                # 整个板块一次性写入
+                sector_success = write_sector_batch(engine, sector_stocks, table_rows)
                 total_success += sector_success
                 logger.info(f"\n{sector} 板块处理完成: {sector_success} 条记录入库成功")
 
@@ -358,4 +388,5 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     logger.info("开始导入分析数据...")
-    import_analyzed_data(args.date, args.full, args.workers)
\ No newline at end of file
+    total_success = import_analyzed_data(args.date, args.full, args.workers)
+    sys.exit(0 if total_success else 1)
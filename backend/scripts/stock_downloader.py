@@ -1,6 +1,7 @@
 import yfinance as yf
 import pandas as pd
 import os
+import sys
 from datetime import datetime
 import time
 import json
@@ -9,9 +10,11 @@ import concurrent.futures
 import logging
 from tqdm import tqdm
 import requests
-import random
 import pkg_resources
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.rate_limiter import AdaptiveRateLimiter
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,7 +37,7 @@ def get_headers():
 
 def download_stock_info(args):
     """下载单个股票信息"""
-    stock_code, stock_name, market, date_dir = args
+    stock_code, stock_name, market, date_dir, rate_limiter = args
     try:
         # 使用自定义的 session
         session = requests.Session()
@@ -47,8 +50,8 @@ def download_stock_info(args):
         # 创建股票对象时传入 session
         stock = yf.Ticker(full_code, session=session)
         
-        # 添加延时，避免请求过于频繁
-        time.sleep(random.uniform(0, 1))
+        # 按共享速率取得请求令牌，避免请求过于频繁
+        rate_limiter.acquire()
         
         max_retries = 1
         for attempt in range(max_retries):
@@ -71,9 +74,11 @@ def download_stock_info(args):
                 
                 if not info:
                     raise ValueError(f"Empty response for {full_code}")
+                rate_limiter.on_success()
                 break
                 
             except Exception as e:
+                rate_limiter.on_error()
                 if attempt < max_retries - 1:
                     delay = 0.5
                     logger.warning(f"获取 {stock_name}({stock_code}) 失败: {str(e)}, "
@@ -115,8 +120,14 @@ def download_stock_info(args):
     except Exception as e:
         return False, f"获取 {stock_name}({stock_code}) 的信息时出错: {str(e)}"
 
-def download_sh_stocks_info(max_workers=5):
-    """下载股票信息"""
+def download_sh_stocks_info(max_workers=5, rate=2.0, max_rate=None):
+    """下载股票信息
+
+    Args:
+        max_workers (int): 并发线程数
+        rate (float): 初始请求速率(次/秒)，所有线程共享
+        max_rate (float): 最高请求速率(次/秒)
+    """
     try:
         # 尝试多个可能的文件路径
         possible_paths = [
@@ -162,9 +173,10 @@ def download_sh_stocks_info(max_workers=5):
             shutil.rmtree(date_dir)
         os.makedirs(date_dir)
 
-        # 准备下载任务
+        # 准备下载任务（所有任务共享一个限速器）
+        rate_limiter = AdaptiveRateLimiter(rate=rate, max_rate=max_rate)
         download_tasks = [
-            (str(row['stock_code']).zfill(6), row['stock_name'], row['market'], date_dir)
+            (str(row['stock_code']).zfill(6), row['stock_name'], row['market'], date_dir, rate_limiter)
             for _, row in df.iterrows()
         ]
 
@@ -184,11 +196,9 @@ def download_sh_stocks_info(max_workers=5):
                 else:
                     failed_stocks.append(message)
                 logger.info(message)
-                
-                # 添加小延时避免请求过于频繁
-                # time.sleep(0.2)
 
         logger.info(f"\n下载完成! 成功: {success_count}/{len(download_tasks)}")
+        logger.info(f"请求速率统计: {rate_limiter.stats()}")
         if failed_stocks:
             logger.warning("以下股票下载失败:")
             for msg in failed_stocks:
@@ -200,11 +210,21 @@ def download_sh_stocks_info(max_workers=5):
         return 0
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='下载股票基本信息')
+    parser.add_argument('--workers', type=int, default=3, help='并发线程数')
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help='初始请求速率(次/秒)，出错时自动降低、成功后逐步恢复')
+    parser.add_argument('--max-rate', type=float, help='最高请求速率(次/秒)，默认为初始速率的4倍')
+    args = parser.parse_args()
+    
     logger.info("开始获取上证股票信息...")
     start_time = datetime.now()
     
-    # 减少并发数，增加延时
-    success_count = download_sh_stocks_info(max_workers=3)
+    success_count = download_sh_stocks_info(max_workers=args.workers, rate=args.rate,
+                                            max_rate=args.max_rate)
     
     end_time = datetime.now()
-    logger.info(f"总耗时: {end_time - start_time}") 
\ No newline at end of file
+    logger.info(f"总耗时: {end_time - start_time}")
+    sys.exit(0 if success_count else 1)
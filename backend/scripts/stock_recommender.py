@@ -0,0 +1,208 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import DB_CONFIG_ADMIN
+from sqlalchemy import create_engine, text
+import logging
+import time
+from utils.cache_version import bump_cache_version
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建数据库连接
+engine = create_engine(
+    f"mysql+pymysql://{DB_CONFIG_ADMIN['user']}:{DB_CONFIG_ADMIN['password']}"
+    f"@{DB_CONFIG_ADMIN['host']}/{DB_CONFIG_ADMIN['database']}?charset=utf8mb4"
+)
+
+# 每日推荐的股票数（按技术评分排名）
+RECOMMEND_LIMIT = 50
+
+# stock_recommendations 写入字段
+RECOMMENDATION_COLUMNS = [
+    'recommend_date', 'stock_code', 'stock_name', 'industry',
+    'current_price', 'total_score', 'recommendation_level', 'reasons'
+]
+
+# 筹码策略在推荐理由中的名称
+CHIP_STRATEGY_LABELS = {
+    '低吸': '筹码低吸',
+    '追涨': '筹码追涨',
+    '潜力': '筹码潜力股'
+}
+
+def load_candidates(conn, start_date, end_date, limit=RECOMMEND_LIMIT):
+    """一次查询加载区间内每个评分日排名前 limit 的股票及其入选的筹码策略
+
+    Returns:
+        list: 技术评分、行情和筹码策略（"策略:排名" 逗号分隔）记录
+    """
+    return conn.execute(text("""
+        SELECT ts.score_date, ts.stock_code, s.stock_name,
+               COALESCE(ts.industry, s.industry) AS industry,
+               q.close_price, ts.total_score, ts.score_rank,
+               ts.ma5, ts.ma20, ts.ma60, ts.macd, ts.macd_signal,
+               ts.vol_ma5, ts.vol_ma20, ts.boll_upper, ts.boll_lower,
+               chip.strategies
+        FROM stock_technical_scores ts
+        JOIN stocks s ON s.stock_code = ts.stock_code
+        JOIN stock_historical_quotes q
+          ON q.stock_code = ts.stock_code AND q.trade_date = ts.score_date
+        LEFT JOIN (
+            SELECT stock_code, analysis_date,
+                   GROUP_CONCAT(CONCAT(strategy_type, ':', rank_num) ORDER BY rank_num) AS strategies
+            FROM stock_chip_analysis
+            WHERE analysis_date BETWEEN :start_date AND :end_date
+            GROUP BY stock_code, analysis_date
+        ) chip ON chip.stock_code = ts.stock_code AND chip.analysis_date = ts.score_date
+        WHERE ts.score_date BETWEEN :start_date AND :end_date
+          AND ts.score_rank <= :limit
+        ORDER BY ts.score_date, ts.score_rank
+    """), {'start_date': start_date, 'end_date': end_date, 'limit': limit}).fetchall()
+
+def parse_chip_strategies(value):
+    """解析 "策略:排名" 列表，返回 [(策略, 排名), ...]"""
+    if not value:
+        return []
+    strategies = []
+    for item in value.split(','):
+        strategy, rank = item.rsplit(':', 1)
+        strategies.append((strategy, int(rank)))
+    return strategies
+
+def recommendation_level(total_score, chip_strategies):
+    """根据技术评分和筹码策略确定推荐等级
+
+    总分满分 110 分，技术面与筹码面同时入选时上调一档。
+    """
+    if total_score >= 100 or (total_score >= 90 and chip_strategies):
+        return '强烈推荐'
+    if total_score >= 90 or chip_strategies:
+        return '推荐'
+    return '关注'
+
+def recommendation_reasons(row, chip_strategies):
+    """生成推荐理由（与技术评分接口的状态描述一致）"""
+    # 数据库返回 Decimal，缺失值按 NaN 处理（比较结果为 False）
+    v = {name: float('nan') if getattr(row, name) is None else float(getattr(row, name))
+         for name in ('close_price', 'ma5', 'ma20', 'ma60', 'macd', 'macd_signal',
+                      'vol_ma5', 'vol_ma20', 'boll_upper', 'boll_lower')}
+    reasons = [f"技术评分{row.total_score}分，排名第{row.score_rank}"]
+
+    if v['ma5'] > v['ma20'] and v['ma20'] > v['ma60']:
+        reasons.append('均线多头排列，强势上涨')
+    elif v['ma5'] > v['ma20']:
+        reasons.append('5日均线上穿20日均线，短期向好')
+    elif v['close_price'] > v['ma20']:
+        reasons.append('价格站上20日均线')
+
+    if v['macd'] > v['macd_signal']:
+        reasons.append('MACD金叉')
+    if v['vol_ma5'] > v['vol_ma20'] * 1.2:
+        reasons.append('成交量放大')
+    if v['close_price'] < v['boll_lower']:
+        reasons.append('跌破布林带下轨，超卖')
+    elif v['close_price'] > v['boll_upper']:
+        reasons.append('突破布林带上轨，注意超买')
+
+    for strategy, rank in chip_strategies:
+        reasons.append(f"入选{CHIP_STRATEGY_LABELS.get(strategy, strategy)}策略第{rank}名")
+    return '；'.join(reasons)
+
+def build_recommendations(rows):
+    """将候选记录转换为 stock_recommendations 记录"""
+    records = []
+    for row in rows:
+        chip_strategies = parse_chip_strategies(row.strategies)
+        records.append({
+            'recommend_date': row.score_date,
+            'stock_code': row.stock_code,
+            'stock_name': row.stock_name,
+            'industry': row.industry,
+            'current_price': row.close_price,
+            'total_score': row.total_score,
+            'recommendation_level': recommendation_level(row.total_score, chip_strategies),
+            'reasons': recommendation_reasons(row, chip_strategies)
+        })
+    return records
+
+def save_recommendations(conn, start_date, end_date, records, batch_size=1000):
+    """替换日期区间内的推荐记录（删除后批量写入，需在事务中调用）"""
+    conn.execute(text("""
+        DELETE FROM stock_recommendations
+        WHERE recommend_date BETWEEN :start_date AND :end_date
+    """), {'start_date': start_date, 'end_date': end_date})
+    sql = text(f"""
+        INSERT INTO stock_recommendations ({', '.join(RECOMMENDATION_COLUMNS)})
+        VALUES ({', '.join(':' + c for c in RECOMMENDATION_COLUMNS)})
+    """)
+    for i in range(0, len(records), batch_size):
+        conn.execute(sql, records[i:i + batch_size])
+    return len(records)
+
+def update_recommendations(start_date=None, end_date=None, limit=RECOMMEND_LIMIT):
+    """根据技术评分和筹码分析生成每日推荐
+
+    默认只生成最后推荐日期之后的新评分日；指定 start_date 时重新生成区间内的推荐。
+
+    Args:
+        start_date (str): 回填开始日期 (YYYY-MM-DD)
+        end_date (str): 回填结束日期 (YYYY-MM-DD)，默认为最新评分日
+        limit (int): 每日推荐的股票数
+    """
+    try:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            latest_score_date = conn.execute(text(
+                "SELECT MAX(score_date) FROM stock_technical_scores"
+            )).scalar()
+            if not latest_score_date:
+                logger.error("未找到技术评分数据")
+                return False
+
+            end_date = end_date or latest_score_date
+            if not start_date:
+                # 增量模式：只生成最后推荐日期之后的评分日
+                last_date = conn.execute(text(
+                    "SELECT MAX(recommend_date) FROM stock_recommendations"
+                )).scalar()
+                if last_date and last_date >= latest_score_date:
+                    logger.info(f"推荐已是最新 ({last_date})，无需更新")
+                    return True
+                start_date = conn.execute(text("""
+                    SELECT MIN(score_date) FROM stock_technical_scores
+                    WHERE score_date > :last_date
+                """), {'last_date': last_date or '1900-01-01'}).scalar()
+
+            logger.info(f"生成推荐: {start_date} 至 {end_date}")
+            rows = load_candidates(conn, start_date, end_date, limit)
+
+        records = build_recommendations(rows)
+        with engine.begin() as conn:
+            count = save_recommendations(conn, start_date, end_date, records)
+        days = len({r['recommend_date'] for r in records})
+        logger.info(f"成功生成推荐: {days} 个交易日, {count} 条, 总耗时 {time.perf_counter() - start:.2f}秒")
+        return True
+
+    except Exception as e:
+        logger.error(f"生成推荐失败: {str(e)}")
+        return False
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='根据技术评分和筹码分析生成每日推荐 (stock_recommendations)')
+    parser.add_argument('--from', dest='from_date',
+                        help='回填模式: 重新生成该日期 (YYYY-MM-DD) 起的推荐')
+    parser.add_argument('--to', dest='to_date',
+                        help='回填结束日期 (YYYY-MM-DD)，默认为最新评分日')
+    parser.add_argument('--limit', type=int, default=RECOMMEND_LIMIT,
+                        help=f'每日推荐的股票数 (默认: {RECOMMEND_LIMIT})')
+    args = parser.parse_args()
+
+    success = update_recommendations(args.from_date, args.to_date, limit=args.limit)
+    if success:
+        bump_cache_version('recommendations')
+    sys.exit(0 if success else 1)
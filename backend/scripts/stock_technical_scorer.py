@@ -2,9 +2,16 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.database import DB_CONFIG_ADMIN
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, bindparam
 import logging
-from datetime import datetime
+import time
+import json
+import concurrent.futures
+import numpy as np
+import pandas as pd
+from utils.indicators import build_panel, gather_windows, tail_mean, tail_std, lag_macd
+from utils.sharding import load_shard_codes, split_code_ranges, run_shards
+from utils.cache_version import bump_cache_version
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -16,8 +23,186 @@ engine = create_engine(
     f"@{DB_CONFIG_ADMIN['host']}/{DB_CONFIG_ADMIN['database']}?charset=utf8mb4"
 )
 
+# 评分计算使用的行情窗口（自然日），与 SQL 版本的 DATE_SUB(..., INTERVAL 60 DAY) 一致
+WINDOW_DAYS = 60
+
+# 增量状态中每只股票保留的最大行情条数（覆盖 WINDOW_DAYS 自然日窗口）
+STATE_BARS = WINDOW_DAYS + 1
+
+# stock_technical_scores 写入字段
+SCORE_COLUMNS = [
+    'stock_code', 'score_date', 'trend_score', 'momentum_score',
+    'volatility_score', 'volume_score', 'bollinger_score', 'total_score',
+    'ma5', 'ma20', 'ma60', 'vol_ma5', 'vol_ma20', 'volatility',
+    'boll_upper', 'boll_lower', 'macd', 'macd_signal'
+]
+
+# 排名字段：当日全市场排名和行业内排名（总分降序，同分按股票代码）
+RANK_COLUMNS = ['industry', 'score_rank', 'industry_rank']
+
+def get_score_sql(sharded=False):
+    """返回计算最新交易日所有股票技术评分及排名的 SQL
+
+    Args:
+        sharded (bool): 是否只计算 :first_code 到 :last_code 范围内的股票
+    """
+    return f"""
+    WITH price_data AS (
+        -- 计算最近 60 天的技术指标
+        SELECT 
+            stock_code,
+            trade_date,
+            close_price,
+            high_price,
+            low_price,
+            volume,
+            -- 计算移动均线
+            AVG(close_price) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 4 PRECEDING AND CURRENT ROW
+            ) AS ma5,
+            AVG(close_price) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
+            ) AS ma20,
+            AVG(close_price) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
+            ) AS ma60,
+            -- MACD相关指标
+            (2 * close_price + 11 * LAG(close_price, 1) OVER (
+                PARTITION BY stock_code ORDER BY trade_date
+            )) / 13 AS macd_fast,
+            (2 * close_price + 25 * LAG(close_price, 1) OVER (
+                PARTITION BY stock_code ORDER BY trade_date
+            )) / 27 AS macd_slow,
+            -- 成交量均线
+            AVG(volume) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 4 PRECEDING AND CURRENT ROW
+            ) AS vol_ma5,
+            AVG(volume) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
+            ) AS vol_ma20,
+            -- 波动率
+            STDDEV(close_price) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
+            ) AS volatility,
+            -- 布林带
+            AVG(close_price) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
+            ) + (2 * STDDEV(close_price) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
+            )) AS boll_upper,
+            AVG(close_price) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
+            ) - (2 * STDDEV(close_price) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
+            )) AS boll_lower
+        FROM stock_historical_quotes
+        WHERE trade_date >= DATE_SUB(:latest_date, INTERVAL 60 DAY)
+          AND trade_date <= :latest_date
+          {'AND stock_code BETWEEN :first_code AND :last_code' if sharded else ''}
+    ),
+    macd_data AS (
+        -- 计算 MACD 和信号线
+        SELECT 
+            stock_code,
+            trade_date,
+            close_price,
+            ma5, ma20, ma60, vol_ma5, vol_ma20, volatility, 
+            boll_upper, boll_lower,
+            (macd_fast - macd_slow) AS macd,
+            AVG(macd_fast - macd_slow) OVER (
+                PARTITION BY stock_code ORDER BY trade_date 
+                ROWS BETWEEN 8 PRECEDING AND CURRENT ROW
+            ) AS macd_signal
+        FROM price_data
+    ),
+    latest_data AS (
+        -- 修改这里，确保只获取最新日期的数据
+        SELECT * FROM macd_data
+        WHERE trade_date = :latest_date
+    ),
+    scored_stocks AS (
+        -- 计算所有股票的评分
+        SELECT 
+            stock_code,
+            :latest_date as score_date,  -- 使用参数而不是 trade_date
+            -- 趋势评分 (40分)
+            CASE 
+                WHEN ma5 > ma20 AND ma20 > ma60 THEN 40
+                WHEN ma5 > ma20 THEN 30
+                WHEN close_price > ma20 THEN 20
+                ELSE 10
+            END AS trend_score,
+            -- 动量评分 (40分)
+            CASE 
+                WHEN macd > macd_signal AND close_price > ma20 THEN 40
+                WHEN macd > macd_signal THEN 30
+                WHEN close_price < ma20 THEN 20
+                ELSE 10
+            END AS momentum_score,
+            -- 波动率评分 (10分)
+            CASE 
+                WHEN volatility > 2 THEN 10
+                ELSE 5
+            END AS volatility_score,
+            -- 成交量评分 (10分)
+            CASE 
+                WHEN vol_ma5 > vol_ma20 THEN 10
+                ELSE 5
+            END AS volume_score,
+            -- 布林带评分 (10分)
+            CASE 
+                WHEN close_price > boll_upper THEN 5
+                WHEN close_price < boll_lower THEN 10
+                ELSE 0
+            END AS bollinger_score,
+            -- 总分使用已计算的单项评分之和
+            CASE 
+                WHEN ma5 > ma20 AND ma20 > ma60 THEN 40
+                WHEN ma5 > ma20 THEN 30
+                WHEN close_price > ma20 THEN 20
+                ELSE 10
+            END + 
+            CASE 
+                WHEN macd > macd_signal AND close_price > ma20 THEN 40
+                WHEN macd > macd_signal THEN 30
+                WHEN close_price < ma20 THEN 20
+                ELSE 10
+            END +
+            CASE WHEN volatility > 2 THEN 10 ELSE 5 END +
+            CASE WHEN vol_ma5 > vol_ma20 THEN 10 ELSE 5 END +
+            CASE WHEN close_price > boll_upper THEN 5 
+                 WHEN close_price < boll_lower THEN 10 
+                 ELSE 0 END AS total_score,
+            -- 技术指标
+            ma5, ma20, ma60, vol_ma5, vol_ma20, volatility,
+            boll_upper, boll_lower, macd, macd_signal,
+            CURRENT_TIMESTAMP as created_at
+        FROM latest_data
+        WHERE ma5 IS NOT NULL 
+            AND ma20 IS NOT NULL 
+            AND ma60 IS NOT NULL
+    )
+    SELECT sc.*, s.industry,
+           ROW_NUMBER() OVER (ORDER BY sc.total_score DESC, sc.stock_code) AS score_rank,
+           CASE WHEN s.industry IS NOT NULL THEN ROW_NUMBER() OVER (
+               PARTITION BY s.industry ORDER BY sc.total_score DESC, sc.stock_code
+           ) END AS industry_rank
+    FROM scored_stocks sc
+    LEFT JOIN stocks s ON s.stock_code = sc.stock_code
+    """
+
 def update_technical_scores():
-    """每日更新股票技术评分，并返回评分前50的股票"""
+    """每日更新所有股票的技术评分及排名（SQL 计算版本）"""
     try:
         with engine.connect() as conn:
             # 1. 获取最新交易日期
@@ -55,160 +240,15 @@ def update_technical_scores():
             logger.info(f"已删除 {latest_date} 的历史评分数据")
 
             # 4. 插入新的评分数据
-            insert_sql = """
+            insert_sql = f"""
             INSERT INTO stock_technical_scores (
                 stock_code, score_date, trend_score, momentum_score,
                 volatility_score, volume_score, bollinger_score, total_score,
                 ma5, ma20, ma60, vol_ma5, vol_ma20, volatility,
-                boll_upper, boll_lower, macd, macd_signal, created_at
+                boll_upper, boll_lower, macd, macd_signal, created_at,
+                industry, score_rank, industry_rank
             )
-            WITH price_data AS (
-                -- 计算最近 60 天的技术指标
-                SELECT 
-                    stock_code,
-                    trade_date,
-                    close_price,
-                    high_price,
-                    low_price,
-                    volume,
-                    -- 计算移动均线
-                    AVG(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 4 PRECEDING AND CURRENT ROW
-                    ) AS ma5,
-                    AVG(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                    ) AS ma20,
-                    AVG(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 59 PRECEDING AND CURRENT ROW
-                    ) AS ma60,
-                    -- MACD相关指标
-                    (2 * close_price + 11 * LAG(close_price, 1) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date
-                    )) / 13 AS macd_fast,
-                    (2 * close_price + 25 * LAG(close_price, 1) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date
-                    )) / 27 AS macd_slow,
-                    -- 成交量均线
-                    AVG(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 4 PRECEDING AND CURRENT ROW
-                    ) AS vol_ma5,
-                    AVG(volume) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                    ) AS vol_ma20,
-                    -- 波动率
-                    STDDEV(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                    ) AS volatility,
-                    -- 布林带
-                    AVG(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                    ) + (2 * STDDEV(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                    )) AS boll_upper,
-                    AVG(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                    ) - (2 * STDDEV(close_price) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                    )) AS boll_lower
-                FROM stock_historical_quotes
-                WHERE trade_date >= DATE_SUB(:latest_date, INTERVAL 60 DAY)
-                  AND trade_date <= :latest_date
-            ),
-            macd_data AS (
-                -- 计算 MACD 和信号线
-                SELECT 
-                    stock_code,
-                    trade_date,
-                    close_price,
-                    ma5, ma20, ma60, vol_ma5, vol_ma20, volatility, 
-                    boll_upper, boll_lower,
-                    (macd_fast - macd_slow) AS macd,
-                    AVG(macd_fast - macd_slow) OVER (
-                        PARTITION BY stock_code ORDER BY trade_date 
-                        ROWS BETWEEN 8 PRECEDING AND CURRENT ROW
-                    ) AS macd_signal
-                FROM price_data
-            ),
-            latest_data AS (
-                -- 修改这里，确保只获取最新日期的数据
-                SELECT * FROM macd_data
-                WHERE trade_date = :latest_date
-            ),
-            top_scores AS (
-                -- 计算评分并只选择前50名
-                SELECT 
-                    stock_code,
-                    :latest_date as score_date,  -- 使用参数而不是 trade_date
-                    -- 趋势评分 (40分)
-                    CASE 
-                        WHEN ma5 > ma20 AND ma20 > ma60 THEN 40
-                        WHEN ma5 > ma20 THEN 30
-                        WHEN close_price > ma20 THEN 20
-                        ELSE 10
-                    END AS trend_score,
-                    -- 动量评分 (40分)
-                    CASE 
-                        WHEN macd > macd_signal AND close_price > ma20 THEN 40
-                        WHEN macd > macd_signal THEN 30
-                        WHEN close_price < ma20 THEN 20
-                        ELSE 10
-                    END AS momentum_score,
-                    -- 波动率评分 (10分)
-                    CASE 
-                        WHEN volatility > 2 THEN 10
-                        ELSE 5
-                    END AS volatility_score,
-                    -- 成交量评分 (10分)
-                    CASE 
-                        WHEN vol_ma5 > vol_ma20 THEN 10
-                        ELSE 5
-                    END AS volume_score,
-                    -- 布林带评分 (10分)
-                    CASE 
-                        WHEN close_price > boll_upper THEN 5
-                        WHEN close_price < boll_lower THEN 10
-                        ELSE 0
-                    END AS bollinger_score,
-                    -- 总分使用已计算的单项评分之和
-                    CASE 
-                        WHEN ma5 > ma20 AND ma20 > ma60 THEN 40
-                        WHEN ma5 > ma20 THEN 30
-                        WHEN close_price > ma20 THEN 20
-                        ELSE 10
-                    END + 
-                    CASE 
-                        WHEN macd > macd_signal AND close_price > ma20 THEN 40
-                        WHEN macd > macd_signal THEN 30
-                        WHEN close_price < ma20 THEN 20
-                        ELSE 10
-                    END +
-                    CASE WHEN volatility > 2 THEN 10 ELSE 5 END +
-                    CASE WHEN vol_ma5 > vol_ma20 THEN 10 ELSE 5 END +
-                    CASE WHEN close_price > boll_upper THEN 5 
-                         WHEN close_price < boll_lower THEN 10 
-                         ELSE 0 END AS total_score,
-                    -- 技术指标
-                    ma5, ma20, ma60, vol_ma5, vol_ma20, volatility,
-                    boll_upper, boll_lower, macd, macd_signal,
-                    CURRENT_TIMESTAMP as created_at
-                FROM latest_data
-                WHERE ma5 IS NOT NULL 
-                    AND ma20 IS NOT NULL 
-                    AND ma60 IS NOT NULL
-                ORDER BY total_score DESC
-                LIMIT 50
-            )
-            SELECT * FROM top_scores
+            {get_score_sql()}
             """
             
             conn.execute(text(insert_sql), {'latest_date': latest_date})
@@ -220,5 +260,609 @@ def update_technical_scores():
         logger.error(f"更新技术评分失败: {str(e)}")
         return False
 
+def load_price_window(conn, latest_date, window_days=WINDOW_DAYS, code_range=None):
+    """一次查询加载所有股票（或 code_range 范围内的股票）最近 window_days 个自然日的行情"""
+    return load_price_range(conn, latest_date, latest_date, window_days, code_range)
+
+def load_price_range(conn, start_date, end_date, window_days=WINDOW_DAYS, code_range=None):
+    """一次查询加载 [start_date - window_days, end_date] 内所有股票的行情
+
+    code_range 为 (first_code, last_code) 时只加载该代码范围内的股票。
+    """
+    params = {'start_date': start_date, 'end_date': end_date, 'days': window_days}
+    if code_range:
+        params['first_code'], params['last_code'] = code_range
+    rows = conn.execute(text(f"""
+        SELECT stock_code, trade_date, close_price, volume
+        FROM stock_historical_quotes
+        WHERE trade_date >= DATE_SUB(:start_date, INTERVAL :days DAY)
+          AND trade_date <= :end_date
+          {'AND stock_code BETWEEN :first_code AND :last_code' if code_range else ''}
+        ORDER BY stock_code, trade_date
+    """), params).fetchall()
+    df = pd.DataFrame(rows, columns=['stock_code', 'trade_date', 'close_price', 'volume'])
+    df['close_price'] = df['close_price'].astype(float)
+    df['volume'] = df['volume'].astype(float)
+    return df
+
+def score_panel(close, volume):
+    """按右对齐的行情面板计算最后一列的指标和评分
+
+    每行对应一个评分对象（日常评分为一只股票，回填时为一只股票的某一天），
+    规则与 update_technical_scores 中的 SQL 一致：窗口内按可用交易日计算。
+
+    Returns:
+        dict: 指标和评分数组
+    """
+    ma5 = tail_mean(close, 5)
+    ma20 = tail_mean(close, 20)
+    ma60 = tail_mean(close, 60)
+    vol_ma5 = tail_mean(volume, 5)
+    vol_ma20 = tail_mean(volume, 20)
+    volatility = tail_std(close, 20)
+    boll_upper = ma20 + 2 * volatility
+    boll_lower = ma20 - 2 * volatility
+    macd_series = lag_macd(close)
+    macd = macd_series[:, -1]
+    macd_signal = tail_mean(macd_series, 9)
+    price = close[:, -1]
+
+    # NaN 参与比较结果为 False，与 SQL 中 NULL 落入 ELSE 分支一致
+    with np.errstate(invalid='ignore'):
+        trend_score = np.select(
+            [(ma5 > ma20) & (ma20 > ma60), ma5 > ma20, price > ma20], [40, 30, 20], 10)
+        momentum_score = np.select(
+            [(macd > macd_signal) & (price > ma20), macd > macd_signal, price < ma20], [40, 30, 20], 10)
+        volatility_score = np.where(volatility > 2, 10, 5)
+        volume_score = np.where(vol_ma5 > vol_ma20, 10, 5)
+        bollinger_score = np.select([price > boll_upper, price < boll_lower], [5, 10], 0)
+    total_score = trend_score + momentum_score + volatility_score + volume_score + bollinger_score
+
+    return {
+        'trend_score': trend_score,
+        'momentum_score': momentum_score,
+        'volatility_score': volatility_score,
+        'volume_score': volume_score,
+        'bollinger_score': bollinger_score,
+        'total_score': total_score,
+        'ma5': ma5, 'ma20': ma20, 'ma60': ma60,
+        'vol_ma5': vol_ma5, 'vol_ma20': vol_ma20, 'volatility': volatility,
+        'boll_upper': boll_upper, 'boll_lower': boll_lower,
+        'macd': macd, 'macd_signal': macd_signal
+    }
+
+def _valid_scores(scores):
+    """过滤均线无效的记录，按评分日期和总分排序"""
+    valid = scores[['ma5', 'ma20', 'ma60']].notna().all(axis=1)
+    scores = scores[valid]
+    return scores.sort_values(['score_date', 'total_score'], ascending=[True, False],
+                              kind='stable').reset_index(drop=True)
+
+def compute_technical_scores(df, score_date, window_days=WINDOW_DAYS):
+    """向量化计算技术指标和评分
+
+    指标和评分规则与 update_technical_scores 中的 SQL 完全一致：窗口内按可用
+    交易日计算均线/标准差，只对在 score_date 当天有行情的股票评分。
+
+    Args:
+        df (DataFrame): load_price_window 返回的行情
+        score_date (date): 评分日期
+        window_days (int): 行情窗口（自然日），决定面板宽度
+
+    Returns:
+        DataFrame: 每只股票一行，列为 SCORE_COLUMNS，按总分降序
+    """
+    if df.empty:
+        return pd.DataFrame(columns=SCORE_COLUMNS)
+
+    codes, last_dates, panels = build_panel(df, ['close_price', 'volume'], width=window_days + 1)
+    scores = pd.DataFrame({
+        'stock_code': codes,
+        'score_date': score_date,
+        **score_panel(panels['close_price'], panels['volume'])
+    })[SCORE_COLUMNS]
+
+    # 只保留评分日当天有行情的股票
+    scores = scores[pd.to_datetime(last_dates) == pd.Timestamp(score_date)]
+    return _valid_scores(scores)
+
+def compute_backfill_scores(df, start_date, end_date, window_days=WINDOW_DAYS):
+    """一次顺序扫描计算区间内每个交易日的评分
+
+    每个 (股票, 交易日) 的窗口为该股票在 [交易日 - window_days, 交易日] 内的行情，
+    与每天单独运行 compute_technical_scores 的结果一致。
+
+    Args:
+        df (DataFrame): 行情，需覆盖 [start_date - window_days, end_date]
+        start_date (date): 回填开始日期
+        end_date (date): 回填结束日期
+
+    Returns:
+        DataFrame: 每个 (股票, 交易日) 一行，列为 SCORE_COLUMNS
+    """
+    if df.empty:
+        return pd.DataFrame(columns=SCORE_COLUMNS)
+
+    df = df.sort_values(['stock_code', 'trade_date'], kind='stable').reset_index(drop=True)
+    codes = df['stock_code'].to_numpy()
+    dates = pd.to_datetime(df['trade_date']).to_numpy().astype('datetime64[D]')
+
+    # (股票序号, 日期) 组合键，用一次 searchsorted 找到每个窗口的起点
+    _, stock_rank = np.unique(codes, return_inverse=True)
+    day_number = dates.astype(np.int64)
+    keys = stock_rank.astype(np.int64) * 1_000_000 + day_number
+
+    targets = np.flatnonzero((dates >= np.datetime64(start_date, 'D')) &
+                             (dates <= np.datetime64(end_date, 'D')))
+    window_keys = stock_rank[targets].astype(np.int64) * 1_000_000 + day_number[targets] - window_days
+    window_starts = np.searchsorted(keys, window_keys, side='left')
+
+    width = window_days + 1
+    close = gather_windows(df['close_price'].to_numpy(), targets, window_starts, width)
+    volume = gather_windows(df['volume'].to_numpy(), targets, window_starts, width)
+    scores = pd.DataFrame({
+        'stock_code': codes[targets],
+        'score_date': pd.to_datetime(dates[targets]).date,
+        **score_panel(close, volume)
+    })[SCORE_COLUMNS]
+    return _valid_scores(scores)
+
+def load_industries(conn):
+    """加载股票所属行业 {stock_code: industry}"""
+    return dict(conn.execute(text("SELECT stock_code, industry FROM stocks")).fetchall())
+
+def rank_scores(scores, industries):
+    """计算每个评分日的全市场排名和行业内排名
+
+    排名按总分降序，同分按股票代码升序，与 SQL 版本的 ROW_NUMBER 一致；
+    没有行业信息的股票不计算行业内排名。
+
+    Args:
+        scores (DataFrame): 评分数据，列为 SCORE_COLUMNS
+        industries (dict): {stock_code: industry}
+
+    Returns:
+        DataFrame: 增加 RANK_COLUMNS 的评分数据，按评分日和排名排序
+    """
+    scores = scores.sort_values(['score_date', 'total_score', 'stock_code'],
+                                ascending=[True, False, True], kind='stable').reset_index(drop=True)
+    scores['industry'] = scores['stock_code'].map(industries)
+    scores['score_rank'] = scores.groupby('score_date').cumcount() + 1
+    scores['industry_rank'] = (scores.groupby(['score_date', 'industry']).cumcount() + 1).astype('Int64')
+    return scores
+
+def save_technical_scores(conn, score_date, scores, end_date=None, batch_size=1000):
+    """替换评分日（或日期区间）的评分数据（删除后批量写入，需在事务中调用）
+
+    Args:
+        conn: 数据库连接
+        score_date (date): 评分日期，回填时为区间开始日期
+        scores (DataFrame): 评分数据，列为 SCORE_COLUMNS + RANK_COLUMNS
+        end_date (date): 回填区间结束日期，为 None 时只替换 score_date 当天
+        batch_size (int): 每次 executemany 的行数
+
+    Returns:
+        int: 写入的记录数
+    """
+    conn.execute(text("""
+        DELETE FROM stock_technical_scores 
+        WHERE score_date >= DATE(:start_date) AND score_date <= DATE(:end_date)
+    """), {'start_date': score_date, 'end_date': end_date or score_date})
+    if scores.empty:
+        return 0
+
+    # NaN 写入为 NULL
+    columns = SCORE_COLUMNS + RANK_COLUMNS
+    records = scores[columns].astype(object).where(scores[columns].notna(), None)
+    records = records.to_dict('records')
+    sql = text(f"""
+        INSERT INTO stock_technical_scores ({', '.join(columns)})
+        VALUES ({', '.join(':' + col for col in columns)})
+    """)
+    for i in range(0, len(records), batch_size):
+        conn.execute(sql, records[i:i + batch_size])
+    return len(records)
+
+def update_technical_scores_numpy():
+    """每日更新股票技术评分（进程内 NumPy 计算版本）
+
+    数据库只负责一次范围查询和批量写入，指标在本地以 股票 × 交易日 数组向量化计算。
+    """
+    try:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            latest_date = conn.execute(text(
+                "SELECT MAX(trade_date) as latest_date FROM stock_historical_quotes"
+            )).scalar()
+            logger.info(f"最新交易日期: {latest_date}")
+
+            if not latest_date:
+                logger.error("未找到任何交易数据")
+                return False
+
+            df = load_price_window(conn, latest_date)
+            industries = load_industries(conn)
+        load_seconds = time.perf_counter() - start
+        logger.info(f"已加载 {df['stock_code'].nunique()} 只股票 {len(df)} 条行情, 耗时 {load_seconds:.2f}秒")
+
+        scores = rank_scores(compute_technical_scores(df, latest_date), industries)
+        compute_seconds = time.perf_counter() - start - load_seconds
+
+        with engine.begin() as conn:
+            count = save_technical_scores(conn, latest_date, scores)
+        logger.info(f"成功更新技术评分: {count} 条 (计算 {compute_seconds:.2f}秒, "
+                    f"总耗时 {time.perf_counter() - start:.2f}秒)")
+        return True
+
+    except Exception as e:
+        logger.error(f"更新技术评分失败: {str(e)}")
+        return False
+
+def compute_shard_scores(code_range, latest_date, engine_type='numpy'):
+    """计算一个股票代码范围内的技术评分（在分片子进程中运行）
+
+    Args:
+        code_range (tuple): (first_code, last_code)
+        latest_date (date): 评分日期
+        engine_type (str): sql=在数据库中用窗口函数计算, 其他=加载行情窗口后用 NumPy 计算
+
+    Returns:
+        DataFrame: 列为 SCORE_COLUMNS 的评分（未排名）
+    """
+    # 子进程不能复用父进程的连接
+    engine.dispose(close=False)
+    with engine.connect() as conn:
+        if engine_type != 'sql':
+            df = load_price_window(conn, latest_date, code_range=code_range)
+            return compute_technical_scores(df, latest_date)
+
+        result = conn.execute(text(get_score_sql(sharded=True)), {
+            'latest_date': latest_date,
+            'first_code': code_range[0],
+            'last_code': code_range[1]
+        })
+        scores = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    scores = scores.reindex(columns=SCORE_COLUMNS)
+    scores['score_date'] = latest_date
+    scores[SCORE_COLUMNS[2:]] = scores[SCORE_COLUMNS[2:]].astype(float)
+    return scores
+
+def update_technical_scores_sharded(shards, engine_type='numpy'):
+    """按股票代码范围分片，多进程并行计算技术评分
+
+    每个分片在独立进程中用独立的数据库连接加载和计算，结果在主进程中合并、
+    统一排名后在一个事务中批量写入。
+
+    Args:
+        shards (int): 分片数
+        engine_type (str): 分片内的计算方式，sql 或 numpy
+    """
+    try:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            latest_date = conn.execute(text(
+                "SELECT MAX(trade_date) as latest_date FROM stock_historical_quotes"
+            )).scalar()
+            logger.info(f"最新交易日期: {latest_date}")
+
+            if not latest_date:
+                logger.error("未找到任何交易数据")
+                return False
+
+            code_ranges = split_code_ranges(load_shard_codes(conn, latest_date), shards)
+            industries = load_industries(conn)
+
+        results = run_shards(compute_shard_scores, code_ranges, latest_date, engine_type)
+        scores = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=SCORE_COLUMNS)
+        scores = rank_scores(_valid_scores(scores), industries)
+
+        with engine.begin() as conn:
+            count = save_technical_scores(conn, latest_date, scores)
+        logger.info(f"成功更新技术评分: {count} 条 ({len(code_ranges)} 个分片), "
+                    f"总耗时 {time.perf_counter() - start:.2f}秒")
+        return True
+
+    except Exception as e:
+        logger.error(f"更新技术评分失败: {str(e)}")
+        return False
+
+def trim_window(df, latest_date, window_days=WINDOW_DAYS):
+    """只保留评分窗口内的行情，每只股票最多 STATE_BARS 条"""
+    start_date = pd.Timestamp(latest_date) - pd.Timedelta(days=window_days)
+    dates = pd.to_datetime(df['trade_date'])
+    df = df[(dates >= start_date) & (dates <= pd.Timestamp(latest_date))]
+    df = df.sort_values(['stock_code', 'trade_date'], kind='stable')
+    return df.groupby('stock_code', sort=False).tail(STATE_BARS).reset_index(drop=True)
+
+def load_indicator_state(conn):
+    """加载所有股票的增量状态
+
+    同时校验状态中最后一条行情与行情表是否一致，行情被重新导入（如复权价变化）
+    或删除的股票视为状态失效，需要从行情表重建。
+
+    Returns:
+        tuple: (bars, last_dates, stale_codes)
+            bars (DataFrame): 状态中的行情（stock_code, trade_date, close_price, volume）
+            last_dates (dict): {stock_code: 状态最后交易日}
+            stale_codes (set): 状态失效的股票
+    """
+    rows = conn.execute(text("""
+        SELECT s.stock_code, s.last_date, s.bars, q.close_price AS db_close
+        FROM stock_indicator_state s
+        LEFT JOIN stock_historical_quotes q
+          ON q.stock_code = s.stock_code AND q.trade_date = s.last_date
+    """)).fetchall()
+
+    columns = ['stock_code', 'trade_date', 'close_price', 'volume']
+    if not rows:
+        return pd.DataFrame(columns=columns), {}, set()
+
+    # 一次解码所有状态，展开为一张长表
+    state = pd.DataFrame(rows, columns=['stock_code', 'last_date', 'bars', 'db_close'])
+    decoded = pd.DataFrame.from_records([json.loads(b) for b in state['bars']])
+    last_close = decoded['c'].str[-1].astype(float)
+    db_close = pd.to_numeric(state['db_close'], errors='coerce')
+    is_stale = db_close.isna() | ((db_close - last_close).abs() > 1e-6)
+
+    last_dates = dict(zip(state['stock_code'], state['last_date']))
+    stale_codes = set(state.loc[is_stale, 'stock_code'])
+    bars = (decoded[~is_stale]
+            .assign(stock_code=state.loc[~is_stale, 'stock_code'])
+            .explode(['d', 'c', 'v'], ignore_index=True))
+    bars = pd.DataFrame({
+        'stock_code': bars['stock_code'],
+        'trade_date': pd.to_datetime(bars['d']).dt.date,
+        'close_price': bars['c'].astype(float),
+        'volume': bars['v'].astype(float)
+    }, columns=columns)
+    return bars, last_dates, stale_codes
+
+def load_quote_last_dates(conn):
+    """各股票行情表中的最后交易日（按主键松散索引扫描，每只股票一次查找）"""
+    return dict(conn.execute(text("""
+        SELECT stock_code, MAX(trade_date) FROM stock_historical_quotes GROUP BY stock_code
+    """)).fetchall())
+
+def delete_indicator_state(conn, stock_codes):
+    """删除指定股票的增量状态（需在事务中调用）"""
+    if not stock_codes:
+        return 0
+    conn.execute(text("""
+        DELETE FROM stock_indicator_state WHERE stock_code IN :codes
+    """).bindparams(bindparam('codes', expanding=True)), {'codes': sorted(stock_codes)})
+    return len(stock_codes)
+
+def load_new_bars(conn, since_date, latest_date):
+    """加载 since_date 之后到 latest_date 的所有行情（日常只有一两个交易日）"""
+    rows = conn.execute(text("""
+        SELECT stock_code, trade_date, close_price, volume
+        FROM stock_historical_quotes
+        WHERE trade_date > :since_date
+          AND trade_date <= :latest_date
+        ORDER BY stock_code, trade_date
+    """), {'since_date': since_date, 'latest_date': latest_date}).fetchall()
+    df = pd.DataFrame(rows, columns=['stock_code', 'trade_date', 'close_price', 'volume'])
+    df['close_price'] = df['close_price'].astype(float)
+    df['volume'] = df['volume'].astype(float)
+    return df
+
+def load_stock_windows(conn, stock_codes, latest_date, window_days=WINDOW_DAYS):
+    """从行情表重新加载指定股票的评分窗口"""
+    if not stock_codes:
+        return pd.DataFrame(columns=['stock_code', 'trade_date', 'close_price', 'volume'])
+    sql = text("""
+        SELECT stock_code, trade_date, close_price, volume
+        FROM stock_historical_quotes
+        WHERE stock_code IN :codes
+          AND trade_date >= DATE_SUB(:latest_date, INTERVAL :days DAY)
+          AND trade_date <= :latest_date
+        ORDER BY stock_code, trade_date
+    """).bindparams(bindparam('codes', expanding=True))
+    rows = conn.execute(sql, {
+        'codes': sorted(stock_codes), 'latest_date': latest_date, 'days': window_days
+    }).fetchall()
+    df = pd.DataFrame(rows, columns=['stock_code', 'trade_date', 'close_price', 'volume'])
+    df['close_price'] = df['close_price'].astype(float)
+    df['volume'] = df['volume'].astype(float)
+    return df
+
+def save_indicator_state(conn, df, stock_codes=None):
+    """保存股票的增量状态（需在事务中调用）
+
+    Args:
+        conn: 数据库连接
+        df (DataFrame): 已裁剪到评分窗口的行情
+        stock_codes (set): 只保存这些股票的状态，为 None 时保存全部
+
+    Returns:
+        int: 保存的股票数
+    """
+    if stock_codes is not None:
+        df = df[df['stock_code'].isin(stock_codes)]
+    records = []
+    for stock_code, group in df.groupby('stock_code', sort=False):
+        dates = [pd.Timestamp(d).date() for d in group['trade_date']]
+        records.append({
+            'stock_code': stock_code,
+            'last_date': dates[-1],
+            'bars': json.dumps({
+                'd': [d.isoformat() for d in dates],
+                'c': group['close_price'].tolist(),
+                'v': group['volume'].tolist()
+            }, separators=(',', ':'))
+        })
+    sql = text("""
+        REPLACE INTO stock_indicator_state (stock_code, last_date, bars)
+        VALUES (:stock_code, :last_date, :bars)
+    """)
+    for i in range(0, len(records), 500):
+        conn.execute(sql, records[i:i + 500])
+    return len(records)
+
+def update_technical_scores_incremental(rebuild=False):
+    """每日更新股票技术评分（增量状态版本）
+
+    每只股票在 stock_indicator_state 中保存评分窗口内的最近行情（环形缓冲），
+    每日只需读取状态和新增的行情推进一步，代价与股票数成正比，与历史长度无关。
+    状态表为空、rebuild=True 或个别股票状态失效时，从行情表重建；
+    评分窗口内没有行情的股票（长期停牌、退市）删除状态。
+    评分通过 compute_technical_scores 计算，结果与全量计算一致。
+    """
+    try:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            latest_date = conn.execute(text(
+                "SELECT MAX(trade_date) as latest_date FROM stock_historical_quotes"
+            )).scalar()
+            logger.info(f"最新交易日期: {latest_date}")
+
+            if not latest_date:
+                logger.error("未找到任何交易数据")
+                return False
+
+            industries = load_industries(conn)
+            last_dates, dropped_codes = {}, set()
+            if not rebuild:
+                state_bars, last_dates, stale_codes = load_indicator_state(conn)
+
+            if not last_dates:
+                # 全量重建
+                logger.info("从行情表全量重建指标状态...")
+                df = load_price_window(conn, latest_date)
+                changed_codes = None
+            else:
+                # 评分窗口内有行情的股票；其余股票（长期停牌、退市）的状态删除
+                window_start = (pd.Timestamp(latest_date) - pd.Timedelta(days=WINDOW_DAYS)).date()
+                quote_dates = {code: d for code, d in load_quote_last_dates(conn).items() if d >= window_start}
+                dropped_codes = set(last_dates) - set(quote_dates)
+
+                # 状态失效、早于评分窗口和新出现的股票从行情表重新加载
+                outdated = {code for code, d in last_dates.items() if d < window_start}
+                reload_codes = ((stale_codes | outdated) & set(quote_dates)) | (set(quote_dates) - set(last_dates))
+
+                # 其余有新行情的股票只加载各自状态之后的行情，加载起点只由这些股票决定
+                pending = {
+                    code for code, d in quote_dates.items()
+                    if code in last_dates and code not in reload_codes and d > last_dates[code]
+                }
+                new_bars = pd.DataFrame(columns=['stock_code', 'trade_date', 'close_price', 'volume'])
+                if pending:
+                    since_date = min(last_dates[code] for code in pending)
+                    new_bars = load_new_bars(conn, since_date, latest_date)
+                    state_last = pd.to_datetime(new_bars['stock_code'].map(last_dates))
+                    new_bars = new_bars[new_bars['stock_code'].isin(pending)
+                                        & (pd.to_datetime(new_bars['trade_date']) > state_last)]
+                reloaded = load_stock_windows(conn, reload_codes, latest_date)
+                df = pd.concat([
+                    state_bars[~state_bars['stock_code'].isin(reload_codes | dropped_codes)],
+                    new_bars,
+                    reloaded
+                ], ignore_index=True)
+                changed_codes = set(new_bars['stock_code']) | reload_codes
+                logger.info(f"状态 {len(last_dates)} 只, 新增行情 {len(new_bars)} 条 ({len(pending)} 只), "
+                            f"重建 {len(reload_codes)} 只 (失效 {len(stale_codes)} 只), "
+                            f"删除状态 {len(dropped_codes)} 只")
+
+        df = trim_window(df, latest_date)
+        scores = rank_scores(compute_technical_scores(df, latest_date), industries)
+
+        with engine.begin() as conn:
+            if changed_codes is None:
+                conn.execute(text("DELETE FROM stock_indicator_state"))
+            delete_indicator_state(conn, dropped_codes)
+            state_count = save_indicator_state(conn, df, changed_codes)
+            count = save_technical_scores(conn, latest_date, scores)
+        logger.info(f"成功更新技术评分: {count} 条, 更新状态 {state_count} 只, "
+                    f"总耗时 {time.perf_counter() - start:.2f}秒")
+        return True
+
+    except Exception as e:
+        logger.error(f"更新技术评分失败: {str(e)}")
+        return False
+
+def backfill_technical_scores(start_date, end_date=None, workers=None, chunk_size=500):
+    """回填日期区间内每个交易日的技术评分
+
+    一次查询加载区间（含前置窗口）内的全部行情，按股票分块并行计算所有交易日的
+    评分，最后在一个事务中替换区间内的评分数据。
+
+    Args:
+        start_date (str): 开始日期 (YYYY-MM-DD)
+        end_date (str): 结束日期 (YYYY-MM-DD)，默认为最新交易日
+        workers (int): 计算进程数，默认为CPU核数
+        chunk_size (int): 每个计算任务包含的股票数
+    """
+    try:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            if not end_date:
+                end_date = conn.execute(text(
+                    "SELECT MAX(trade_date) as latest_date FROM stock_historical_quotes"
+                )).scalar()
+            logger.info(f"回填区间: {start_date} 至 {end_date}")
+            df = load_price_range(conn, start_date, end_date)
+            industries = load_industries(conn)
+        logger.info(f"已加载 {df['stock_code'].nunique()} 只股票 {len(df)} 条行情, "
+                    f"耗时 {time.perf_counter() - start:.2f}秒")
+
+        # 按股票分块，并行计算
+        codes = df['stock_code'].unique()
+        chunks = [df[df['stock_code'].isin(codes[i:i + chunk_size])]
+                  for i in range(0, len(codes), chunk_size)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                compute_backfill_scores, chunks,
+                [start_date] * len(chunks), [end_date] * len(chunks)
+            ))
+        scores = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=SCORE_COLUMNS)
+        scores = rank_scores(_valid_scores(scores), industries)
+        logger.info(f"计算完成: {scores['score_date'].nunique()} 个交易日, {len(scores)} 条评分, "
+                    f"耗时 {time.perf_counter() - start:.2f}秒")
+
+        with engine.begin() as conn:
+            count = save_technical_scores(conn, start_date, scores, end_date=end_date)
+        logger.info(f"成功回填技术评分: {count} 条, 总耗时 {time.perf_counter() - start:.2f}秒")
+        return True
+
+    except Exception as e:
+        logger.error(f"回填技术评分失败: {str(e)}")
+        return False
+
 if __name__ == '__main__':
-    update_technical_scores() 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='每日更新股票技术评分')
+    parser.add_argument('--engine',
+                        choices=['incremental', 'numpy', 'sql'],
+                        default='incremental',
+                        help='计算方式: incremental=基于每只股票的增量状态推进, '
+                             'numpy=加载整个窗口后在本地向量化计算, sql=在数据库中用窗口函数计算')
+    parser.add_argument('--from', dest='from_date',
+                        help='回填模式: 计算该日期 (YYYY-MM-DD) 起每个交易日的评分')
+    parser.add_argument('--to', dest='to_date',
+                        help='回填结束日期 (YYYY-MM-DD)，默认为最新交易日')
+    parser.add_argument('--workers', type=int,
+                        help='回填计算进程数，默认为CPU核数')
+    parser.add_argument('--rebuild-state',
+                        action='store_true',
+                        help='增量模式下忽略已有状态，从行情表全量重建')
+    parser.add_argument('--shards', type=int,
+                        help='按股票代码范围分为 N 片，多进程并行计算（sql 引擎在数据库中分片计算，'
+                             '其他引擎按分片加载行情窗口计算，不使用增量状态）')
+    args = parser.parse_args()
+
+    if args.from_date:
+        success = backfill_technical_scores(args.from_date, args.to_date, workers=args.workers)
+    elif args.shards:
+        success = update_technical_scores_sharded(args.shards, engine_type=args.engine)
+    elif args.engine == 'sql':
+        success = update_technical_scores()
+    elif args.engine == 'numpy':
+        success = update_technical_scores_numpy()
+    else:
+        success = update_technical_scores_incremental(rebuild=args.rebuild_state)
+
+    if success:
+        bump_cache_version('technical_scores')
+    sys.exit(0 if success else 1)
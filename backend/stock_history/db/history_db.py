@@ -6,6 +6,10 @@ import sys
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 import glob
+import json
+import time
+import queue
+import threading
 from tqdm import tqdm
 import concurrent.futures
 
@@ -13,19 +17,29 @@ import concurrent.futures
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from config.database import DB_CONFIG
+from stock_history.store.npy_store import NpyHistoryStore, STORE_FILE_SUFFIX
+from stock_history.downloader.manifest import JobManifest, MANIFEST_FILE
+from utils.stock_registry import get_registry
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_db_engine():
-    """创建数据库连接引擎"""
+# 增量导入时记录文件状态的文件名（位于数据目录下）
+IMPORT_STATE_FILE = '.import_state.json'
+
+def get_db_engine(pool_size=5):
+    """创建数据库连接引擎
+
+    Args:
+        pool_size (int): 连接池大小，应与并发写入线程数一致
+    """
     connection_str = (
         f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
         f"{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset=utf8mb4"
     )
     try:
-        engine = create_engine(connection_str)
+        engine = create_engine(connection_str, pool_size=pool_size, max_overflow=0, pool_pre_ping=True)
         # 测试连接
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
@@ -38,110 +52,363 @@ def get_db_engine():
 def ensure_stock_exists(engine, stock_code, stock_name):
     """确保股票基本信息存在"""
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text(
-                "SELECT 1 FROM stocks WHERE stock_code = :code"
-            ), {'code': stock_code}).scalar()
-            
-            if not result:
-                conn.execute(text("""
-                    INSERT INTO stocks (stock_code, stock_name)
-                    VALUES (:code, :name)
-                """), {
-                    'code': stock_code,
-                    'name': stock_name
-                })
-                conn.commit()
-                logger.info(f"已创建股票基本信息: {stock_code}")
+        get_registry(engine).ensure_stocks({stock_code: stock_name})
         return True
     except Exception as e:
         logger.error(f"确保股票存在时出错: {str(e)}")
         return False
 
-def import_csv_to_db(engine, csv_file, mode='all', start_date=None, end_date=None):
-    """导入CSV文件到数据库"""
+# 历史行情表字段（与 REPLACE INTO 语句中的顺序一致）
+QUOTE_COLUMNS = [
+    'stock_code', 'trade_date', 'open_price', 'close_price',
+    'high_price', 'low_price', 'volume', 'amount',
+    'amplitude', 'change_ratio', 'change_amount', 'turnover_ratio',
+    'source', 'adjust_type', 'dividends', 'stock_splits'
+]
+
+REPLACE_QUOTES_SQL = """
+    REPLACE INTO stock_historical_quotes (
+        stock_code, trade_date, open_price, close_price,
+        high_price, low_price, volume, amount,
+        amplitude, change_ratio, change_amount, turnover_ratio,
+        source, adjust_type, dividends, stock_splits
+    ) VALUES (
+        :stock_code, :trade_date, :open_price, :close_price,
+        :high_price, :low_price, :volume, :amount,
+        :amplitude, :change_ratio, :change_amount, :turnover_ratio,
+        :source, :adjust_type, :dividends, :stock_splits
+    )
+"""
+
+def write_quotes(conn, df, load_method='bulk', batch_size=1000):
+    """将整理好的行情数据写入 stock_historical_quotes
+
+    Args:
+        conn: 已开启事务的数据库连接
+        df (DataFrame): 列名已映射为数据库字段的数据
+        load_method (str): 写入方式
+            - 'row': 逐行 REPLACE INTO（原有方式）
+            - 'bulk': 按批次 executemany，PyMySQL 会将其改写为多行 VALUES
+        batch_size (int): bulk 模式下每批写入的行数
+
+    Returns:
+        int: 写入的行数
+    """
+    if df.empty:
+        return 0
+
+    # NaN 无法直接写入 MySQL，统一转换为 NULL
+    records = (
+        df[QUOTE_COLUMNS]
+        .astype(object)
+        .where(df[QUOTE_COLUMNS].notnull(), None)
+        .to_dict('records')
+    )
+
+    if load_method == 'row':
+        for record in records:
+            conn.execute(text(REPLACE_QUOTES_SQL), record)
+    else:
+        for i in range(0, len(records), batch_size):
+            conn.execute(text(REPLACE_QUOTES_SQL), records[i:i + batch_size])
+
+    return len(records)
+
+def delete_stock_quotes(conn, stock_code):
+    """删除单只股票的全部行情（全量替换前调用，需在事务中调用）"""
+    conn.execute(text("DELETE FROM stock_historical_quotes WHERE stock_code = :code"), {'code': stock_code})
+
+def get_stock_watermarks(engine):
+    """一次查询获取每只股票已入库的最新交易日期
+
+    Returns:
+        dict: {stock_code: 最新 trade_date}
+    """
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT stock_code, MAX(trade_date) AS last_date
+            FROM stock_historical_quotes
+            GROUP BY stock_code
+        """)).fetchall()
+    return {row.stock_code: row.last_date for row in result}
+
+def get_stock_last_quotes(engine):
+    """获取每只股票已入库的最后交易日及其收盘价
+
+    Returns:
+        dict: {stock_code: (trade_date, close_price)}
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT q.stock_code, q.trade_date, q.close_price
+            FROM stock_historical_quotes q
+            JOIN (
+                SELECT stock_code, MAX(trade_date) AS max_date
+                FROM stock_historical_quotes
+                GROUP BY stock_code
+            ) m ON q.stock_code = m.stock_code AND q.trade_date = m.max_date
+        """)).fetchall()
+    return {row.stock_code: (row.trade_date, float(row.close_price)) for row in rows}
+
+def load_import_state(state_file):
+    """读取上次导入时记录的文件状态 {文件路径: {'mtime', 'size'}}"""
+    if not os.path.exists(state_file):
+        return {}
     try:
-        # 读取CSV
-        df = pd.read_csv(csv_file)
-        
-        # 处理日期列
-        df['Date'] = pd.to_datetime(df['Date'])
-        
-        # 从文件名获取股票代码和来源信息
-        filename = os.path.basename(csv_file)
-        stock_code = filename.split('_')[0]
-        source = 'akshare' if 'Amount' in df.columns else 'yfinance'
-        
-        # 重命名列以匹配数据库
-        column_mappings = {
-            'Date': 'trade_date',
-            'Open': 'open_price',
-            'Close': 'close_price',
-            'High': 'high_price',
-            'Low': 'low_price',
-            'Volume': 'volume',
-            'Dividends': 'dividends',
-            'Stock Splits': 'stock_splits'
-        }
-        
-        # AKShare 特有的列
-        if source == 'akshare':
-            column_mappings.update({
-                'Amount': 'amount',
-                'Amplitude': 'amplitude',
-                'Change': 'change_ratio',
-                'ChangeAmount': 'change_amount',
-                'Turnover': 'turnover_ratio'
-            })
-        
-        df = df.rename(columns=column_mappings)
-        
-        # 添加固定字段
-        df['stock_code'] = stock_code
-        df['source'] = source
-        df['adjust_type'] = 'qfq'
-        
-        # 对于 yfinance 数据，计算缺失的字段
-        if source == 'yfinance':
-            df['amount'] = df['volume'] * df['close_price']  # 估算成交额
-            df['amplitude'] = ((df['high_price'] - df['low_price']) / df['close_price'].shift(1) * 100).round(2)
-            df['change_ratio'] = ((df['close_price'] - df['close_price'].shift(1)) / df['close_price'].shift(1) * 100).round(2)
-            df['change_amount'] = (df['close_price'] - df['close_price'].shift(1)).round(2)
-            df['turnover_ratio'] = 0  # yfinance 无法获取换手率
-        
-        # 日期过滤
-        if mode == 'date_range' and start_date and end_date:
-            df = df[
-                (df['trade_date'] >= start_date) & 
-                (df['trade_date'] <= end_date)
-            ]
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取导入状态文件失败，将重新导入全部文件: {str(e)}")
+        return {}
+
+def save_import_state(state_file, state):
+    """保存文件导入状态"""
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, state_file)
+
+def get_file_signature(file_path):
+    """文件的修改时间和大小，用于判断文件自上次导入后是否变化"""
+    stat = os.stat(file_path)
+    return {'mtime': stat.st_mtime, 'size': stat.st_size}
+
+def get_stock_code(file_path):
+    """从数据文件名获取股票代码（{代码}_{名称}_history.csv 或 {代码}.bin）"""
+    return os.path.basename(file_path).split('_')[0].split('.')[0]
+
+def parse_history_store(store_file, mode='all', start_date=None, end_date=None, watermark=None):
+    """从列式存储读取单只股票数据，返回列名与数据库一致的 DataFrame
+
+    存储中的日期已是定长类型，按日期过滤通过二分定位完成，不需要解析文本。
+    """
+    store = NpyHistoryStore(os.path.dirname(store_file))
+    stock_code = get_stock_code(store_file)
+    if mode == 'date_range' and start_date and end_date:
+        df = store.to_frame(stock_code, start_date=start_date, end_date=end_date)
+    elif mode == 'incremental' and watermark is not None:
+        df = store.to_frame(stock_code, after_date=watermark)
+    else:
+        df = store.to_frame(stock_code)
+
+    df['trade_date'] = pd.to_datetime(df['trade_date'])
+    df['stock_code'] = stock_code
+    df['source'] = 'akshare'
+    df['adjust_type'] = 'qfq'
+    return df[QUOTE_COLUMNS]
+
+def parse_history_file(file_path, mode='all', start_date=None, end_date=None, watermark=None):
+    """按文件类型解析历史数据文件"""
+    if file_path.endswith(STORE_FILE_SUFFIX):
+        return parse_history_store(file_path, mode=mode, start_date=start_date,
+                                   end_date=end_date, watermark=watermark)
+    return parse_history_csv(file_path, mode=mode, start_date=start_date,
+                             end_date=end_date, watermark=watermark)
+
+def parse_history_csv(csv_file, mode='all', start_date=None, end_date=None, watermark=None):
+    """读取并整理单个历史数据CSV，返回列名与数据库一致的 DataFrame
+
+    该函数不访问数据库，可在子进程中执行。
+    """
+    # 读取CSV
+    df = pd.read_csv(csv_file)
+    
+    # 处理日期列
+    df['Date'] = pd.to_datetime(df['Date'])
+    
+    # 从文件名获取股票代码和来源信息
+    stock_code = get_stock_code(csv_file)
+    source = 'akshare' if 'Amount' in df.columns else 'yfinance'
+    
+    # 重命名列以匹配数据库
+    column_mappings = {
+        'Date': 'trade_date',
+        'Open': 'open_price',
+        'Close': 'close_price',
+        'High': 'high_price',
+        'Low': 'low_price',
+        'Volume': 'volume',
+        'Dividends': 'dividends',
+        'Stock Splits': 'stock_splits'
+    }
+    
+    # AKShare 特有的列
+    if source == 'akshare':
+        column_mappings.update({
+            'Amount': 'amount',
+            'Amplitude': 'amplitude',
+            'Change': 'change_ratio',
+            'ChangeAmount': 'change_amount',
+            'Turnover': 'turnover_ratio'
+        })
+    
+    df = df.rename(columns=column_mappings)
+    
+    # 添加固定字段
+    df['stock_code'] = stock_code
+    df['source'] = source
+    df['adjust_type'] = 'qfq'
+    
+    # 对于 yfinance 数据，计算缺失的字段
+    if source == 'yfinance':
+        df['amount'] = df['volume'] * df['close_price']  # 估算成交额
+        df['amplitude'] = ((df['high_price'] - df['low_price']) / df['close_price'].shift(1) * 100).round(2)
+        df['change_ratio'] = ((df['close_price'] - df['close_price'].shift(1)) / df['close_price'].shift(1) * 100).round(2)
+        df['change_amount'] = (df['close_price'] - df['close_price'].shift(1)).round(2)
+        df['turnover_ratio'] = 0  # yfinance 无法获取换手率
+    
+    # 日期过滤
+    if mode == 'date_range' and start_date and end_date:
+        df = df[
+            (df['trade_date'] >= start_date) & 
+            (df['trade_date'] <= end_date)
+        ]
+    elif mode == 'incremental' and watermark is not None:
+        # 只保留已入库最新日期之后的数据
+        df = df[df['trade_date'] > pd.Timestamp(watermark)]
+    
+    return df[QUOTE_COLUMNS]
+
+def import_csv_to_db(engine, csv_file, mode='all', start_date=None, end_date=None,
+                     load_method='bulk', batch_size=1000, watermark=None, replace=False):
+    """导入CSV文件到数据库
+
+    Args:
+        replace (bool): 全量替换：在同一事务中删除该股票的全部行情后写入文件中的所有数据
+
+    Returns:
+        int: 写入的行数（incremental 模式下无新增数据时为 0），失败返回 None
+    """
+    try:
+        if replace:
+            mode, watermark = 'all', None
+        df = parse_history_file(csv_file, mode=mode, start_date=start_date,
+                                end_date=end_date, watermark=watermark)
         
         # 写入数据库
         with engine.begin() as conn:
-            # 使用原生SQL进行REPLACE INTO操作
-            for _, row in df.iterrows():
-                conn.execute(text("""
-                    REPLACE INTO stock_historical_quotes (
-                        stock_code, trade_date, open_price, close_price, 
-                        high_price, low_price, volume, amount,
-                        amplitude, change_ratio, change_amount, turnover_ratio,
-                        source, adjust_type, dividends, stock_splits
-                    ) VALUES (
-                        :stock_code, :trade_date, :open_price, :close_price,
-                        :high_price, :low_price, :volume, :amount,
-                        :amplitude, :change_ratio, :change_amount, :turnover_ratio,
-                        :source, :adjust_type, :dividends, :stock_splits
-                    )
-                """), row.to_dict())
+            if replace:
+                delete_stock_quotes(conn, get_stock_code(csv_file))
+            write_quotes(conn, df, load_method=load_method, batch_size=batch_size)
             
         return len(df)
         
     except Exception as e:
         logger.error(f"导入 {csv_file} 失败: {str(e)}")
         logger.error(f"错误详情: {str(e)}")  # 添加更详细的错误信息
-        return 0
+        return None
+
+def run_import_pipeline(engine, csv_files, mode='all', start_date=None, end_date=None, watermarks=None,
+                        parse_workers=None, writer_threads=2, queue_size=20,
+                        load_method='bulk', batch_size=1000, replace_codes=None):
+    """分阶段导入：进程池解析CSV，有界队列交给少量数据库写入线程
+
+    解析阶段最多同时持有 parse_workers * 2 个未完成任务，写入队列满时
+    解析结果的提交会阻塞，因此内存占用与文件总数无关。
+    replace_codes 中的股票读取文件中的全部数据，写入前删除该股票的全部行情。
+
+    Returns:
+        tuple: ({csv_file: 写入行数}, [失败的文件])
+    """
+    watermarks = watermarks or {}
+    replace_codes = replace_codes or set()
+    parse_workers = parse_workers or os.cpu_count() or 1
+    write_queue = queue.Queue(maxsize=queue_size)
+    results = {}
+    failed_files = []
+    lock = threading.Lock()
+    stats = {'parse_rows': 0, 'write_rows': 0, 'write_busy': 0.0, 'queue_wait': 0.0}
+    progress = tqdm(total=len(csv_files), desc="导入进度")
+
+    def writer():
+        while True:
+            item = write_queue.get()
+            try:
+                if item is None:
+                    return
+                csv_file, df = item
+                write_start = time.perf_counter()
+                try:
+                    with engine.begin() as conn:
+                        stock_code = get_stock_code(csv_file)
+                        if stock_code in replace_codes:
+                            delete_stock_quotes(conn, stock_code)
+                        rows = write_quotes(conn, df, load_method=load_method, batch_size=batch_size)
+                    with lock:
+                        results[csv_file] = rows
+                        stats['write_rows'] += rows
+                except Exception as e:
+                    logger.error(f"写入 {csv_file} 失败: {str(e)}")
+                    with lock:
+                        failed_files.append(csv_file)
+                finally:
+                    with lock:
+                        stats['write_busy'] += time.perf_counter() - write_start
+                    progress.update(1)
+            finally:
+                write_queue.task_done()
+
+    writers = [threading.Thread(target=writer, daemon=True) for _ in range(writer_threads)]
+    for t in writers:
+        t.start()
+
+    pipeline_start = time.perf_counter()
+    files_iter = iter(csv_files)
+    future_to_file = {}
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers) as executor:
+        def submit_next():
+            csv_file = next(files_iter, None)
+            if csv_file is None:
+                return
+            stock_code = get_stock_code(csv_file)
+            if stock_code in replace_codes:
+                future = executor.submit(parse_history_file, csv_file)
+            else:
+                future = executor.submit(parse_history_file, csv_file, mode=mode, start_date=start_date,
+                                         end_date=end_date, watermark=watermarks.get(stock_code))
+            future_to_file[future] = csv_file
 
-def batch_import_historical_data(data_dir, mode='all', start_date=None, end_date=None, max_workers=5):
+        for _ in range(parse_workers * 2):
+            submit_next()
+
+        while future_to_file:
+            done, _ = concurrent.futures.wait(future_to_file, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                csv_file = future_to_file.pop(future)
+                try:
+                    df = future.result()
+                    stats['parse_rows'] += len(df)
+                    wait_start = time.perf_counter()
+                    write_queue.put((csv_file, df))  # 队列已满时阻塞，形成背压
+                    stats['queue_wait'] += time.perf_counter() - wait_start
+                except Exception as e:
+                    logger.error(f"解析 {csv_file} 失败: {str(e)}")
+                    failed_files.append(csv_file)
+                    progress.update(1)
+                submit_next()
+
+    parse_elapsed = time.perf_counter() - pipeline_start
+
+    for _ in writers:
+        write_queue.put(None)
+    for t in writers:
+        t.join()
+    progress.close()
+
+    total_elapsed = time.perf_counter() - pipeline_start
+    logger.info(f"解析阶段: {len(csv_files)} 个文件, {stats['parse_rows']} 行, 耗时 {parse_elapsed:.1f} 秒, "
+                f"{len(csv_files) / parse_elapsed if parse_elapsed > 0 else 0:.1f} 文件/秒, "
+                f"等待写入队列 {stats['queue_wait']:.1f} 秒")
+    logger.info(f"写入阶段: {stats['write_rows']} 行, {writer_threads} 个线程累计耗时 {stats['write_busy']:.1f} 秒, "
+                f"{stats['write_rows'] / total_elapsed if total_elapsed > 0 else 0:.0f} 行/秒")
+
+    return results, failed_files
+
+def batch_import_historical_data(data_dir, mode='all', start_date=None, end_date=None, max_workers=5,
+                                 load_method='bulk', batch_size=1000, pipeline=False,
+                                 parse_workers=None, writer_threads=2, queue_size=20, data_format='csv',
+                                 manifest_file=None):
     """批量导入历史数据
     
     Args:
@@ -149,57 +416,165 @@ def batch_import_historical_data(data_dir, mode='all', start_date=None, end_date
         mode (str): 导入模式
             - 'all': 导入所有数据
             - 'date_range': 导入指定日期范围的数据
+            - 'incremental': 只导入各股票已入库最新日期之后的数据，
+              并跳过自上次导入后未变化的文件
         start_date (str): 开始日期 (YYYY-MM-DD)
         end_date (str): 结束日期 (YYYY-MM-DD)
         max_workers (int): 并发工作线程数
+        load_method (str): 写入方式 ('row' 逐行 / 'bulk' 批量)
+        batch_size (int): 批量写入时每批的行数
+        pipeline (bool): 是否使用 解析进程池 + 写入线程 的分阶段导入
+        parse_workers (int): 分阶段导入时的解析进程数，默认为CPU核数
+        writer_threads (int): 分阶段导入时的数据库写入线程数
+        queue_size (int): 分阶段导入时写入队列的最大长度
+        data_format (str): 数据格式 ('csv' 下载器CSV / 'npy' 列式存储目录)
+        manifest_file (str): 下载任务清单，指定时只导入清单中下载成功的股票
+
+    下载任务清单（默认为数据目录下的 _manifest.sqlite）中记录的复权价变化股票，
+    在 all 和 incremental 模式下删除旧行情后按文件全量写入，成功后从清单中清除。
+
+    Returns:
+        int: 导入成功的文件数；出错、所有文件都导入失败或复权价变化的股票未能全量替换时返回 None
     """
     try:
-        engine = get_db_engine()
+        pool_size = writer_threads if pipeline else max_workers
+        engine = get_db_engine(pool_size=pool_size)
         success_count = 0
+        total_rows = 0
         failed_files = []
+        import_start = time.perf_counter()
         
-        # 获取所有CSV文件
-        csv_files = []
-        for root, _, files in os.walk(data_dir):
-            for file in files:
-                if file.endswith('_history.csv'):
-                    csv_files.append(os.path.join(root, file))
+        # 获取所有数据文件
+        if data_format == 'npy':
+            # 列式存储为单层目录，直接从存储中列出股票
+            store = NpyHistoryStore(data_dir)
+            csv_files = [store.path(code) for code in store.list_codes()]
+        else:
+            csv_files = []
+            for root, _, files in os.walk(data_dir):
+                for file in files:
+                    if file.endswith('_history.csv'):
+                        csv_files.append(os.path.join(root, file))
                     
-        logger.info(f"找到 {len(csv_files)} 个CSV文件")
+        logger.info(f"找到 {len(csv_files)} 个{data_format}数据文件")
         
-        # 使用线程池并发导入
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_file = {
-                executor.submit(import_csv_to_db, engine, csv_file, mode=mode, start_date=start_date, end_date=end_date): csv_file 
-                for csv_file in csv_files
-            }
+        if manifest_file and not os.path.exists(manifest_file):
+            logger.error(f"任务清单不存在: {manifest_file}")
+            return None
+        manifest_path = manifest_file or os.path.join(data_dir, MANIFEST_FILE)
+        readjusted_codes = set()
+        if os.path.exists(manifest_path):
+            manifest = JobManifest(manifest_path)
+            # 按下载任务清单过滤，只导入本次下载成功的股票
+            if manifest_file:
+                succeeded = manifest.succeeded_codes()
+                csv_files = [f for f in csv_files if get_stock_code(f) in succeeded]
+                logger.info(f"按任务清单过滤后剩余 {len(csv_files)} 个文件 (清单中成功 {len(succeeded)} 只)")
+            if mode != 'date_range':
+                readjusted_codes = manifest.readjusted_codes()
+            manifest.close()
+
+        # 复权价变化的股票需全量替换，缺少数据文件时无法替换
+        file_codes = {get_stock_code(f) for f in csv_files}
+        missing_codes = readjusted_codes - file_codes
+        readjusted_codes &= file_codes
+        if readjusted_codes:
+            logger.info(f"复权价变化需全量替换的股票 {len(readjusted_codes)} 只: "
+                        f"{', '.join(sorted(readjusted_codes))}")
+        if missing_codes:
+            logger.error(f"以下复权价变化的股票缺少数据文件，无法全量替换: {', '.join(sorted(missing_codes))}")
+        
+        watermarks = {}
+        state_file = os.path.join(data_dir, IMPORT_STATE_FILE)
+        import_state = {}
+        if mode == 'incremental':
+            watermarks = get_stock_watermarks(engine)
+            logger.info(f"已获取 {len(watermarks)} 只股票的最新入库日期")
             
-            # 处理结果
-            for future in tqdm(concurrent.futures.as_completed(future_to_file), 
-                             total=len(csv_files), 
-                             desc="导入进度"):
-                csv_file = future_to_file[future]
-                try:
-                    if future.result():
-                        success_count += 1
-                    else:
+            # 跳过自上次导入后未变化的文件
+            import_state = load_import_state(state_file)
+            changed_files = [
+                f for f in csv_files
+                if get_stock_code(f) in readjusted_codes
+                or import_state.get(os.path.abspath(f)) != get_file_signature(f)
+            ]
+            logger.info(f"跳过 {len(csv_files) - len(changed_files)} 个未变化的文件")
+            csv_files = changed_files
+        
+        if pipeline:
+            results, failed_files = run_import_pipeline(
+                engine, csv_files, mode=mode, start_date=start_date, end_date=end_date,
+                watermarks=watermarks, parse_workers=parse_workers, writer_threads=writer_threads,
+                queue_size=queue_size, load_method=load_method, batch_size=batch_size,
+                replace_codes=readjusted_codes
+            )
+        else:
+            results = {}
+            # 使用线程池并发导入
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # 提交所有任务
+                future_to_file = {
+                    executor.submit(import_csv_to_db, engine, csv_file, mode=mode, start_date=start_date, end_date=end_date,
+                                    load_method=load_method, batch_size=batch_size,
+                                    watermark=watermarks.get(get_stock_code(csv_file)),
+                                    replace=get_stock_code(csv_file) in readjusted_codes): csv_file 
+                    for csv_file in csv_files
+                }
+                
+                # 处理结果
+                for future in tqdm(concurrent.futures.as_completed(future_to_file), 
+                                 total=len(csv_files), 
+                                 desc="导入进度"):
+                    csv_file = future_to_file[future]
+                    try:
+                        rows = future.result()
+                        if rows is not None:
+                            results[csv_file] = rows
+                        else:
+                            failed_files.append(csv_file)
+                    except Exception as e:
+                        logger.error(f"处理文件 {csv_file} 时出错: {str(e)}")
                         failed_files.append(csv_file)
-                except Exception as e:
-                    logger.error(f"处理文件 {csv_file} 时出错: {str(e)}")
-                    failed_files.append(csv_file)
+        
+        success_count = len(results)
+        total_rows = sum(results.values())
+        if mode == 'incremental':
+            for csv_file in results:
+                import_state[os.path.abspath(csv_file)] = get_file_signature(csv_file)
                 
+        elapsed = time.perf_counter() - import_start
         logger.info(f"\n导入完成! 成功: {success_count}/{len(csv_files)}")
+        logger.info(f"写入方式: {load_method}, 共写入 {total_rows} 行, "
+                    f"耗时 {elapsed:.1f} 秒, 速度 {total_rows / elapsed if elapsed > 0 else 0:.0f} 行/秒")
+        
+        if mode == 'incremental':
+            save_import_state(state_file, import_state)
+
+        # 已全量替换的股票从清单中清除，其余的留待下次导入
+        replaced_codes = {get_stock_code(f) for f in results} & readjusted_codes
+        if replaced_codes:
+            manifest = JobManifest(manifest_path)
+            manifest.clear_readjusted(replaced_codes)
+            manifest.close()
+            logger.info(f"已全量替换 {len(replaced_codes)} 只复权价变化的股票")
+        pending_codes = (readjusted_codes - replaced_codes) | missing_codes
         if failed_files:
             logger.warning("以下文件导入失败:")
             for file in failed_files:
                 logger.warning(file)
+            if not success_count:
+                return None
+        if pending_codes:
+            # 行情表中这些股票新旧复权价混杂，下游计算前需要处理
+            logger.error(f"以下复权价变化的股票未能全量替换: {', '.join(sorted(pending_codes))}")
+            return None
                 
         return success_count
         
     except Exception as e:
         logger.error(f"批量导入过程出错: {str(e)}")
-        return 0
+        return None
+
 
 def delete_historical_data(engine, stock_code=None, start_date=None, end_date=None):
     """删除指定范围的历史数据
@@ -267,9 +642,9 @@ if __name__ == "__main__":
                              required=True,
                              help='数据目录路径')
     import_parser.add_argument('--mode', '-m',
-                             choices=['all', 'date_range'],
+                             choices=['all', 'date_range', 'incremental'],
                              default='all',
-                             help='导入模式: all=所有数据, date_range=指定日期范围')
+                             help='导入模式: all=所有数据, date_range=指定日期范围, incremental=仅导入新增数据')
     import_parser.add_argument('--start-date',
                              help='开始日期(YYYY-MM-DD格式)')
     import_parser.add_argument('--end-date',
@@ -278,6 +653,36 @@ if __name__ == "__main__":
                              type=int, 
                              default=5,
                              help='并发工作线程数')
+    import_parser.add_argument('--load-method',
+                             choices=['row', 'bulk'],
+                             default='bulk',
+                             help='写入方式: row=逐行REPLACE, bulk=批量多行写入')
+    import_parser.add_argument('--batch-size',
+                             type=int,
+                             default=1000,
+                             help='批量写入时每批的行数')
+    import_parser.add_argument('--format', '-f',
+                             choices=['csv', 'npy'],
+                             default='csv',
+                             help='数据格式: csv=下载器CSV文件, npy=列式二进制存储')
+    import_parser.add_argument('--manifest',
+                             nargs='?',
+                             const='',
+                             help='只导入下载任务清单中成功的股票；不指定路径时使用数据目录下的 ' + MANIFEST_FILE)
+    import_parser.add_argument('--pipeline',
+                             action='store_true',
+                             help='使用分阶段导入: 进程池解析CSV + 有界队列 + 数据库写入线程')
+    import_parser.add_argument('--parse-workers',
+                             type=int,
+                             help='分阶段导入的解析进程数(默认CPU核数)')
+    import_parser.add_argument('--writer-threads',
+                             type=int,
+                             default=2,
+                             help='分阶段导入的数据库写入线程数')
+    import_parser.add_argument('--queue-size',
+                             type=int,
+                             default=20,
+                             help='分阶段导入的写入队列长度')
     
     # 删除数据的命令
     delete_parser = subparsers.add_parser('delete', help='删除历史数据')
@@ -301,11 +706,23 @@ if __name__ == "__main__":
             mode=args.mode,
             start_date=args.start_date,
             end_date=args.end_date,
-            max_workers=args.workers
+            max_workers=args.workers,
+            load_method=args.load_method,
+            batch_size=args.batch_size,
+            pipeline=args.pipeline,
+            parse_workers=args.parse_workers,
+            writer_threads=args.writer_threads,
+            queue_size=args.queue_size,
+            data_format=args.format,
+            manifest_file=(args.manifest or os.path.join(args.data_dir, MANIFEST_FILE))
+                          if args.manifest is not None else None
         )
         
         end_time = datetime.now()
         logger.info(f"总耗时: {end_time - start_time}")
+        if success_count is None:
+            logger.error("导入失败")
+            sys.exit(1)
         logger.info(f"成功导入: {success_count} 只股票的数据")
         
     elif args.command == 'delete':
@@ -1,12 +1,19 @@
 import os
+import sys
+import glob
+import json
 import logging
+import threading
+import numpy as np
 import pandas as pd
 import akshare as ak
 from datetime import datetime
 import concurrent.futures
 from tqdm import tqdm
-import time
-import random
+
+from stock_history.store.npy_store import NpyHistoryStore, CSV_COLUMN_MAP, records_from_frame
+from stock_history.downloader.manifest import JobManifest, STATUS_SUCCESS, STATUS_FAILED
+from utils.rate_limiter import AdaptiveRateLimiter
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -19,109 +26,325 @@ def format_date(date_str):
     return None
 
 class AKStockDownloader:
-    def __init__(self, output_dir, max_workers=5, retry_times=10, retry_delay=5):
+    def __init__(self, output_dir, max_workers=5, retry_times=10, rate=1.0, max_rate=None,
+                 storage='csv', name_cache_file=None, delta=False, manifest_file=None):
         """初始化下载器
         
         Args:
             output_dir (str): 输出目录
             max_workers (int): 最大并发数
             retry_times (int): 重试次数
-            retry_delay (int): 重试延迟(秒)
+            rate (float): 初始请求速率(次/秒)，所有线程共享，出错时自动降低
+            max_rate (float): 最高请求速率(次/秒)，默认为初始速率的4倍
+            storage (str): 存储格式
+                - 'csv': 每只股票一个 {代码}_{名称}_history.csv
+                - 'npy': 列式二进制存储 (stock_history.store.npy_store)
+            name_cache_file (str): 股票代码->名称映射的缓存文件(JSON)，为 None 时不缓存
+            delta (bool): 增量模式，只下载已存储最后交易日之后的数据并追加
+            manifest_file (str): 任务清单文件，默认为输出目录下的 _manifest.sqlite
         """
         self.output_dir = output_dir
         self.max_workers = max_workers
         self.retry_times = retry_times
-        self.retry_delay = retry_delay
+        self.rate_limiter = AdaptiveRateLimiter(rate=rate, max_rate=max_rate)
+        self.storage = storage
+        self.store = NpyHistoryStore(output_dir) if storage == 'npy' else None
+        self.name_cache_file = name_cache_file
+        self.stock_names = None
+        self.delta = delta
+        # 增量模式下因复权价变化而重新全量下载的股票
+        self.readjusted_stocks = []
+        self._readjusted_lock = threading.Lock()
+        self.manifest_file = manifest_file
+        # 每只股票最后一次失败的原因，写入任务清单
+        self.last_errors = {}
+
+    def load_stock_names(self, stock_list_df=None, refresh=False):
+        """加载股票代码->名称映射（每批次只加载一次）
+
+        优先使用股票列表文件中的名称；列表未覆盖的代码从缓存文件读取，
+        缓存不存在或 refresh=True 时调用 ak.stock_info_a_code_name() 获取一次全市场列表。
+
+        Args:
+            stock_list_df (DataFrame): 股票列表（含 代码/名称 列）
+            refresh (bool): 是否忽略缓存文件重新获取
+        Returns:
+            dict: {stock_code: stock_name}
+        """
+        names = {}
+        codes = []
+        if stock_list_df is not None:
+            codes = stock_list_df['代码'].astype(str).str.zfill(6).tolist()
+        if stock_list_df is not None and '名称' in stock_list_df.columns:
+            names = {
+                code: name for code, name in zip(codes, stock_list_df['名称'])
+                if isinstance(name, str) and name
+            }
+            if len(names) == len(stock_list_df):
+                self.stock_names = names
+                return names
+
+        all_names = None
+        if self.name_cache_file and os.path.exists(self.name_cache_file) and not refresh:
+            try:
+                with open(self.name_cache_file, 'r', encoding='utf-8') as f:
+                    all_names = json.load(f)
+                logger.info(f"从缓存加载股票名称: {len(all_names)} 只")
+                # 缓存中缺少列表里的股票（如新上市），重新获取
+                if any(code not in names and code not in all_names for code in codes):
+                    logger.info("股票名称缓存已过期，重新获取")
+                    all_names = None
+            except Exception as e:
+                logger.warning(f"读取股票名称缓存失败: {str(e)}")
+
+        if all_names is None:
+            try:
+                stock_info_df = ak.stock_info_a_code_name()
+                all_names = dict(zip(stock_info_df['code'].astype(str), stock_info_df['name']))
+                logger.info(f"已获取A股代码名称表: {len(all_names)} 只")
+                if self.name_cache_file:
+                    with open(self.name_cache_file, 'w', encoding='utf-8') as f:
+                        json.dump(all_names, f, ensure_ascii=False)
+            except Exception as e:
+                logger.warning(f"获取股票名称失败: {str(e)}")
+                all_names = {}
+
+        # 列表中的名称优先
+        all_names.update(names)
+        self.stock_names = all_names
+        return all_names
+        
+    def fetch_history(self, stock_code, start_date=None, end_date=None):
+        """从AKShare获取前复权日线，返回以 Date 为索引、列名与CSV一致的 DataFrame"""
+        # 按共享速率取得请求令牌，避免被封
+        self.rate_limiter.acquire()
+        
+        # 下载数据
+        try:
+            df = ak.stock_zh_a_hist(
+                symbol=stock_code,
+                period="daily",
+                start_date=format_date(start_date),
+                end_date=format_date(end_date),
+                adjust="qfq"
+            )
+        except Exception:
+            # 只有请求失败时降低共享速率，本地处理出错不影响速率
+            self.rate_limiter.on_error()
+            raise
+        self.rate_limiter.on_success()
         
-    def download_stock_data(self, stock_code, start_date=None, end_date=None):
-        """下载单只股票的历史数据"""
+        if df.empty:
+            return df
+        
+        # 重命名列
+        df = df.rename(columns={
+            '日期': 'Date',
+            '开盘': 'Open',
+            '收盘': 'Close',
+            '最高': 'High',
+            '最低': 'Low',
+            '成交量': 'Volume',
+            '成交额': 'Amount',
+            '振幅': 'Amplitude',
+            '涨跌幅': 'Change',
+            '涨跌额': 'ChangeAmount',
+            '换手率': 'Turnover'
+        })
+        
+        # 设置日期为索引
+        df['Date'] = pd.to_datetime(df['Date'])
+        df.set_index('Date', inplace=True)
+        
+        # 添加额外列
+        df['Dividends'] = 0.0
+        df['Stock Splits'] = 0.0
+        return df
+
+    def find_csv_file(self, stock_code):
+        """查找股票已有的CSV文件，不存在返回 None"""
+        files = glob.glob(os.path.join(self.output_dir, f"{stock_code}_*_history.csv"))
+        return files[0] if files else None
+
+    def get_local_last_quote(self, stock_code):
+        """读取本地已存储的最后一个交易日及其收盘价
+
+        Returns:
+            tuple: (pd.Timestamp, float)，无本地数据时返回 None
+        """
+        if self.storage == 'npy':
+            last = self.store.last_record(stock_code)
+            if last is None:
+                return None
+            return pd.Timestamp(last['trade_date']), float(last['close_price'])
+
+        csv_file = self.find_csv_file(stock_code)
+        if not csv_file:
+            return None
+        # 只读取文件头和末尾，避免解析整个CSV
+        with open(csv_file, 'rb') as f:
+            header_line = f.readline().decode('utf-8').strip()
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 4096, 0))
+            last_line = f.read().decode('utf-8', errors='ignore').strip().splitlines()[-1]
+        if last_line == header_line:
+            return None
+        header = header_line.split(',')
+        last = last_line.split(',')
+        return pd.Timestamp(last[header.index('Date')]), float(last[header.index('Close')])
+
+    def save_history(self, stock_code, stock_name, df, append=False):
+        """保存历史数据
+
+        Args:
+            df (DataFrame): 以 Date 为索引的日线数据
+            append (bool): 是否追加到已有数据之后（否则覆盖）
+        """
+        # 确保目录存在
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        if self.storage == 'npy':
+            # 保存到列式存储
+            records = records_from_frame(df.reset_index().rename(columns=CSV_COLUMN_MAP))
+            if append:
+                self.store.append(stock_code, records)
+            else:
+                self.store.write(stock_code, records)
+            return
+
+        # 保存到CSV
+        csv_file = self.find_csv_file(stock_code) if append else None
+        if csv_file:
+            df.to_csv(csv_file, mode='a', header=False)
+        else:
+            output_file = os.path.join(self.output_dir, f"{stock_code}_{stock_name}_history.csv")
+            df.to_csv(output_file)
+
+    def download_stock_data(self, stock_code, start_date=None, end_date=None, stock_name=None,
+                            last_quote=None):
+        """下载单只股票的历史数据
+
+        增量模式下从已存储的最后交易日开始下载（含当天用于校验），只追加之后的新数据；
+        若重叠日的前复权收盘价发生变化（期间有除权除息），重新下载全部历史并覆盖。
+
+        Args:
+            stock_code (str): 股票代码
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            stock_name (str): 股票名称，为 None 时从已加载的代码名称表查找
+            last_quote (tuple): 增量模式下本地无数据时使用的 (最后交易日, 收盘价)，通常来自数据库
+        """
+        if stock_name is None:
+            if self.stock_names is None:
+                self.load_stock_names()
+            stock_name = self.stock_names.get(stock_code, 'Unknown')
+
+        if self.delta:
+            # 本地数据优先，本地没有时使用传入的（数据库）最后交易日
+            last_quote = self.get_local_last_quote(stock_code) or last_quote
+
         for attempt in range(self.retry_times):
             try:
-                # 添加随机延时，避免被封
-                time.sleep(random.uniform(1, 3))
-                
-                # 获取股票名称
-                try:
-                    stock_info_df = ak.stock_info_a_code_name()
-                    stock_name = stock_info_df[stock_info_df['code'] == stock_code]['name'].values[0]
-                except Exception as e:
-                    logger.warning(f"获取股票名称失败: {str(e)}")
-                    stock_name = 'Unknown'
-                
-                # 构建股票代码（添加市场前缀）
-                if stock_code.startswith('6'):
-                    full_code = f"sh{stock_code}"
-                else:
-                    full_code = f"sz{stock_code}"
-                    
                 logger.info(f"下载 {stock_code} ({stock_name})...")
                 
-                # 转换日期格式
-                formatted_start_date = format_date(start_date)
-                formatted_end_date = format_date(end_date)
+                if not self.delta or last_quote is None:
+                    df = self.fetch_history(stock_code, start_date, end_date)
+                    if df.empty:
+                        logger.error(f"{stock_code} ({stock_name}): 未获取到数据")
+                        self.last_errors[stock_code] = '未获取到数据'
+                        return False
+                    self.save_history(stock_code, stock_name, df)
+                    logger.info(f"√ {stock_code} ({stock_name}): {len(df)}条记录")
+                    return True
                 
-                # 下载数据
-                df = ak.stock_zh_a_hist(
-                    symbol=stock_code,
-                    period="daily",
-                    start_date=formatted_start_date,
-                    end_date=formatted_end_date,
-                    adjust="qfq"
-                )
+                last_date, last_close = last_quote
+                last_date = pd.Timestamp(last_date)
+                if end_date and pd.Timestamp(end_date) <= last_date:
+                    logger.info(f"√ {stock_code} ({stock_name}): 已是最新")
+                    return True
                 
+                df = self.fetch_history(stock_code, last_date.strftime('%Y-%m-%d'), end_date)
                 if df.empty:
-                    logger.error(f"{stock_code} ({stock_name}): 未获取到数据")
-                    return False
-                
-                # 重命名列
-                df = df.rename(columns={
-                    '日期': 'Date',
-                    '开盘': 'Open',
-                    '收盘': 'Close',
-                    '最高': 'High',
-                    '最低': 'Low',
-                    '成交量': 'Volume',
-                    '成交额': 'Amount',
-                    '振幅': 'Amplitude',
-                    '涨跌幅': 'Change',
-                    '涨跌额': 'ChangeAmount',
-                    '换手率': 'Turnover'
-                })
-                
-                # 设置日期为索引
-                df['Date'] = pd.to_datetime(df['Date'])
-                df.set_index('Date', inplace=True)
+                    # 最后交易日之后没有行情（如停牌）
+                    logger.info(f"√ {stock_code} ({stock_name}): 已是最新")
+                    return True
                 
-                # 添加额外列
-                df['Dividends'] = 0.0
-                df['Stock Splits'] = 0.0
+                # 校验重叠日收盘价，复权价变化说明历史数据已失效
+                if last_date in df.index and not np.isclose(df.loc[last_date, 'Close'], last_close,
+                                                             rtol=1e-4, atol=1e-3):
+                    logger.info(f"{stock_code} ({stock_name}): 复权价已变化，重新下载全部历史")
+                    df = self.fetch_history(stock_code, start_date, end_date)
+                    if df.empty:
+                        logger.error(f"{stock_code} ({stock_name}): 未获取到数据")
+                        self.last_errors[stock_code] = '未获取到数据'
+                        return False
+                    self.save_history(stock_code, stock_name, df)
+                    with self._readjusted_lock:
+                        self.readjusted_stocks.append(stock_code)
+                    logger.info(f"√ {stock_code} ({stock_name}): {len(df)}条记录(全量)")
+                    return True
                 
-                # 确保目录存在
-                os.makedirs(self.output_dir, exist_ok=True)
-                
-                # 保存到CSV
-                output_file = os.path.join(self.output_dir, f"{stock_code}_{stock_name}_history.csv")
-                df.to_csv(output_file)
-                
-                logger.info(f"√ {stock_code} ({stock_name}): {len(df)}条记录")
+                new_df = df[df.index > last_date]
+                if new_df.empty:
+                    logger.info(f"√ {stock_code} ({stock_name}): 已是最新")
+                    return True
+                self.save_history(stock_code, stock_name, new_df, append=True)
+                logger.info(f"√ {stock_code} ({stock_name}): 新增{len(new_df)}条记录")
                 return True
                 
             except Exception as e:
+                # 重试间隔由限速器控制（请求失败时已在 fetch_history 中降低速率）
+                self.last_errors[stock_code] = str(e)
                 if attempt < self.retry_times - 1:
                     logger.warning(f"× {stock_code}: 重试 {attempt + 1}/{self.retry_times}")
                 else:
                     logger.error(f"× {stock_code}: 下载失败")
-                time.sleep(self.retry_delay)
             
         return False
     
-    def batch_download(self, stock_list_file, start_date=None, end_date=None):
-        """批量下载多只股票的历史数据"""
+    def batch_download(self, stock_list_file, start_date=None, end_date=None, refresh_names=False,
+                       delta_source='local', resume=False):
+        """批量下载多只股票的历史数据
+
+        Args:
+            stock_list_file (str): 股票列表文件
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            refresh_names (bool): 是否重新获取股票代码名称表
+            delta_source (str): 增量模式下最后交易日的来源
+                - 'local': 只读取本地文件
+                - 'db': 本地没有数据时使用 stock_historical_quotes 中的最后交易日
+            resume (bool): 按任务清单续传，只下载上次未完成和失败的股票
+
+        Returns:
+            int: 下载成功的股票数；出错或所有股票都下载失败时返回 None
+        """
+        manifest = None
         try:
             # 读取股票列表
             df = pd.read_csv(stock_list_file)
             stock_codes = df['代码'].astype(str).str.zfill(6).tolist()
             
+            # 任务清单：续传时只保留未成功的股票，否则开始新一轮
+            manifest = (JobManifest(self.manifest_file) if self.manifest_file
+                        else JobManifest.for_output_dir(self.output_dir))
+            if resume:
+                total_count = len(stock_codes)
+                stock_codes = manifest.pending_codes(stock_codes)
+                logger.info(f"续传模式: {total_count - len(stock_codes)} 只已完成，剩余 {len(stock_codes)} 只")
+            else:
+                manifest.reset(stock_codes)
+            
+            # 一次性加载代码名称映射，供所有下载任务共享
+            stock_names = self.load_stock_names(df, refresh=refresh_names)
+            
+            # 增量模式下一次性获取数据库中各股票的最后交易日
+            last_quotes = {}
+            if self.delta and delta_source == 'db':
+                from stock_history.db.history_db import get_db_engine, get_stock_last_quotes
+                last_quotes = get_stock_last_quotes(get_db_engine())
+                logger.info(f"已获取 {len(last_quotes)} 只股票的最新入库行情")
+            
             success_count = 0
             failed_stocks = []
             
@@ -131,7 +354,8 @@ class AKStockDownloader:
             with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
                 # 创建下载任务
                 future_to_stock = {
-                    executor.submit(self.download_stock_data, code, start_date, end_date): code 
+                    executor.submit(self.download_stock_data, code, start_date, end_date,
+                                    stock_names.get(code, 'Unknown'), last_quotes.get(code)): code 
                     for code in stock_codes
                 }
                 
@@ -143,24 +367,44 @@ class AKStockDownloader:
                     try:
                         if future.result():
                             success_count += 1
+                            manifest.mark(stock_code, STATUS_SUCCESS)
+                            if stock_code in self.readjusted_stocks:
+                                # 持久化到任务清单，入库程序据此全量替换该股票的行情
+                                manifest.mark_readjusted(stock_code)
                         else:
                             failed_stocks.append(stock_code)
+                            manifest.mark(stock_code, STATUS_FAILED, self.last_errors.get(stock_code))
                     except Exception as e:
                         logger.error(f"处理 {stock_code} 时出错: {str(e)}")
                         failed_stocks.append(stock_code)
+                        manifest.mark(stock_code, STATUS_FAILED, str(e))
             
             # 输出统计信息
             logger.info(f"\n下载完成! 成功: {success_count}/{len(stock_codes)}")
-            if failed_stocks:
-                logger.warning("下载失败的股票:")
-                for code in failed_stocks:
-                    logger.warning(code)
+            logger.info(f"请求速率统计: {self.rate_limiter.stats()}")
+            if self.readjusted_stocks:
+                logger.warning(f"以下 {len(self.readjusted_stocks)} 只股票复权价已变化并重新下载全部历史，"
+                               f"已记录在任务清单中，入库时将全量替换:")
+                logger.warning(', '.join(sorted(self.readjusted_stocks)))
+            # 按任务清单报告失败的股票，续传时包含之前轮次累计的尝试次数
+            failed_jobs = manifest.failed_jobs()
+            if failed_jobs:
+                logger.warning(f"下载失败的股票 {len(failed_jobs)} 只:")
+                for code, attempts, last_error in failed_jobs:
+                    logger.warning(f"{code}: 尝试 {attempts} 次, {last_error or ''}")
+                logger.warning(f"可使用 --resume 只重试失败的股票 (任务清单: {manifest.path})")
+            logger.info(f"任务清单状态: {manifest.summary()}")
+            if failed_stocks and not success_count:
+                return None
                     
             return success_count
             
         except Exception as e:
             logger.error(f"批量下载过程出错: {str(e)}")
-            return 0
+            return None
+        finally:
+            if manifest:
+                manifest.close()
 
 def main():
     import argparse
@@ -186,12 +430,55 @@ def main():
                        default=3,
                        help='并发下载的线程数')
     
+    parser.add_argument('--rate',
+                       type=float,
+                       default=1.0,
+                       help='初始请求速率(次/秒)，出错时自动降低、成功后逐步恢复')
+    
+    parser.add_argument('--max-rate',
+                       type=float,
+                       help='最高请求速率(次/秒)，默认为初始速率的4倍')
+    
+    parser.add_argument('--format', '-f',
+                       choices=['csv', 'npy'],
+                       default='csv',
+                       help='存储格式: csv=每只股票一个CSV, npy=列式二进制存储(可内存映射)')
+    
+    parser.add_argument('--delta',
+                       action='store_true',
+                       help='增量模式: 只下载已存储最后交易日之后的数据并追加到已有文件')
+    
+    parser.add_argument('--delta-source',
+                       choices=['local', 'db'],
+                       default='local',
+                       help='增量模式下最后交易日的来源: local=本地文件, db=本地没有时使用数据库')
+    
+    parser.add_argument('--manifest',
+                       help='任务清单文件(SQLite)，默认为输出目录下的 _manifest.sqlite')
+    
+    parser.add_argument('--resume',
+                       action='store_true',
+                       help='按任务清单续传，只下载上次未完成和失败的股票')
+    
+    parser.add_argument('--name-cache',
+                       help='股票代码名称表缓存文件(JSON)，存在时复用，避免每次获取全市场列表')
+    
+    parser.add_argument('--refresh-names',
+                       action='store_true',
+                       help='忽略缓存，重新获取股票代码名称表')
+    
     args = parser.parse_args()
     
     # 创建下载器实例
     downloader = AKStockDownloader(
         output_dir=args.output,
-        max_workers=args.workers
+        max_workers=args.workers,
+        rate=args.rate,
+        max_rate=args.max_rate,
+        storage=args.format,
+        name_cache_file=args.name_cache,
+        delta=args.delta,
+        manifest_file=args.manifest
     )
     
     # 开始下载
@@ -201,12 +488,19 @@ def main():
     success_count = downloader.batch_download(
         stock_list_file=args.stock_list,
         start_date=args.start_date,
-        end_date=args.end_date
+        end_date=args.end_date,
+        refresh_names=args.refresh_names,
+        delta_source=args.delta_source,
+        resume=args.resume
     )
     
     end_time = datetime.now()
     logger.info(f"总耗时: {end_time - start_time}")
+    if success_count is None:
+        logger.error("下载失败")
+        return False
     logger.info(f"成功下载: {success_count} 只股票的数据")
+    return True
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(0 if main() else 1) 
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = '_manifest.sqlite'
+
+STATUS_PENDING = 'pending'
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+
+class JobManifest:
+    """批量下载任务清单
+
+    用本地 SQLite 文件记录每只股票的下载状态、尝试次数和最后一次错误，
+    下载中断后可只重试未完成和失败的股票；入库程序也可读取同一清单，
+    只导入本次下载成功的股票。
+
+    增量下载时复权价变化、已重新下载全部历史的股票另外记录在 readjusted 表中，
+    该表不随新一轮下载清空，由入库程序全量替换这些股票的行情后清除。
+    """
+
+    def __init__(self, path):
+        """打开（或创建）任务清单
+
+        Args:
+            path (str): 清单文件路径
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                stock_code TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS readjusted (
+                stock_code TEXT PRIMARY KEY,
+                detected_at TEXT
+            )
+        """)
+        self._conn.commit()
+
+    @classmethod
+    def for_output_dir(cls, output_dir):
+        """输出目录下的默认任务清单"""
+        return cls(os.path.join(output_dir, MANIFEST_FILE))
+
+    def reset(self, stock_codes):
+        """开始新一轮下载：清空旧记录，所有股票置为待下载"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs")
+            self._conn.executemany(
+                "INSERT INTO jobs (stock_code, status, attempts, updated_at) VALUES (?, ?, 0, ?)",
+                [(code, STATUS_PENDING, now) for code in stock_codes]
+            )
+            self._conn.commit()
+
+    def pending_codes(self, stock_codes):
+        """返回尚未下载成功的股票（含清单中没有记录的股票），保持原顺序"""
+        succeeded = self.succeeded_codes()
+        pending = [code for code in stock_codes if code not in succeeded]
+
+        # 新出现的股票补充到清单中
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (stock_code, status, attempts, updated_at) VALUES (?, ?, 0, ?)",
+                [(code, STATUS_PENDING, now) for code in pending]
+            )
+            self._conn.commit()
+        return pending
+
+    def mark(self, stock_code, status, error=None):
+        """记录一次下载结果
+
+        Args:
+            stock_code (str): 股票代码
+            status (str): 'success' 或 'failed'
+            error (str): 失败原因
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO jobs (stock_code, status, attempts, last_error, updated_at)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT(stock_code) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = attempts + 1,
+                    last_error = excluded.last_error,
+                    updated_at = excluded.updated_at
+            """, (stock_code, status, error, now))
+            self._conn.commit()
+
+    def succeeded_codes(self):
+        """下载成功的股票代码集合"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stock_code FROM jobs WHERE status = ?", (STATUS_SUCCESS,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def failed_jobs(self):
+        """下载失败的股票 [(stock_code, attempts, last_error), ...]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT stock_code, attempts, last_error FROM jobs WHERE status = ? ORDER BY stock_code",
+                (STATUS_FAILED,)
+            ).fetchall()
+
+    def mark_readjusted(self, stock_code):
+        """记录复权价已变化、本地已重新下载全部历史的股票"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO readjusted (stock_code, detected_at) VALUES (?, ?)",
+                (stock_code, now)
+            )
+            self._conn.commit()
+
+    def readjusted_codes(self):
+        """尚未全量入库的复权价变化股票集合"""
+        with self._lock:
+            rows = self._conn.execute("SELECT stock_code FROM readjusted").fetchall()
+        return {row[0] for row in rows}
+
+    def clear_readjusted(self, stock_codes):
+        """入库程序已全量替换这些股票的行情后清除记录"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM readjusted WHERE stock_code = ?",
+                                   [(code,) for code in stock_codes])
+            self._conn.commit()
+
+    def summary(self):
+        """各状态的股票数量"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
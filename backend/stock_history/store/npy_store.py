@@ -0,0 +1,200 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 单条日线记录的二进制格式，字段名与 stock_historical_quotes 保持一致
+HISTORY_DTYPE = np.dtype([
+    ('trade_date', 'datetime64[D]'),
+    ('open_price', '<f8'),
+    ('close_price', '<f8'),
+    ('high_price', '<f8'),
+    ('low_price', '<f8'),
+    ('volume', '<i8'),
+    ('amount', '<f8'),
+    ('amplitude', '<f8'),
+    ('change_ratio', '<f8'),
+    ('change_amount', '<f8'),
+    ('turnover_ratio', '<f8'),
+    ('dividends', '<f8'),
+    ('stock_splits', '<f8'),
+])
+
+# 下载器CSV列名 -> 数据库字段
+CSV_COLUMN_MAP = {
+    'Date': 'trade_date',
+    'Open': 'open_price',
+    'Close': 'close_price',
+    'High': 'high_price',
+    'Low': 'low_price',
+    'Volume': 'volume',
+    'Amount': 'amount',
+    'Amplitude': 'amplitude',
+    'Change': 'change_ratio',
+    'ChangeAmount': 'change_amount',
+    'Turnover': 'turnover_ratio',
+    'Dividends': 'dividends',
+    'Stock Splits': 'stock_splits'
+}
+
+STORE_FILE_SUFFIX = '.bin'
+META_FILE = '_meta.json'
+
+class NpyHistoryStore:
+    """按股票存储的列式历史行情库
+
+    每只股票一个 <stock_code>.bin 文件，内容是按日期升序排列的定长记录
+    (HISTORY_DTYPE)。追加新数据只需在文件末尾写入字节，读取时可直接用
+    np.memmap 映射，不需要解析文本和日期。
+    """
+
+    def __init__(self, base_dir):
+        """初始化存储目录
+
+        Args:
+            base_dir (str): 存储目录
+        """
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+        self._check_meta()
+
+    def _check_meta(self):
+        """校验目录中数据的记录格式与当前版本一致"""
+        meta_path = os.path.join(self.base_dir, META_FILE)
+        meta = {'fields': [[name, HISTORY_DTYPE[name].str] for name in HISTORY_DTYPE.names]}
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+            if existing.get('fields') != meta['fields']:
+                raise ValueError(f"存储目录 {self.base_dir} 的数据格式与当前版本不一致")
+        else:
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+
+    def path(self, stock_code):
+        """股票对应的数据文件路径"""
+        return os.path.join(self.base_dir, f"{stock_code}{STORE_FILE_SUFFIX}")
+
+    def list_codes(self):
+        """存储中已有的股票代码"""
+        return sorted(
+            f[:-len(STORE_FILE_SUFFIX)] for f in os.listdir(self.base_dir)
+            if f.endswith(STORE_FILE_SUFFIX)
+        )
+
+    def count(self, stock_code):
+        """股票已存储的记录数"""
+        path = self.path(stock_code)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // HISTORY_DTYPE.itemsize
+
+    def read(self, stock_code, mmap=True):
+        """读取股票全部记录
+
+        Args:
+            stock_code (str): 股票代码
+            mmap (bool): 是否以只读内存映射方式返回
+
+        Returns:
+            np.ndarray: HISTORY_DTYPE 结构化数组，无数据时返回空数组
+        """
+        n = self.count(stock_code)
+        if n == 0:
+            return np.empty(0, dtype=HISTORY_DTYPE)
+        if mmap:
+            return np.memmap(self.path(stock_code), dtype=HISTORY_DTYPE, mode='r', shape=(n,))
+        return np.fromfile(self.path(stock_code), dtype=HISTORY_DTYPE, count=n)
+
+    def read_range(self, stock_code, start_date=None, end_date=None, after_date=None):
+        """按日期读取部分记录，利用日期有序直接二分定位
+
+        Args:
+            start_date / end_date: 闭区间过滤
+            after_date: 只返回该日期之后的记录
+        """
+        data = self.read(stock_code)
+        dates = data['trade_date']
+        lo, hi = 0, len(data)
+        if start_date is not None:
+            lo = max(lo, np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), 'D'), side='left'))
+        if after_date is not None:
+            lo = max(lo, np.searchsorted(dates, np.datetime64(pd.Timestamp(after_date), 'D'), side='right'))
+        if end_date is not None:
+            hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), 'D'), side='right')
+        return data[lo:hi]
+
+    def last_record(self, stock_code):
+        """股票已存储的最后一条记录（只映射最后一条），无数据时返回 None"""
+        n = self.count(stock_code)
+        if n == 0:
+            return None
+        last = np.memmap(self.path(stock_code), dtype=HISTORY_DTYPE, mode='r',
+                         offset=(n - 1) * HISTORY_DTYPE.itemsize, shape=(1,))
+        return last[0].copy()
+
+    def last_date(self, stock_code):
+        """股票已存储的最后交易日期，无数据时返回 None"""
+        last = self.last_record(stock_code)
+        if last is None:
+            return None
+        return pd.Timestamp(last['trade_date']).date()
+
+    def write(self, stock_code, records):
+        """覆盖写入股票全部记录"""
+        records = np.sort(np.asarray(records, dtype=HISTORY_DTYPE), order='trade_date')
+        tmp_path = f"{self.path(stock_code)}.tmp"
+        records.tofile(tmp_path)
+        os.replace(tmp_path, self.path(stock_code))
+        return len(records)
+
+    def append(self, stock_code, records):
+        """追加记录
+
+        新数据都在已存储的最后日期之后时直接追加到文件末尾；有重叠时以
+        新数据为准合并后重写。
+
+        Returns:
+            int: 追加后的总记录数
+        """
+        records = np.sort(np.asarray(records, dtype=HISTORY_DTYPE), order='trade_date')
+        if len(records) == 0:
+            return self.count(stock_code)
+
+        last = self.last_date(stock_code)
+        if last is None:
+            return self.write(stock_code, records)
+
+        if records['trade_date'][0] > np.datetime64(last, 'D'):
+            with open(self.path(stock_code), 'ab') as f:
+                records.tofile(f)
+            return self.count(stock_code)
+
+        existing = self.read(stock_code, mmap=False)
+        keep = ~np.isin(existing['trade_date'], records['trade_date'])
+        return self.write(stock_code, np.concatenate([existing[keep], records]))
+
+    def to_frame(self, stock_code, **range_kwargs):
+        """以 DataFrame 形式读取，列名与数据库字段一致"""
+        data = self.read_range(stock_code, **range_kwargs) if range_kwargs else self.read(stock_code)
+        return pd.DataFrame(np.asarray(data))
+
+def records_from_frame(df):
+    """将列名与数据库字段一致的 DataFrame 转换为 HISTORY_DTYPE 记录"""
+    records = np.zeros(len(df), dtype=HISTORY_DTYPE)
+    for name in HISTORY_DTYPE.names:
+        if name == 'trade_date':
+            records[name] = pd.to_datetime(df[name]).values.astype('datetime64[D]')
+        elif name in df.columns:
+            values = pd.to_numeric(df[name], errors='coerce')
+            if HISTORY_DTYPE[name].kind == 'i':
+                values = values.fillna(0)
+            records[name] = values.to_numpy()
+        elif HISTORY_DTYPE[name].kind == 'f':
+            records[name] = np.nan
+    return records
@@ -0,0 +1,141 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import time
+import threading
+import concurrent.futures
+import pytest
+from utils.rate_limiter import AdaptiveRateLimiter
+
+class FakeUpstream:
+    """模拟限流的上游接口，超过容量（请求/秒）时抛出异常"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._requests = []
+        self._lock = threading.Lock()
+
+    def request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._requests = [t for t in self._requests if now - t < 1.0]
+            if len(self._requests) >= self.capacity:
+                raise RuntimeError('429 Too Many Requests')
+            self._requests.append(now)
+        # 模拟网络延迟
+        time.sleep(0.01)
+
+def test_error_halves_rate():
+    limiter = AdaptiveRateLimiter(rate=8.0, min_rate=1.0)
+    limiter.on_error()
+    assert limiter.rate == pytest.approx(4.0)
+    assert limiter.stats()['error'] == 1
+
+def test_error_respects_min_rate():
+    limiter = AdaptiveRateLimiter(rate=1.5, min_rate=1.0, cooldown=0)
+    limiter.on_error()
+    limiter.on_error()
+    assert limiter.rate == pytest.approx(1.0)
+
+def test_errors_within_cooldown_decrease_once():
+    limiter = AdaptiveRateLimiter(rate=8.0, min_rate=0.1, cooldown=0.2)
+    for _ in range(5):
+        limiter.on_error()
+    assert limiter.rate == pytest.approx(4.0)
+    assert limiter.stats()['error'] == 5
+
+    # 冷却时间过后再次出错继续降速
+    time.sleep(0.25)
+    limiter.on_error()
+    assert limiter.rate == pytest.approx(2.0)
+
+def test_success_increases_rate_up_to_max():
+    limiter = AdaptiveRateLimiter(rate=1.0, max_rate=1.2)
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(1.05)
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(1.05 ** 2)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(1.2)
+    assert limiter.stats()['success'] == 12
+
+def test_default_max_rate_is_four_times_initial():
+    limiter = AdaptiveRateLimiter(rate=2.0)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(8.0)
+
+def test_acquire_is_thread_safe():
+    """多线程取令牌时总速率不超过设定速率，也不丢失令牌"""
+    rate, total, workers = 50.0, 40, 8
+    limiter = AdaptiveRateLimiter(rate=rate, max_rate=rate, burst=1)
+    timestamps = []
+    lock = threading.Lock()
+
+    def worker(count):
+        for _ in range(count):
+            limiter.acquire()
+            with lock:
+                timestamps.append(time.monotonic())
+
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(worker, [total // workers] * workers))
+
+    assert len(timestamps) == total
+    # 桶中初始有 burst 个令牌，其余按速率发放
+    assert timestamps[-1] - start >= (total - 1) / rate * 0.95
+
+def test_concurrent_updates_are_counted():
+    limiter = AdaptiveRateLimiter(rate=1.0, max_rate=1000.0, cooldown=0)
+
+    def worker():
+        for _ in range(200):
+            limiter.on_success()
+            limiter.on_error()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = limiter.stats()
+    assert stats['success'] == 1600
+    assert stats['error'] == 1600
+
+def test_fake_upstream_rejects_over_capacity():
+    upstream = FakeUpstream(capacity=3)
+    for _ in range(3):
+        upstream.request()
+    with pytest.raises(RuntimeError):
+        upstream.request()
+
+def test_limiter_settles_below_upstream_capacity():
+    """线程池共享限速器访问限流的上游：出错后降速，失败只占少数"""
+    capacity, seconds, workers = 20, 2.0, 8
+    upstream = FakeUpstream(capacity)
+    limiter = AdaptiveRateLimiter(rate=10.0, max_rate=80.0, cooldown=0.2)
+    deadline = time.monotonic() + seconds
+
+    def worker():
+        while time.monotonic() < deadline:
+            limiter.acquire()
+            try:
+                upstream.request()
+                limiter.on_success()
+            except RuntimeError:
+                limiter.on_error()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker) for _ in range(workers)]:
+            future.result()
+
+    stats = limiter.stats()
+    # 速率增长超过上游容量后被限流，限速器随之降速
+    assert stats['error'] > 0
+    assert stats['rate'] < limiter.max_rate
+    # 上游每秒最多接受 capacity 次请求
+    assert stats['success'] <= capacity * (seconds + 1)
+    assert stats['error'] < stats['success']
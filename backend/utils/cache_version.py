@@ -0,0 +1,38 @@
+"""
+HTTP 接口响应缓存的版本标记
+
+每日任务（技术评分、筹码分析、每日推荐）写入数据后调用 bump_cache_version()
+更新版本文件，API 进程比较版本文件的修改时间，发现变化后清空响应缓存。
+任务与 HTTP 服务需运行在同一台机器上；否则只能依赖缓存的 TTL 过期。
+"""
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 版本文件路径（相对于 backend 目录）
+CACHE_VERSION_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'response_cache.version'
+)
+
+def get_cache_version():
+    """返回当前缓存版本（版本文件的修改时间，文件不存在时为 0）"""
+    try:
+        return os.stat(CACHE_VERSION_FILE).st_mtime_ns
+    except OSError:
+        return 0
+
+def bump_cache_version(source):
+    """更新缓存版本，使所有 API 进程的响应缓存失效
+
+    Args:
+        source (str): 触发更新的任务名，写入版本文件便于排查
+    """
+    try:
+        os.makedirs(os.path.dirname(CACHE_VERSION_FILE), exist_ok=True)
+        with open(CACHE_VERSION_FILE, 'w') as f:
+            f.write(f"{source} {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        logger.info(f"已更新接口缓存版本: {source}")
+    except OSError as e:
+        logger.error(f"更新接口缓存版本失败: {str(e)}")
@@ -0,0 +1,134 @@
+"""
+换手率衰减筹码分布（CYQ）计算
+
+所有股票共用一套对数等比价格分箱（相邻分箱价格相差 BIN_RATIO），每只股票的
+筹码分布是分箱上的一行直方图，多只股票组成 (股票数, 分箱数) 的矩阵，每个交易日
+对所有股票做一次向量化更新：
+
+    分布 = 分布 × (1 - 换手率 × 衰减系数) + 当日成交分布 × 换手率 × 衰减系数
+
+当日成交在最低价和最高价之间按三角形分布，峰值位于当日均价。
+"""
+import warnings
+import numpy as np
+
+# 价格分箱范围和相邻分箱的价格比例（0.5%）
+PRICE_MIN = 0.5
+PRICE_MAX = 5000.0
+BIN_RATIO = 1.005
+
+BIN_COUNT = int(np.ceil(np.log(PRICE_MAX / PRICE_MIN) / np.log(BIN_RATIO))) + 1
+BIN_PRICES = PRICE_MIN * BIN_RATIO ** np.arange(BIN_COUNT)
+
+# 保存状态时丢弃占比低于该值的分箱
+PRUNE_RATIO = 1e-6
+
+def price_to_bin(prices):
+    """价格对应的分箱序号（超出范围的价格归入首尾分箱）"""
+    prices = np.clip(np.asarray(prices, dtype=float), PRICE_MIN, PRICE_MAX)
+    return np.rint(np.log(prices / PRICE_MIN) / np.log(BIN_RATIO)).astype(np.int64)
+
+def empty_histograms(n):
+    """n 只股票的空筹码分布"""
+    return np.zeros((n, BIN_COUNT), dtype=np.float32)
+
+def apply_day(hist, low, high, avg, turnover, decay=1.0):
+    """将一个交易日的成交计入筹码分布（原地更新）
+
+    Args:
+        hist (ndarray): (股票数, BIN_COUNT) 筹码分布
+        low, high, avg (ndarray): 每只股票当日最低价、最高价、均价
+        turnover (ndarray): 每只股票当日换手率（0~1），NaN 表示当日无行情，不更新
+        decay (float): 换手率衰减系数
+    """
+    rows = np.flatnonzero(~np.isnan(turnover) & ~np.isnan(low) & ~np.isnan(high))
+    if len(rows) == 0:
+        return hist
+
+    low_bin = price_to_bin(low[rows])
+    high_bin = np.maximum(price_to_bin(high[rows]), low_bin)
+    avg_bin = np.clip(price_to_bin(avg[rows]), low_bin, high_bin)
+
+    # 只在 [最低价, 最高价] 覆盖的分箱上计算三角形权重
+    width = int((high_bin - low_bin).max()) + 1
+    start = np.minimum(low_bin, BIN_COUNT - width)
+    cols = start[:, None] + np.arange(width)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rising = (cols - low_bin[:, None] + 1) / (avg_bin - low_bin + 1)[:, None]
+        falling = (high_bin[:, None] - cols + 1) / (high_bin - avg_bin + 1)[:, None]
+    weights = np.where(cols <= avg_bin[:, None], rising, falling)
+    weights[(cols < low_bin[:, None]) | (cols > high_bin[:, None])] = 0
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    # 分布为空的股票（首个交易日）直接以当日成交作为初始分布
+    rate = np.clip(turnover[rows] * decay, 0, 1)
+    rate[hist.sum(axis=1)[rows] <= 0] = 1
+
+    scale = np.ones(len(hist), dtype=hist.dtype)
+    scale[rows] = 1 - rate
+    hist *= scale[:, None]
+    hist[rows[:, None], cols] += (weights * rate[:, None]).astype(hist.dtype)
+    return hist
+
+def _band(cum, total, ratio):
+    """覆盖中间 ratio 比例筹码的价格区间"""
+    lower = (cum < (total * (1 - ratio) / 2)[:, None]).sum(axis=1)
+    upper = (cum < (total * (1 + ratio) / 2)[:, None]).sum(axis=1)
+    low = BIN_PRICES[np.minimum(lower, BIN_COUNT - 1)]
+    high = BIN_PRICES[np.minimum(upper, BIN_COUNT - 1)]
+    return low, high, (high - low) / (high + low)
+
+def distribution_metrics(hist, close):
+    """根据筹码分布计算获利比例、平均成本和集中度
+
+    Args:
+        hist (ndarray): (股票数, BIN_COUNT) 筹码分布
+        close (ndarray): 每只股票的收盘价
+
+    Returns:
+        dict: {指标名: 每只股票的取值}，分布为空的股票取值为 NaN
+            profit_ratio: 获利比例（成本不高于收盘价的筹码占比）
+            avg_cost: 平均成本
+            cost_70_low/cost_70_high/concentration_70: 70% 筹码的价格区间和集中度
+            cost_90_low/cost_90_high/concentration_90: 90% 筹码的价格区间和集中度
+    """
+    hist = hist.astype(float)
+    cum = np.cumsum(hist, axis=1)
+    total = cum[:, -1]
+    empty = total <= 0
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        close_bin = price_to_bin(close)
+        profit = cum[np.arange(len(hist)), close_bin] / total
+        avg_cost = hist @ BIN_PRICES / total
+
+    metrics = {'profit_ratio': profit, 'avg_cost': avg_cost}
+    for ratio in (70, 90):
+        low, high, concentration = _band(cum, total, ratio / 100)
+        metrics[f'cost_{ratio}_low'] = low
+        metrics[f'cost_{ratio}_high'] = high
+        metrics[f'concentration_{ratio}'] = concentration
+
+    for values in metrics.values():
+        values[empty] = np.nan
+    return metrics
+
+def pack_histogram(row):
+    """压缩一只股票的筹码分布，只保留非零分箱
+
+    Returns:
+        tuple: (first_bin, bytes)，分布为空时返回 (0, b'')
+    """
+    total = row.sum()
+    if total <= 0:
+        return 0, b''
+    nonzero = np.flatnonzero(row > total * PRUNE_RATIO)
+    first, last = nonzero[0], nonzero[-1]
+    return int(first), row[first:last + 1].astype(np.float32).tobytes()
+
+def unpack_histogram(hist, index, first_bin, data):
+    """将 pack_histogram 的结果写回分布矩阵的第 index 行"""
+    values = np.frombuffer(data, dtype=np.float32)
+    hist[index] = 0
+    hist[index, first_bin:first_bin + len(values)] = values
@@ -0,0 +1,99 @@
+"""
+每日技术指标计算
+
+为每只股票的每个交易日计算均线、均量、均线交叉和支撑阻力相关的窗口指标，
+结果写入 stock_daily_indicators，供技术分析接口按 (stock_code, trade_date)
+直接读取。窗口语义与接口原 SQL 中的 `ROWS n PRECEDING` 一致。
+"""
+import numpy as np
+import pandas as pd
+from utils.indicators import (
+    group_starts, grouped_rolling_sum, grouped_rolling_mean,
+    grouped_rolling_max, grouped_rolling_min, grouped_lag
+)
+
+# 计算一个交易日的全部指标最多需要的行情条数（含当日，MA200）
+LOOKBACK_ROWS = 200
+
+# 指标保留的小数位，与 MySQL 对 DECIMAL(.., 2) 求 AVG 的精度一致
+DECIMALS = 6
+
+# 计算所需的行情字段
+QUOTE_COLUMNS = ['stock_code', 'trade_date', 'close_price', 'high_price', 'low_price', 'volume']
+
+# stock_daily_indicators 写入字段
+DAILY_INDICATOR_COLUMNS = [
+    'stock_code', 'trade_date', 'close_price',
+    'ma_5', 'ma_10', 'ma_20', 'ma_60', 'ma_100', 'ma_200',
+    'volume_ma5', 'volume_ma20', 'volume_ma60', 'volume_ma100', 'volume_ma200',
+    'prev_ma_5', 'prev_ma_20', 'ma_5_change', 'ma_20_change', 'volume_ratio',
+    'max_price_5d', 'min_price_5d', 'max_price_10d', 'min_price_10d',
+    'max_price_20d', 'min_price_20d', 'vwap_20d', 'avg_volume_20d',
+    'price_change_rate_20d'
+]
+
+def _change_rate(current, previous):
+    """变化率(%)，基数为 0 或缺失时为 NaN"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previous == 0, np.nan, (current - previous) / previous * 100)
+
+def compute_daily_indicators(df):
+    """计算每条行情对应的技术指标
+
+    Args:
+        df (DataFrame): 行情长表，包含 QUOTE_COLUMNS，可包含多只股票；
+            每只股票需包含当日之前至少 LOOKBACK_ROWS - 1 条行情，指标才与全历史计算一致
+
+    Returns:
+        DataFrame: DAILY_INDICATOR_COLUMNS 对应的指标，每条行情一行
+    """
+    df = df.sort_values(['stock_code', 'trade_date'], kind='stable').reset_index(drop=True)
+    starts = group_starts(df['stock_code'].to_numpy())
+    close = df['close_price'].to_numpy(dtype=float)
+    high = df['high_price'].to_numpy(dtype=float)
+    low = df['low_price'].to_numpy(dtype=float)
+    volume = df['volume'].to_numpy(dtype=float)
+
+    result = {
+        'stock_code': df['stock_code'].to_numpy(),
+        'trade_date': df['trade_date'].to_numpy(),
+        'close_price': close
+    }
+
+    # 均线和均量
+    for n in (5, 10, 20, 60, 100, 200):
+        result[f'ma_{n}'] = grouped_rolling_mean(close, starts, n)
+    for n in (5, 20, 60, 100, 200):
+        result[f'volume_ma{n}'] = grouped_rolling_mean(volume, starts, n)
+
+    for column in list(result)[3:]:
+        result[column] = np.round(result[column], DECIMALS)
+
+    # 均线交叉：前一日均线、5 日均线变化率和量比
+    for n in (5, 20):
+        ma = result[f'ma_{n}']
+        result[f'prev_ma_{n}'] = grouped_lag(ma, starts, 1)
+        result[f'ma_{n}_change'] = _change_rate(ma, grouped_lag(ma, starts, 5))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['volume_ratio'] = np.where(result['volume_ma20'] == 0, np.nan,
+                                          volume / result['volume_ma20'])
+
+    # 支撑阻力：ROWS n PRECEDING 的窗口包含 n+1 条记录
+    for n in (5, 10, 20):
+        result[f'max_price_{n}d'] = grouped_rolling_max(high, starts, n + 1)
+        result[f'min_price_{n}d'] = grouped_rolling_min(low, starts, n + 1)
+    amount, _ = grouped_rolling_sum(close * volume, starts, 21)
+    volume_sum, _ = grouped_rolling_sum(volume, starts, 21)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['vwap_20d'] = np.where(volume_sum == 0, np.nan, amount / volume_sum)
+    result['avg_volume_20d'] = grouped_rolling_mean(volume, starts, 21)
+    result['price_change_rate_20d'] = _change_rate(close, grouped_lag(close, starts, 20))
+
+    df = pd.DataFrame(result, columns=DAILY_INDICATOR_COLUMNS)
+    df[DAILY_INDICATOR_COLUMNS[3:]] = df[DAILY_INDICATOR_COLUMNS[3:]].round(DECIMALS)
+    return df
+
+def indicator_records(df):
+    """将指标 DataFrame 转换为写入数据库的记录（NaN 转为 None）"""
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
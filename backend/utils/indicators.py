@@ -0,0 +1,173 @@
+"""
+向量化技术指标计算
+
+行情按 股票 × 交易日 组织为二维数组（面板），每只股票的记录右对齐：最后一列是
+该股票窗口内最新的一条记录，记录不足时左侧补 NaN。滚动计算均按"可用行"统计，
+与 SQL 中 `ROWS BETWEEN n PRECEDING AND CURRENT ROW` 的语义一致：窗口内不足
+n+1 行时按已有行计算，NaN 不参与计算。
+
+grouped_* 函数则直接作用于按 (股票, 交易日) 排序的一维长表，适合历史较长、
+各股票记录数差异较大的场景，窗口语义相同。
+"""
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def build_panel(df, columns, width, code_column='stock_code', date_column='trade_date'):
+    """将长表行情转换为右对齐的二维面板
+
+    Args:
+        df (DataFrame): 行情数据（长表，每行一只股票一个交易日）
+        columns (list): 需要转换的数值列
+        width (int): 面板列数，每只股票只保留最近 width 条记录
+        code_column (str): 股票代码列
+        date_column (str): 交易日期列
+
+    Returns:
+        tuple: (codes, last_dates, panels)
+            codes (ndarray): 股票代码，对应面板的行
+            last_dates (ndarray): 每只股票最后一条记录的日期
+            panels (dict): {列名: (股票数, width) 的 float64 数组}
+    """
+    df = df.sort_values([code_column, date_column], kind='stable')
+    codes, starts, counts = np.unique(df[code_column].to_numpy(), return_index=True, return_counts=True)
+    n = len(codes)
+
+    # 每条记录在所属股票中的倒数序号（最新一条为 0），映射到右对齐的列位置
+    row_stock = np.repeat(np.arange(n), counts)
+    rank_from_end = np.repeat(starts + counts, counts) - 1 - np.arange(len(df))
+    keep = rank_from_end < width
+    col = width - 1 - rank_from_end[keep]
+    row = row_stock[keep]
+
+    panels = {}
+    for column in columns:
+        panel = np.full((n, width), np.nan)
+        panel[row, col] = df[column].to_numpy(dtype=float)[keep]
+        panels[column] = panel
+
+    last_dates = df[date_column].to_numpy()[starts + counts - 1]
+    return codes, last_dates, panels
+
+def _windows(x, window):
+    """左侧补 NaN 后的滑动窗口视图，结果与输入列对齐"""
+    padded = np.concatenate([np.full((x.shape[0], window - 1), np.nan), x], axis=1)
+    return sliding_window_view(padded, window, axis=1)
+
+def rolling_mean(x, window):
+    """滚动均值（忽略 NaN，窗口内无数据时为 NaN）"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanmean(_windows(x, window), axis=2)
+
+def rolling_std(x, window):
+    """滚动总体标准差（与 MySQL STDDEV 一致，忽略 NaN）"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanstd(_windows(x, window), axis=2)
+
+def lag(x, periods=1):
+    """向右平移 periods 列（对应 SQL LAG），左侧补 NaN"""
+    out = np.full_like(x, np.nan)
+    out[:, periods:] = x[:, :-periods]
+    return out
+
+def tail_mean(x, window):
+    """每行最后 window 列的均值（忽略 NaN），即滚动均值在最后一列的取值"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanmean(x[:, -window:], axis=1)
+
+def tail_std(x, window):
+    """每行最后 window 列的总体标准差（忽略 NaN）"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanstd(x[:, -window:], axis=1)
+
+def lag_macd(close):
+    """基于前一日收盘价的 MACD 近似（与评分 SQL 中的计算一致）
+
+    快线 = (2 * 收盘 + 11 * 前收) / 13，慢线 = (2 * 收盘 + 25 * 前收) / 27，
+    MACD = 快线 - 慢线；信号线为 MACD 的 9 日均值，由调用方用 rolling_mean/tail_mean 计算。
+    """
+    prev_close = lag(close)
+    return (2 * close + 11 * prev_close) / 13 - (2 * close + 25 * prev_close) / 27
+
+def gather_windows(values, end_positions, start_positions, width):
+    """按位置从一维序列中截取右对齐的窗口面板
+
+    用于历史回填：每个 (股票, 日期) 对应一行，窗口为 values[start:end+1]，
+    超出 width 的部分截断，不足时左侧补 NaN。
+
+    Args:
+        values (ndarray): 按 (股票, 日期) 排序的一维序列
+        end_positions (ndarray): 每个窗口最后一条记录的位置
+        start_positions (ndarray): 每个窗口第一条记录的位置
+        width (int): 窗口面板宽度
+
+    Returns:
+        ndarray: (窗口数, width) 的 float64 数组
+    """
+    idx = end_positions[:, None] - (width - 1) + np.arange(width)
+    panel = values.astype(float)[np.clip(idx, 0, None)]
+    panel[idx < start_positions[:, None]] = np.nan
+    return panel
+
+def group_starts(codes):
+    """长表（按股票、日期排序）中每条记录所属股票第一条记录的位置"""
+    codes = np.asarray(codes)
+    is_start = np.ones(len(codes), dtype=bool)
+    is_start[1:] = codes[1:] != codes[:-1]
+    return np.maximum.accumulate(np.where(is_start, np.arange(len(codes)), 0))
+
+def grouped_rolling_sum(values, starts, window):
+    """长表按股票分组的滚动求和，窗口为同一股票当前及之前最多 window 条记录（忽略 NaN）
+
+    逐个偏移量累加而不是用累计和相减，避免长序列上的舍入误差。
+
+    Returns:
+        tuple: (滚动和, 窗口内有效记录数)
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    total = filled.copy()
+    count = valid.astype(np.int64)
+    depth = np.arange(len(values)) - starts
+    for offset in range(1, min(window, int(depth.max(initial=0)) + 1)):
+        in_group = depth[offset:] >= offset
+        total[offset:] += np.where(in_group, filled[:-offset], 0.0)
+        count[offset:] += in_group & valid[:-offset]
+    return total, count
+
+def grouped_rolling_mean(values, starts, window):
+    """长表按股票分组的滚动均值（忽略 NaN，窗口内无数据时为 NaN）"""
+    total, count = grouped_rolling_sum(values, starts, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+def _grouped_rolling_reduce(values, starts, window, func):
+    values = np.asarray(values, dtype=float)
+    result = values.copy()
+    depth = np.arange(len(values)) - starts
+    for offset in range(1, min(window, int(depth.max(initial=0)) + 1)):
+        in_group = depth[offset:] >= offset
+        result[offset:] = np.where(in_group, func(result[offset:], values[:-offset]), result[offset:])
+    return result
+
+def grouped_rolling_max(values, starts, window):
+    """长表按股票分组的滚动最大值（忽略 NaN）"""
+    return _grouped_rolling_reduce(values, starts, window, np.fmax)
+
+def grouped_rolling_min(values, starts, window):
+    """长表按股票分组的滚动最小值（忽略 NaN）"""
+    return _grouped_rolling_reduce(values, starts, window, np.fmin)
+
+def grouped_lag(values, starts, periods=1):
+    """长表按股票分组的 LAG，同一股票之前不足 periods 条记录时为 NaN"""
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if periods < len(values):
+        depth = np.arange(len(values)) - starts
+        result[periods:] = np.where(depth[periods:] >= periods, values[:-periods], np.nan)
+    return result
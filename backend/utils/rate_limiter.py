@@ -0,0 +1,99 @@
+import time
+import logging
+import threading
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+class AdaptiveRateLimiter:
+    """自适应令牌桶限速器
+
+    所有下载线程共享一个令牌桶，每次请求前调用 acquire() 取得令牌。
+    请求出错（被限流/超时）时速率减半，连续成功后按比例逐步恢复，
+    使线程池保持在上游可接受的最高速率附近。
+    """
+
+    def __init__(self, rate=2.0, min_rate=0.2, max_rate=None, burst=1,
+                 increase_ratio=0.05, decrease_factor=0.5, cooldown=1.0):
+        """初始化限速器
+
+        Args:
+            rate (float): 初始速率（请求/秒）
+            min_rate (float): 最低速率
+            max_rate (float): 最高速率，默认为初始速率的 4 倍
+            burst (int): 令牌桶容量，允许的瞬时并发请求数
+            increase_ratio (float): 每次成功后速率的增长比例
+            decrease_factor (float): 出错时速率的缩减比例
+            cooldown (float): 两次降速之间的最短间隔（秒）
+        """
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate) if max_rate else self.rate * 4
+        self.burst = burst
+        self.increase_ratio = increase_ratio
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+        self.success_count = 0
+        self.error_count = 0
+
+    def _refill(self, now):
+        """按当前速率补充令牌"""
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """取得一个令牌，必要时阻塞等待
+
+        Returns:
+            float: 实际等待时间（秒）
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                # 不预支令牌，醒来后按最新速率重新计算，速率调整可立即生效
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(self):
+        """请求成功，按比例提高速率"""
+        with self._lock:
+            self.success_count += 1
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate * (1 + self.increase_ratio))
+
+    def on_error(self):
+        """请求失败，按比例降低速率
+
+        cooldown 时间内的多次失败只降速一次，避免降速前已发出的请求
+        陆续报错时速率被连续压到最低。
+        """
+        with self._lock:
+            self.error_count += 1
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._last_decrease = now
+            logger.info(f"请求失败，降低速率至 {self.rate:.2f} 次/秒")
+
+    def stats(self):
+        """返回当前速率和请求统计"""
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'success': self.success_count,
+                'error': self.error_count
+            }
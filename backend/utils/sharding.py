@@ -0,0 +1,64 @@
+"""
+按股票代码范围分片的多进程执行
+
+将当日有行情的股票按代码排序后均分为若干连续的代码范围，每个分片在独立的
+进程中计算（各自使用独立的数据库连接），由调用方合并结果后批量写入目标表。
+"""
+import logging
+import time
+import concurrent.futures
+import numpy as np
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+def load_shard_codes(conn, trade_date):
+    """加载指定交易日有行情的股票代码"""
+    rows = conn.execute(text("""
+        SELECT stock_code FROM stock_historical_quotes WHERE trade_date = :trade_date
+    """), {'trade_date': trade_date}).fetchall()
+    return [row.stock_code for row in rows]
+
+def split_code_ranges(stock_codes, shards):
+    """将股票代码按范围均分为 shards 段
+
+    Args:
+        stock_codes (list): 股票代码
+        shards (int): 分片数，超过股票数时按股票数分片
+
+    Returns:
+        list: [(first_code, last_code), ...]，按代码升序，范围两端均包含
+    """
+    codes = sorted(set(stock_codes))
+    if not codes:
+        return []
+    shards = max(1, min(int(shards), len(codes)))
+    bounds = np.linspace(0, len(codes), shards + 1).astype(int)
+    return [(codes[a], codes[b - 1]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+def _run_timed(func, code_range, args):
+    start = time.perf_counter()
+    result = func(code_range, *args)
+    return result, time.perf_counter() - start
+
+def run_shards(func, code_ranges, *args):
+    """每个代码范围在独立进程中执行 func(code_range, *args)
+
+    func 需为模块级函数，并在开始时调用 engine.dispose(close=False)，
+    避免子进程复用父进程的数据库连接。
+
+    Returns:
+        list: 各分片的结果，与 code_ranges 顺序一致
+    """
+    if not code_ranges:
+        return []
+
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(code_ranges)) as executor:
+        futures = [executor.submit(_run_timed, func, code_range, args) for code_range in code_ranges]
+        outputs = [future.result() for future in futures]
+
+    for (first_code, last_code), (_, seconds) in zip(code_ranges, outputs):
+        logger.info(f"分片 {first_code}-{last_code} 耗时 {seconds:.2f}秒")
+    logger.info(f"{len(code_ranges)} 个分片并行计算完成, 耗时 {time.perf_counter() - start:.2f}秒")
+    return [result for result, _ in outputs]
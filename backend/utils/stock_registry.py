@@ -0,0 +1,140 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+from sqlalchemy import text
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 缓存过期时间（秒）
+DEFAULT_TTL = 3600
+
+StockInfo = namedtuple('StockInfo', ['name', 'sector', 'industry'])
+
+class StockRegistry:
+    """进程内股票基本信息缓存
+
+    一次性加载 stocks 表为 {stock_code: StockInfo} 映射，替代逐条的
+    SELECT 查询。缓存按 TTL 过期，也可调用 refresh() 主动刷新；通过
+    ensure_stocks() 新建的股票会同步写入缓存。
+    """
+
+    def __init__(self, engine, ttl=DEFAULT_TTL):
+        """初始化缓存
+
+        Args:
+            engine: 数据库引擎
+            ttl (int): 缓存过期时间（秒），为 None 时不自动过期
+        """
+        self.engine = engine
+        self.ttl = ttl
+        self._stocks = {}
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """从数据库重新加载全部股票信息"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT stock_code, stock_name, sector, industry
+                FROM stocks
+            """)).fetchall()
+
+        stocks = {
+            row.stock_code: StockInfo(row.stock_name, row.sector, row.industry)
+            for row in rows
+        }
+        with self._lock:
+            self._stocks = stocks
+            self._loaded_at = time.time()
+        logger.info(f"已加载股票信息缓存: {len(stocks)} 只")
+        return len(stocks)
+
+    def invalidate(self):
+        """使缓存失效，下次访问时重新加载"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        """缓存未加载或已过期时重新加载"""
+        with self._lock:
+            expired = (
+                self._loaded_at is None or
+                (self.ttl is not None and time.time() - self._loaded_at > self.ttl)
+            )
+            if expired:
+                self.refresh()
+            return self._stocks
+
+    def get(self, stock_code):
+        """获取股票信息，不存在返回 None"""
+        return self._ensure_loaded().get(stock_code)
+
+    def exists(self, stock_code):
+        """判断股票是否存在"""
+        return stock_code in self._ensure_loaded()
+
+    def get_name(self, stock_code):
+        """获取股票名称，不存在返回 None"""
+        info = self.get(stock_code)
+        return info.name if info else None
+
+    def search(self, keyword, limit=50):
+        """按代码或名称模糊搜索股票
+
+        Returns:
+            list: [(stock_code, StockInfo), ...]，按代码排序
+        """
+        keyword = keyword.lower()
+        results = []
+        for code, info in sorted(self._ensure_loaded().items()):
+            if keyword in code.lower() or (info.name and keyword in info.name.lower()):
+                results.append((code, info))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def ensure_stocks(self, stocks):
+        """确保股票基本信息存在，缺失的股票批量创建并写入缓存
+
+        Args:
+            stocks (dict): {stock_code: stock_name}
+        Returns:
+            int: 新创建的股票数
+        """
+        known = self._ensure_loaded()
+        missing = [
+            {'code': code, 'name': name}
+            for code, name in stocks.items()
+            if code and code not in known
+        ]
+        if not missing:
+            return 0
+
+        with self.engine.connect() as conn:
+            with conn.begin():
+                result = conn.execute(text("""
+                    INSERT IGNORE INTO stocks (stock_code, stock_name)
+                    VALUES (:code, :name)
+                """), missing)
+                created = max(result.rowcount, 0)
+
+        with self._lock:
+            for row in missing:
+                self._stocks.setdefault(row['code'], StockInfo(row['name'], None, None))
+        if created:
+            logger.info(f"已创建股票基本信息: {created} 只")
+        return created
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_registry(engine, ttl=DEFAULT_TTL):
+    """获取指定引擎对应的共享股票缓存（每个进程每个引擎一份）"""
+    with _registries_lock:
+        registry = _registries.get(id(engine))
+        if registry is None:
+            registry = StockRegistry(engine, ttl=ttl)
+            _registries[id(engine)] = registry
+        return registry
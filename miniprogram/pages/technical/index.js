@@ -63,11 +63,11 @@ Page({
       title: '加载中...'
     });
 
-    // 直接使用 wx.request，不使用 Promise
+    // 一次请求获取全部技术分析数据
     wx.request({
-      url: `${app.globalData.baseUrl}/api/technical/ma/${stockCode}`,
+      url: `${app.globalData.baseUrl}/api/technical/bundle/${stockCode}`,
       data: { date },
-      success: async (res) => {
+      success: (res) => {
         if (res.statusCode === 404) {
           wx.hideLoading();
           this.showErrorMessage('所选日期为非交易日或节假日');
@@ -81,16 +81,16 @@ Page({
         }
 
         try {
-          const maData = { data: res.data };
-          const [crossData, bullishData, engulfingData, supportData] = await Promise.all([
-            this.requestData('cross'),
-            this.requestData('three-bullish'),
-            this.requestData('engulfing'),
-            this.requestData('support-resistance')
-          ]);
+          const bundle = typeof res.data === 'string' ? JSON.parse(res.data) : res.data;
+          const maData = { data: bundle.ma };
+          const crossData = { data: bundle.cross };
+          const bullishData = { data: bundle.three_bullish };
+          // 前一交易日缺失时没有吞没形态数据
+          const engulfingData = { data: bundle.engulfing || {} };
+          const supportData = { data: bundle.support_resistance };
 
           // 检查返回的数据
-          if (!maData.data || !crossData.data || !bullishData.data || !engulfingData.data || !supportData.data) {
+          if (!maData.data || !crossData.data || !bullishData.data || !supportData.data) {
             throw new Error('数据不完整');
           }
 
@@ -148,34 +148,6 @@ Page({
     });
   },
 
-  requestData(endpoint) {
-    const { stockCode, date } = this.data;
-    const app = getApp();
-    const baseUrl = `${app.globalData.baseUrl}/api/technical`;
-    
-    return new Promise((resolve, reject) => {
-      wx.request({
-        url: `${baseUrl}/${endpoint}/${stockCode}`,
-        data: { date },
-        success: (res) => {
-          console.log(`${endpoint} 接口返回:`, res);
-          if (res.statusCode === 200) {
-            const data = typeof res.data === 'string' ? JSON.parse(res.data) : res.data;
-            resolve({ data });
-          } else if (res.statusCode === 404) {
-            reject(new Error('当前日期无交易数据'));
-          } else {
-            reject(new Error(`请求失败: ${res.statusCode}`));
-          }
-        },
-        fail: (err) => {
-          console.error(`${endpoint} 接口错误:`, err);
-          reject(err);
-        }
-      });
-    });
-  },
-
   onLoad(options) {
     // 处理从其他页面传入的参数
     if (options.code) {